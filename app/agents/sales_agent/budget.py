@@ -0,0 +1,314 @@
+"""
+Per-tenant token and cost budget enforcement for agent runs.
+
+Spend is tracked in counters per tenant and period (day, month). A step
+reserves its estimated cost before calling the LLM and settles the actual
+amount afterwards, so concurrent runs can't overshoot a limit by more than
+the gap between estimates and actuals. Counters live in process memory or
+Redis; the database is only read once per tenant and period to seed them.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import BudgetExceededException
+from app.observability.metrics import budget_rejections_total
+
+logger = logging.getLogger(__name__)
+
+# Cost counters are kept in millicents so every backend can use integers
+MILLICENTS_PER_CENT = 1000
+
+# Counter TTLs comfortably outlive their period
+PERIOD_TTLS = {"day": 2 * 86400, "month": 32 * 86400}
+
+# (limit name in Tenant.limits, metric, period)
+LIMIT_KEYS = (
+    ("daily_cost_cents", "cost", "day"),
+    ("monthly_cost_cents", "cost", "month"),
+    ("daily_tokens", "tokens", "day"),
+    ("monthly_tokens", "tokens", "month"),
+)
+
+SpendLoader = Callable[[str, datetime], Tuple[float, int]]
+
+@dataclass
+class Reservation:
+    tenant_id: str
+    cost_cents: float
+    tokens: int
+    counters: Dict[str, Tuple[str, int]] = field(default_factory=dict)  # key -> (metric, amount)
+    settled: bool = False
+
+def period_start(period: str, now: datetime) -> datetime:
+    if period == "day":
+        return datetime(now.year, now.month, now.day)
+    return datetime(now.year, now.month, 1)
+
+def counter_key(tenant_id: str, metric: str, period: str, now: datetime) -> str:
+    stamp = now.strftime("%Y%m%d") if period == "day" else now.strftime("%Y%m")
+    return f"budget:{tenant_id}:{metric}:{period}:{stamp}"
+
+class InMemoryBudgetBackend:
+    """
+    Counters in process memory. Check-and-increment runs without awaiting,
+    which makes it atomic on the event loop. Each worker process only sees
+    its own reservations, so use Redis when running several workers.
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self.expires: Dict[str, float] = {}
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, expires in self.expires.items() if expires < now]:
+            self.counters.pop(key, None)
+            self.expires.pop(key, None)
+
+    async def seed(self, key: str, value: int, ttl: int):
+        if key not in self.counters:
+            self.counters[key] = value
+            self.expires[key] = time.monotonic() + ttl
+
+    async def try_reserve(self, entries: List[Tuple[str, int, int, int]]) -> Optional[str]:
+        """
+        entries: (key, amount, limit, ttl). Returns the first key that would
+        exceed its limit, or None after reserving all amounts.
+        """
+        self._expire()
+        for key, amount, limit, _ in entries:
+            if limit >= 0 and self.counters.get(key, 0) + amount > limit:
+                return key
+        for key, amount, _, ttl in entries:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.expires.setdefault(key, time.monotonic() + ttl)
+        return None
+
+    async def adjust(self, deltas: Dict[str, int]):
+        for key, delta in deltas.items():
+            if key in self.counters:
+                self.counters[key] += delta
+
+    async def get(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+class RedisBudgetBackend:
+    """
+    Counters in Redis, shared by every worker. Reservation is a single Lua
+    script so the check and the increments are atomic.
+    """
+
+    RESERVE_SCRIPT = """
+local n = #KEYS
+for i = 1, n do
+    local amount = tonumber(ARGV[i])
+    local limit = tonumber(ARGV[n + i])
+    local current = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if limit >= 0 and current + amount > limit then
+        return i
+    end
+end
+for i = 1, n do
+    redis.call('INCRBY', KEYS[i], ARGV[i])
+    redis.call('EXPIRE', KEYS[i], ARGV[2 * n + i], 'NX')
+end
+return 0
+"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+        self._reserve = self.redis.register_script(self.RESERVE_SCRIPT)
+
+    async def seed(self, key: str, value: int, ttl: int):
+        await self.redis.set(key, value, ex=ttl, nx=True)
+
+    async def try_reserve(self, entries: List[Tuple[str, int, int, int]]) -> Optional[str]:
+        keys = [entry[0] for entry in entries]
+        args = [entry[1] for entry in entries] + [entry[2] for entry in entries] + [entry[3] for entry in entries]
+        result = int(await self._reserve(keys=keys, args=args))
+        return keys[result - 1] if result else None
+
+    async def adjust(self, deltas: Dict[str, int]):
+        pipeline = self.redis.pipeline(transaction=False)
+        for key, delta in deltas.items():
+            pipeline.incrby(key, delta)
+        await pipeline.execute()
+
+    async def get(self, key: str) -> int:
+        value = await self.redis.get(key)
+        return int(value or 0)
+
+class BudgetManager:
+    """
+    Reserves and settles tenant spend against Tenant.limits, which may set
+    daily_cost_cents, monthly_cost_cents, daily_tokens and monthly_tokens.
+    """
+
+    def __init__(self, backend=None, spend_loader: Optional[SpendLoader] = None):
+        self.backend = backend or InMemoryBudgetBackend()
+        self.spend_loader = spend_loader
+        # period -> (period start, seed per counter key); only the current
+        # day and month are kept
+        self._seeds: Dict[str, Tuple[datetime, Dict[str, "asyncio.Task[None]"]]] = {}
+        self._released = asyncio.Event()
+
+    @classmethod
+    def from_settings(cls) -> "BudgetManager":
+        backend = None
+        if settings.BUDGET_BACKEND == "redis":
+            backend = RedisBudgetBackend(settings.REDIS_URL)
+        return cls(backend=backend, spend_loader=load_spend_from_db)
+
+    async def _seed(self, tenant_id: str, key: str, metric: str, period: str, now: datetime):
+        """
+        Wait until key holds the spend already in the database. The load
+        runs once per key; every reservation waits for it, since one that
+        created the counter first would make the seed a no-op.
+        """
+        if self.spend_loader is None:
+            return
+        seeds = self._period_seeds(period, now)
+        seeding = seeds.get(key)
+        if seeding is None:
+            seeding = seeds[key] = asyncio.create_task(self._load_seed(seeds, tenant_id, key, metric, period, now))
+        # Shielded so a cancelled reservation doesn't cancel everyone's seed
+        await asyncio.shield(seeding)
+
+    def _period_seeds(self, period: str, now: datetime) -> Dict[str, "asyncio.Task[None]"]:
+        start = period_start(period, now)
+        current = self._seeds.get(period)
+        if current is None or current[0] < start:
+            current = self._seeds[period] = (start, {})
+        elif current[0] > start:
+            # Started just before the period rolled over; not worth sharing
+            return {}
+        return current[1]
+
+    async def _load_seed(
+        self,
+        seeds: Dict[str, "asyncio.Task[None]"],
+        tenant_id: str,
+        key: str,
+        metric: str,
+        period: str,
+        now: datetime
+    ):
+        loop = asyncio.get_running_loop()
+        try:
+            cost_cents, tokens = await loop.run_in_executor(
+                None, self.spend_loader, tenant_id, period_start(period, now)
+            )
+            value = int(cost_cents * MILLICENTS_PER_CENT) if metric == "cost" else int(tokens)
+            await self.backend.seed(key, value, PERIOD_TTLS[period])
+        except Exception as e:
+            logger.warning(f"Failed to seed budget counter {key}: {str(e)}")
+            # The next reservation tries again
+            seeds.pop(key, None)
+
+    async def reserve(
+        self,
+        tenant_id: str,
+        limits: Optional[Dict[str, Any]],
+        cost_cents: float,
+        tokens: int,
+        wait_seconds: float = 0
+    ) -> Reservation:
+        """
+        Reserve estimated spend, raising BudgetExceededException if it
+        would exceed a limit. With wait_seconds, the call waits for other
+        reservations to settle before giving up.
+        """
+        tenant_id = str(tenant_id)
+        reservation = Reservation(tenant_id=tenant_id, cost_cents=cost_cents, tokens=tokens)
+        limits = limits or {}
+
+        now = datetime.utcnow()
+        entries: List[Tuple[str, int, int, int]] = []
+        names: Dict[str, str] = {}
+        for limit_name, metric, period in LIMIT_KEYS:
+            limit = limits.get(limit_name)
+            if limit is None:
+                continue
+            key = counter_key(tenant_id, metric, period, now)
+            await self._seed(tenant_id, key, metric, period, now)
+            if metric == "cost":
+                amount, limit = int(cost_cents * MILLICENTS_PER_CENT), int(limit * MILLICENTS_PER_CENT)
+            else:
+                amount, limit = int(tokens), int(limit)
+            entries.append((key, amount, limit, PERIOD_TTLS[period]))
+            names[key] = limit_name
+            reservation.counters[key] = (metric, amount)
+
+        if not entries:
+            return reservation
+
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            rejected = await self.backend.try_reserve(entries)
+            if rejected is None:
+                return reservation
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                budget_rejections_total.labels(tenant_id=tenant_id, limit=names[rejected]).inc()
+                raise BudgetExceededException(tenant_id, names[rejected])
+
+            # Queue until another reservation settles (or poll, since with
+            # Redis the settle may happen in another worker)
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def settle(self, reservation: Reservation, cost_cents: float, tokens: int):
+        """
+        Replace the reserved estimate with the actual spend
+        """
+        if reservation.settled:
+            return
+        reservation.settled = True
+
+        deltas: Dict[str, int] = {}
+        for key, (metric, reserved) in reservation.counters.items():
+            actual = int(cost_cents * MILLICENTS_PER_CENT) if metric == "cost" else int(tokens)
+            if actual != reserved:
+                deltas[key] = actual - reserved
+        if deltas:
+            await self.backend.adjust(deltas)
+        self._released.set()
+
+    async def release(self, reservation: Reservation):
+        """
+        Give back a reservation whose step never ran
+        """
+        await self.settle(reservation, 0, 0)
+
+def load_spend_from_db(tenant_id: str, since: datetime) -> Tuple[float, int]:
+    """
+    Spend already recorded in agent_executions since a period start
+    """
+    from sqlalchemy import func
+    from app.db.session import SessionLocal
+    from app.db.models.agent_execution import AgentExecution
+
+    db = SessionLocal()
+    try:
+        cost_cents, tokens = db.query(
+            func.coalesce(func.sum(AgentExecution.cost_cents), 0),
+            func.coalesce(func.sum(AgentExecution.tokens_input + AgentExecution.tokens_output), 0)
+        ).filter(
+            AgentExecution.tenant_id == tenant_id,
+            AgentExecution.created_at >= since
+        ).one()
+    finally:
+        db.close()
+    return float(cost_cents), int(tokens)
+
+# Create a global instance
+BUDGET_MANAGER = BudgetManager.from_settings()
@@ -0,0 +1,187 @@
+"""
+CPU-bound content checks for drafted emails.
+
+Everything here is pure and importable without the rest of the app, so
+the verification engine can run it in worker processes.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Set
+
+# Phrase -> weight; matched case-insensitively on word boundaries
+SPAM_PHRASES = {
+    "act now": 2.0,
+    "limited time": 2.0,
+    "click here": 2.0,
+    "buy now": 2.0,
+    "risk-free": 2.0,
+    "risk free": 2.0,
+    "guaranteed": 1.5,
+    "guarantee": 1.5,
+    "no obligation": 1.5,
+    "special promotion": 1.5,
+    "winner": 1.5,
+    "urgent": 1.5,
+    "cash": 1.0,
+    "free": 1.0,
+    "100%": 1.0,
+    "discount": 1.0,
+    "cheap": 1.0,
+    "earn money": 2.0,
+    "double your": 2.0,
+    "once in a lifetime": 2.0,
+}
+
+URL_SHORTENERS = {"bit.ly", "tinyurl.com", "goo.gl", "t.co", "ow.ly", "is.gd", "buff.ly"}
+
+_SPAM_PATTERN = re.compile(
+    r"(?<![\w-])(" + "|".join(re.escape(phrase) for phrase in SPAM_PHRASES) + r")(?![\w-])",
+    re.IGNORECASE
+)
+_WORD_PATTERN = re.compile(r"[A-Za-z']+")
+_SENTENCE_PATTERN = re.compile(r"[.!?]+")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+_URL_PATTERN = re.compile(r"\b(?:https?://|www\.)[^\s<>\"')]+", re.IGNORECASE)
+_EMAIL_PATTERN = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+_PHONE_PATTERN = re.compile(r"(?<!\d)(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{3}\)|\d{3})[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)")
+_SSN_PATTERN = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
+_CARD_PATTERN = re.compile(r"(?<!\d)(?:\d[ -]?){13,19}(?!\d)")
+_IP_HOST = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+def spam_score(text: str) -> Dict[str, Any]:
+    """
+    Weighted spam-phrase score plus penalties for shouting
+    """
+    matches = [match.lower() for match in _SPAM_PATTERN.findall(text)]
+    score = sum(SPAM_PHRASES[match] for match in matches)
+
+    letters = [char for char in text if char.isalpha()]
+    caps_ratio = sum(char.isupper() for char in letters) / len(letters) if letters else 0.0
+    if caps_ratio > 0.3:
+        score += 2.0
+    exclamations = text.count("!")
+    score += max(0, exclamations - 1) * 0.5
+
+    return {
+        "score": round(score, 2),
+        "phrases": sorted(set(matches)),
+        "caps_ratio": round(caps_ratio, 3),
+        "exclamations": exclamations
+    }
+
+def _syllables(word: str) -> int:
+    word = word.lower()
+    count = len(_VOWEL_GROUPS.findall(word))
+    if word.endswith("e") and not word.endswith("le") and count > 1:
+        count -= 1
+    return max(1, count)
+
+def readability(text: str) -> Dict[str, Any]:
+    """
+    Flesch reading ease (higher is easier; 60-70 is plain English)
+    """
+    words = _WORD_PATTERN.findall(text)
+    if not words:
+        return {"flesch_reading_ease": None, "words": 0, "sentences": 0}
+    sentences = max(1, len([part for part in _SENTENCE_PATTERN.split(text) if part.strip()]))
+    syllables = sum(_syllables(word) for word in words)
+    score = 206.835 - 1.015 * (len(words) / sentences) - 84.6 * (syllables / len(words))
+    return {
+        "flesch_reading_ease": round(score, 1),
+        "words": len(words),
+        "sentences": sentences
+    }
+
+def _luhn_valid(digits: str) -> bool:
+    total = 0
+    for index, char in enumerate(reversed(digits)):
+        digit = int(char)
+        if index % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+def detect_pii(text: str, allowed: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Personal data that shouldn't appear in outreach. Addresses and numbers
+    in allowed (e.g. the sender's own signature) are ignored.
+    """
+    allowed = [value.lower() for value in allowed if value]
+    # Numbers match on their last ten digits, whatever the formatting
+    allowed_numbers = {digits[-10:] for digits in (re.sub(r"\D", "", value) for value in allowed) if len(digits) >= 7}
+    emails = [email for email in _EMAIL_PATTERN.findall(text) if email.lower() not in allowed]
+    phones = [
+        phone for phone in _PHONE_PATTERN.findall(text)
+        if re.sub(r"\D", "", phone)[-10:] not in allowed_numbers
+    ]
+    ssns = _SSN_PATTERN.findall(text)
+    cards = []
+    for candidate in _CARD_PATTERN.findall(text):
+        digits = re.sub(r"\D", "", candidate)
+        if 13 <= len(digits) <= 19 and _luhn_valid(digits):
+            cards.append(candidate.strip())
+
+    found = {"emails": emails, "phones": phones, "ssns": ssns, "cards": cards}
+    return {
+        "found": any(found.values()),
+        "counts": {kind: len(values) for kind, values in found.items()}
+    }
+
+def detect_links(text: str) -> Dict[str, Any]:
+    """
+    Links in the email, flagging the kinds spam filters dislike
+    """
+    links = _URL_PATTERN.findall(text)
+    flagged = []
+    for link in links:
+        host = re.sub(r"^(?:https?://)?", "", link, flags=re.IGNORECASE).split("/")[0].split(":")[0].lower()
+        if host in URL_SHORTENERS:
+            flagged.append({"url": link, "reason": "shortener"})
+        elif _IP_HOST.match(host):
+            flagged.append({"url": link, "reason": "ip_address"})
+        elif link.lower().startswith("http://"):
+            flagged.append({"url": link, "reason": "insecure"})
+    return {"count": len(links), "flagged": flagged}
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    words = [word.lower() for word in _WORD_PATTERN.findall(text)]
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[index:index + size]) for index in range(len(words) - size + 1)}
+
+def max_similarity(text: str, previous: Iterable[str]) -> float:
+    """
+    Highest Jaccard similarity of word 3-shingles against earlier emails
+    """
+    current = shingles(text)
+    if not current:
+        return 0.0
+    best = 0.0
+    for other in previous:
+        other_shingles = shingles(other)
+        if not other_shingles:
+            continue
+        similarity = len(current & other_shingles) / len(current | other_shingles)
+        best = max(best, similarity)
+    return round(best, 4)
+
+def verify(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run every check on one draft. item has "text" and optionally
+    "previous" (earlier emails) and "allowed_pii".
+    """
+    text = item.get("text") or ""
+    return {
+        "spam": spam_score(text),
+        "readability": readability(text),
+        "pii": detect_pii(text, item.get("allowed_pii") or ()),
+        "links": detect_links(text),
+        "similarity": max_similarity(text, item.get("previous") or ())
+    }
+
+def verify_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Entry point for worker processes; batches amortize the IPC round trip
+    """
+    return [verify(item) for item in items]
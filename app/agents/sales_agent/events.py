@@ -0,0 +1,100 @@
+"""
+In-process pub/sub for streaming agent progress to clients
+"""
+import asyncio
+from typing import Any, Dict, Optional, Set
+from app.core.config import settings
+
+_CLOSED = object()
+
+class Subscription:
+    """
+    A bounded event buffer for one subscriber. When a slow consumer falls
+    behind, the oldest events are dropped so publishers never block.
+    """
+
+    def __init__(self, bus: "AgentEventBus", topic: str, maxsize: int):
+        self.bus = bus
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, event: Any):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event. Returns None on timeout and raises
+        StopAsyncIteration once the topic has been closed.
+        """
+        if self.closed:
+            raise StopAsyncIteration
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is _CLOSED:
+            self.close()
+            raise StopAsyncIteration
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        while True:
+            event = await self.get()
+            if event is not None:
+                return event
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus._unsubscribe(self)
+
+class AgentEventBus:
+    """
+    Topic-per-execution event bus. Publishing to a topic without
+    subscribers is a no-op, so agents can publish unconditionally.
+    """
+
+    def __init__(self, buffer_size: int = 256):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, topic: str, maxsize: Optional[int] = None) -> Subscription:
+        subscription = Subscription(self, topic, maxsize or self.buffer_size)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def has_subscribers(self, topic: Optional[str]) -> bool:
+        return bool(topic) and bool(self._subscribers.get(topic))
+
+    def publish(self, topic: Optional[str], event: Dict[str, Any]):
+        if not topic:
+            return
+        for subscription in self._subscribers.get(topic, ()):
+            subscription.put(event)
+
+    def close(self, topic: Optional[str]):
+        """
+        Signal end-of-stream to every subscriber of a topic
+        """
+        if not topic:
+            return
+        for subscription in list(self._subscribers.get(topic, ())):
+            subscription.put(_CLOSED)
+
+    def _unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.topic]
+
+# Create a global instance
+AGENT_EVENTS = AgentEventBus(buffer_size=settings.AGENT_EVENT_BUFFER_SIZE)
@@ -1,77 +1,556 @@
 import asyncio
-from typing import Dict, Any, List
-from app.agents.sales_agent.state import AgentState
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from app.agents.sales_agent.state import AgentState, LeadSnapshot
+from app.agents.sales_agent.company_cache import COMPANY_CACHE, CompanyCache, normalize_domain
+from app.agents.sales_agent.tools import research_company, enrich_company, is_fallback
+from app.agents.sales_agent.llm import LLMClient, LLMResult, get_llm_client, estimate_cost_cents
+from app.agents.sales_agent.draft_batcher import DRAFT_BATCHER, DRAFT_SYSTEM_PROMPT, DraftBatcher
+from app.agents.sales_agent.budget import BUDGET_MANAGER, BudgetManager
+from app.core.config import settings
+from app.core.http_client import OutboundHTTPClient
+from app.agents.sales_agent.model_router import MODEL_ROUTER, ModelRouter, abandoned_usage
+from app.agents.sales_agent.events import AGENT_EVENTS, AgentEventBus
+from app.agents.sales_agent.verification import VERIFICATION_ENGINE, VerificationEngine
+from app.agents.sales_agent.near_duplicates import NEAR_DUPLICATE_INDEX, NearDuplicateIndex
+from app.services.knowledge import KNOWLEDGE_RETRIEVER, KnowledgeRetriever
+from app.observability.instrumentation import StepRecord, instrument_step
+from app.observability.metrics import speculative_drafts_total, speculative_wasted_tokens_total
+
+logger = logging.getLogger(__name__)
+
+REFINE_INSTRUCTIONS = (
+    " The previous assistant message is a first draft written before the "
+    "research was available. Reply with a revised email that uses the new "
+    "facts, keeping whatever in the draft still works."
+)
+
+class _DeltaGate:
+    """
+    Forwards draft token deltas to subscribers from one model only. With a
+    hedged request both models stream; the first to produce a token owns
+    the stream, and a reset is published if the other model ends up winning.
+    """
+
+    def __init__(self, events: AgentEventBus, execution_id: str, speculative: bool = False):
+        self.events = events
+        self.execution_id = execution_id
+        self.speculative = speculative
+        self.owner = None
+        self.chars = 0  # Streamed by every model, for usage estimates
+        self.chars_by_model: Dict[str, int] = {}
+
+    def for_model(self, model: str):
+        def on_delta(delta: str):
+            self.chars += len(delta)
+            self.chars_by_model[model] = self.chars_by_model.get(model, 0) + len(delta)
+            if self.owner is None:
+                self.owner = model
+            if model == self.owner:
+                event = {
+                    "type": "token",
+                    "step": "draft_email",
+                    "model": model,
+                    "delta": delta
+                }
+                if self.speculative:
+                    event["speculative"] = True
+                self.events.publish(self.execution_id, event)
+        return on_delta
+
+    def settle(self, model: str):
+        if self.owner is not None and self.owner != model:
+            self.events.publish(self.execution_id, {
+                "type": "draft_reset",
+                "step": "draft_email",
+                "model": model
+            })
+
+@dataclass
+class _SpeculationOutcome:
+    outcome: str  # accepted, refined, cancelled, failed
+    result: Optional[LLMResult]
+    spent: List[LLMResult]
+    decision: Optional[Dict[str, Any]] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "outcome": self.outcome,
+            "wasted_tokens": sum(
+                spent.tokens_input + spent.tokens_output for spent in self.spent
+            ) if self.outcome in ("cancelled", "failed") else 0
+        }
+
+class _SpeculativeDraft:
+    """
+    A draft started from the lead's own fields while research and
+    enrichment are still running. It is accepted as is when they add
+    nothing, refined when it finished in time, and cancelled otherwise.
+    """
+
+    def __init__(self, agent: "SalesAgent", state: AgentState):
+        self.agent = agent
+        self.state = state
+        self.messages = agent._draft_messages(state)
+        self.facts = agent._draft_facts(state)
+        self.gate = None
+        if agent.events.has_subscribers(state.get("execution_id")):
+            self.gate = _DeltaGate(agent.events, state["execution_id"], speculative=True)
+        self.reservation = None
+        self.abandoned: List[LLMResult] = []
+        self.task = asyncio.create_task(self._draft())
+
+    @property
+    def streamed(self) -> bool:
+        return self.gate is not None and self.gate.chars > 0
+
+    async def _draft(self) -> Tuple[LLMResult, Dict[str, Any]]:
+        agent = self.agent
+        self.reservation = await agent.budget.reserve(
+            self.state["tenant_id"],
+            self.state.get("budget_limits"),
+            *agent._estimate_cost(self.messages, settings.AGENT_DRAFT_MAX_TOKENS)
+        )
+        if self.gate is not None:
+            gate = self.gate
+            result, decision = await agent.model_router.complete(
+                lambda model: agent.llm.stream(
+                    model, self.messages, gate.for_model(model),
+                    max_tokens=settings.AGENT_DRAFT_MAX_TOKENS
+                )
+            )
+            gate.settle(result.model)
+        else:
+            result, decision = await agent.model_router.complete(
+                lambda model: agent.llm.complete(
+                    model, self.messages, max_tokens=settings.AGENT_DRAFT_MAX_TOKENS
+                )
+            )
+        self.abandoned = abandoned_usage(decision, self.messages, self.gate.chars_by_model if self.gate else None)
+        return result, decision
+
+    async def resolve(self, has_new_facts: bool) -> _SpeculationOutcome:
+        if not has_new_facts or self.task.done():
+            try:
+                result, decision = await self.task
+            except Exception as e:
+                logger.warning(f"Speculative draft failed: {str(e)}")
+                return await self._finish(_SpeculationOutcome("failed", None, [self._estimate_usage()]))
+            outcome = "refined" if has_new_facts else "accepted"
+            return await self._finish(_SpeculationOutcome(outcome, result, [*self.abandoned, result], decision))
+        return await self.cancel()
+
+    async def cancel(self) -> _SpeculationOutcome:
+        self.task.cancel()
+        try:
+            await self.task
+        except BaseException:
+            pass
+        return await self._finish(_SpeculationOutcome("cancelled", None, [self._estimate_usage()]))
+
+    def _estimate_usage(self) -> LLMResult:
+        """
+        Cancelled calls report no usage; bill the prompt plus whatever
+        was streamed so far
+        """
+        if self.reservation is None:
+            return LLMResult(text="", model=self.agent.model_router.primary)
+        return LLMResult(
+            text="",
+            model=self.agent.model_router.primary,
+            tokens_input=sum(len(message["content"]) for message in self.messages) // 4 + 1,
+            tokens_output=(self.gate.chars // 4) if self.gate is not None else 0
+        )
+
+    async def _finish(self, outcome: _SpeculationOutcome) -> _SpeculationOutcome:
+        if self.reservation is not None:
+            await self.agent.budget.settle(
+                self.reservation,
+                sum(spent.cost_cents for spent in outcome.spent),
+                sum(spent.tokens_input + spent.tokens_output for spent in outcome.spent)
+            )
+        speculative_drafts_total.labels(outcome=outcome.outcome).inc()
+        wasted = outcome.summary()["wasted_tokens"]
+        if wasted:
+            speculative_wasted_tokens_total.inc(wasted)
+        return outcome
 
 class SalesAgent:
     """
     Sales agent implementation
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        company_cache: CompanyCache = None,
+        llm: LLMClient = None,
+        model_router: ModelRouter = None,
+        events: AgentEventBus = None,
+        budget: BudgetManager = None,
+        draft_batcher: DraftBatcher = None,
+        http: OutboundHTTPClient = None,
+        verification: VerificationEngine = None,
+        near_duplicates: NearDuplicateIndex = None,
+        knowledge: KnowledgeRetriever = None
+    ):
         # Initialize the agent graph here
-        pass
+        self.company_cache = company_cache or COMPANY_CACHE
+        self.llm = llm or get_llm_client()
+        self.model_router = model_router or MODEL_ROUTER
+        self.events = events or AGENT_EVENTS
+        self.budget = budget or BUDGET_MANAGER
+        self.draft_batcher = draft_batcher or DRAFT_BATCHER
+        self.http = http
+        self.verification = verification or VERIFICATION_ENGINE
+        self.near_duplicates = near_duplicates or NEAR_DUPLICATE_INDEX
+        self.knowledge = knowledge or KNOWLEDGE_RETRIEVER
 
     async def run(self, state: AgentState) -> AgentState:
         """
         Execute the agent workflow
         """
-        print(f"Starting sales agent for lead: {state.get('lead', {}).get('name', 'Unknown')}")
+        lead = state["lead"]
+        logger.info(f"Starting sales agent for lead: {lead.name or 'Unknown'}")
         
         # This is a simplified implementation
         # In a real implementation, this would contain the actual LangGraph workflow
         
+        run_started = time.perf_counter()
+
         # Simulate agent execution steps
-        state["current_step"] = "initialized"
-        state["step_history"].append({
-            "step": "initialized",
-            "timestamp": asyncio.get_event_loop().time(),
-            "status": "completed"
-        })
-        
-        # Research step
-        state["current_step"] = "research"
-        state["research_results"] = {"company_info": {"name": "Test Company", "industry": "Technology"}}
-        state["step_history"].append({
-            "step": "research",
-            "timestamp": asyncio.get_event_loop().time(),
-            "status": "completed",
-            "details": "Research step completed"
-        })
+        async with self._step(state, "initialized"):
+            pass
+
+        speculation = None
+        if self._should_speculate(state):
+            speculation = _SpeculativeDraft(self, state)
         
-        # Enrichment step
-        state["current_step"] = "enrichment"
-        state["enriched_data"] = {"linkedin_url": "https://linkedin.com/company/test"}
-        state["step_history"].append({
-            "step": "enrichment",
-            "timestamp": asyncio.get_event_loop().time(),
-            "status": "completed",
-            "details": "Enrichment step completed"
-        })
+        # Research and enrichment are company-level, so they are shared across
+        # every lead with the same domain in the tenant
+        domain = normalize_domain(lead.domain or lead.email)
+
+        try:
+            # Research step
+            async with self._step(state, "research") as step:
+                research, cache_status = await self.company_cache.get_or_fetch(
+                    state["tenant_id"], domain, "research", lambda: self._research_company(lead, domain, state["tenant_id"])
+                )
+                state["research_results"] = research
+                state["knowledge_results"] = await self._retrieve_knowledge(state)
+                step.update(
+                    cache=cache_status,
+                    knowledge_hits=[hit["id"] for hit in state["knowledge_results"]],
+                    details="Research step completed"
+                )
+            
+            # Enrichment step
+            async with self._step(state, "enrichment") as step:
+                enriched, cache_status = await self.company_cache.get_or_fetch(
+                    state["tenant_id"], domain, "enrichment", lambda: self._enrich_company(domain, state["tenant_id"])
+                )
+                state["enriched_data"] = enriched
+                step.update(cache=cache_status, details="Enrichment step completed")
+        except BaseException:
+            if speculation is not None:
+                await speculation.cancel()
+            raise
         
         # Draft email step
-        state["current_step"] = "draft_email"
-        state["draft_email"] = f"Hi {state.get('lead', {}).get('name', 'there')},\n\nI noticed your company is doing interesting work in {state.get('lead', {}).get('company', 'your industry')}.\n\nI'd love to discuss how our AI agents could help with your sales process.\n\nWould you be open to a brief call next week?\n\nBest regards,\nSales Agent"
-        state["step_history"].append({
-            "step": "draft_email",
-            "timestamp": asyncio.get_event_loop().time(),
-            "status": "completed",
-            "details": "Email draft completed"
-        })
+        async with self._step(state, "draft_email") as step:
+            if self.llm is not None:
+                results: List[LLMResult] = []
+                decision = None
+                messages = self._draft_messages(state)
+                if speculation is not None:
+                    speculative = await speculation.resolve(self._draft_facts(state) != speculation.facts)
+                    results.extend(speculative.spent)
+                    step.update(speculative=speculative.summary())
+                    if speculative.outcome == "accepted":
+                        decision = speculative.decision
+                    else:
+                        if speculation.streamed:
+                            self.events.publish(state.get("execution_id"), {
+                                "type": "draft_reset",
+                                "step": "draft_email"
+                            })
+                        if speculative.outcome == "refined":
+                            messages = self._refine_messages(state, speculative.result.text)
+
+                if decision is None:
+                    reservation = await self.budget.reserve(
+                        state["tenant_id"],
+                        state.get("budget_limits"),
+                        *self._estimate_cost(messages, settings.AGENT_DRAFT_MAX_TOKENS),
+                        wait_seconds=settings.AGENT_BUDGET_WAIT_SECONDS
+                    )
+                    try:
+                        drafted, decision = await self._draft_with_llm(state, messages)
+                    except BaseException:
+                        await self.budget.release(reservation)
+                        raise
+                    await self.budget.settle(
+                        reservation,
+                        sum(result.cost_cents for result in drafted),
+                        sum(result.tokens_input + result.tokens_output for result in drafted)
+                    )
+                    results.extend(drafted)
+
+                result = results[-1]
+                state["draft_email"] = result.text
+                for spent in results:
+                    state["tokens_used"] = state.get("tokens_used", 0) + spent.tokens_input + spent.tokens_output
+                    state["tokens_output"] = state.get("tokens_output", 0) + spent.tokens_output
+                    state["cost_cents"] = state.get("cost_cents", 0) + spent.cost_cents
+                    step.add_usage(spent.model, spent.tokens_input + spent.tokens_output, spent.cost_cents)
+                step.update(model=result.model, model_routing=decision)
+            else:
+                state["draft_email"] = self._template_draft(lead)
+                self.events.publish(state.get("execution_id"), {
+                    "type": "token",
+                    "step": "draft_email",
+                    "delta": state["draft_email"]
+                })
+            step.update(details="Email draft completed")
         
         # Success state
-        state["current_step"] = "verification"
-        state["success"] = True
-        state["tokens_used"] = 1200
-        state["cost_cents"] = 15
-        state["execution_time"] = 5.2
-        
-        state["step_history"].append({
-            "step": "verification",
-            "timestamp": asyncio.get_event_loop().time(),
-            "status": "completed",
-            "details": "Verification step completed"
-        })
+        async with self._step(state, "verification") as step:
+            try:
+                verification = await self.verification.verify(
+                    state.get("draft_email", ""),
+                    state.get("previous_emails"),
+                    allowed_pii=self._allowed_pii(state)
+                )
+            except Exception as e:
+                # Checks are advisory; a broken worker pool shouldn't fail the run
+                logger.warning(f"Verification checks failed: {str(e)}")
+                verification = {"passed": None, "error": str(e)}
+                step.update(status="skipped")
+            await self._check_near_duplicate(state, domain, verification)
+            state["verification_result"] = verification
+            state["success"] = True
+            state["execution_time"] = time.perf_counter() - run_started
+            step.update(
+                passed=verification["passed"],
+                issues=verification.get("issues", []),
+                warnings=verification.get("warnings", []),
+                details="Verification step completed"
+            )
         
         state["trajectory"] = state["step_history"]  # For audit trail
         
-        return state
\ No newline at end of file
+        return state
+
+    def _allowed_pii(self, state: AgentState) -> List[str]:
+        """
+        The lead's own contact details and the sender's may appear in a
+        draft (greeting, signature)
+        """
+        lead = state["lead"]
+        return [contact for contact in (lead.email, lead.phone, *state.get("sender_contacts", [])) if contact]
+
+    async def _check_near_duplicate(self, state: AgentState, domain: Optional[str], verification: Dict[str, Any]):
+        """
+        Fail verification if the draft is a near-duplicate of outreach to the
+        same company. Drafts aren't indexed here: most are never sent, so
+        only emails the campaign engine actually sends count as history
+        """
+        draft = state.get("draft_email", "")
+        try:
+            result = await self.near_duplicates.check(state["tenant_id"], domain, draft)
+        except Exception as e:
+            logger.warning(f"Near-duplicate check failed: {str(e)}")
+            return
+        verification["near_duplicate"] = result
+        if result["duplicate"]:
+            verification.setdefault("issues", []).append("near_duplicate")
+            verification["passed"] = False
+
+    @asynccontextmanager
+    async def _step(self, state: AgentState, name: str) -> AsyncIterator[StepRecord]:
+        """
+        Run a node inside the instrumentation hook, then record it in the
+        step history (failed steps included)
+        """
+        state["current_step"] = name
+        step = None
+        try:
+            async with instrument_step(name, state.get("agent_type", "research"), state["tenant_id"]) as step:
+                yield step
+        finally:
+            if step is not None:
+                self._record_step(state, step.entry)
+
+    def _record_step(self, state: AgentState, entry: Dict[str, Any]):
+        """
+        Append a step to the history and publish it to live subscribers
+        """
+        entry["timestamp"] = asyncio.get_event_loop().time()
+        state["step_history"].append(entry)
+        self.events.publish(state.get("execution_id"), {"type": "step", **entry})
+
+    async def _research_company(self, lead: LeadSnapshot, domain: str, tenant_id: str) -> Dict[str, Any]:
+        """
+        Run company research for a lead's company
+        """
+        return await research_company(domain, lead.company, tenant_id, http=self.http)
+
+    async def _retrieve_knowledge(self, state: AgentState) -> List[Dict[str, Any]]:
+        """
+        Tenant knowledge base chunks relevant to the lead's company, for
+        the draft. Retrieval problems only cost the draft its collateral.
+        """
+        lead = state["lead"]
+        company_info = (state.get("research_results") or {}).get("company_info") or {}
+        query = " ".join(
+            str(part) for part in (
+                lead.title, lead.company, company_info.get("industry"), company_info.get("description")
+            ) if part
+        )
+        if not query:
+            return []
+        try:
+            hits = await self.knowledge.search(state["tenant_id"], query)
+        except Exception as e:
+            logger.warning(f"Knowledge retrieval failed: {str(e)}")
+            return []
+        return [
+            {
+                "id": hit.id,
+                "score": round(hit.score, 4),
+                "title": hit.title,
+                "content": (hit.content or "")[:settings.KNOWLEDGE_SNIPPET_CHARS]
+            }
+            for hit in hits
+        ]
+
+    async def _enrich_company(self, domain: str, tenant_id: str) -> Dict[str, Any]:
+        """
+        Fetch enrichment data for a lead's company
+        """
+        return await enrich_company(domain, tenant_id, http=self.http)
+
+    async def _draft_with_llm(
+        self,
+        state: AgentState,
+        messages: List[Dict[str, Any]]
+    ) -> Tuple[List[LLMResult], Dict[str, Any]]:
+        """
+        Draft the email with the LLM. Bulk runs go through the draft
+        batcher first; a lead whose batched draft fails validation gets a
+        single call. Returns every call's usage, the final draft last.
+        """
+        results: List[LLMResult] = []
+        if state.get("priority") == "bulk" and self.draft_batcher.enabled:
+            batched = await self.draft_batcher.draft(state["tenant_id"], self._draft_context(state))
+            results.extend(batched.abandoned)
+            if batched.result.model:
+                results.append(batched.result)
+            if batched.text is not None:
+                return results, batched.decision
+
+        if self.events.has_subscribers(state.get("execution_id")):
+            gate = _DeltaGate(self.events, state["execution_id"])
+            result, decision = await self.model_router.complete(
+                lambda model: self.llm.stream(
+                    model, messages, gate.for_model(model),
+                    max_tokens=settings.AGENT_DRAFT_MAX_TOKENS
+                )
+            )
+            gate.settle(result.model)
+            results.extend(abandoned_usage(decision, messages, gate.chars_by_model))
+        else:
+            result, decision = await self.model_router.complete(
+                lambda model: self.llm.complete(
+                    model, messages, max_tokens=settings.AGENT_DRAFT_MAX_TOKENS
+                )
+            )
+            results.extend(abandoned_usage(decision, messages))
+        results.append(result)
+        return results, decision
+
+    def _should_speculate(self, state: AgentState) -> bool:
+        """
+        Speculative drafting only pays off for interactive runs, where
+        someone is waiting on the draft
+        """
+        return (
+            settings.AGENT_SPECULATIVE_DRAFT
+            and self.llm is not None
+            and state.get("priority", "interactive") == "interactive"
+        )
+
+    def _refine_messages(self, state: AgentState, draft: str) -> List[Dict[str, Any]]:
+        """
+        Messages asking the LLM to revise a speculative draft with the
+        research and enrichment that arrived after it
+        """
+        return [
+            {"role": "system", "content": DRAFT_SYSTEM_PROMPT + REFINE_INSTRUCTIONS},
+            {"role": "user", "content": json.dumps(self._draft_context(state), default=str)},
+            {"role": "assistant", "content": draft}
+        ]
+
+    def _draft_messages(self, state: AgentState) -> List[Dict[str, Any]]:
+        """
+        Build the chat messages for the draft_email step
+        """
+        return [
+            {"role": "system", "content": DRAFT_SYSTEM_PROMPT},
+            {"role": "user", "content": json.dumps(self._draft_context(state), default=str)}
+        ]
+
+    def _draft_context(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Facts the draft may use (one lead's entry in a batched prompt)
+        """
+        lead = state["lead"]
+        return {
+            "lead": {
+                "name": lead.name,
+                "title": lead.title,
+                "company": lead.company,
+                "domain": lead.domain
+            },
+            "research": state.get("research_results", {}),
+            "enrichment": state.get("enriched_data", {}),
+            "collateral": [
+                {"title": item["title"], "content": item["content"]}
+                for item in state.get("knowledge_results") or []
+                if item.get("content")
+            ],
+        }
+
+    def _draft_facts(self, state: AgentState) -> Dict[str, Any]:
+        """
+        The draft context with stand-in research and enrichment left out,
+        to tell whether a speculative draft missed anything real
+        """
+        context = self._draft_context(state)
+        for key in ("research", "enrichment"):
+            if is_fallback(context[key]):
+                context[key] = {}
+        return context
+
+    def _estimate_cost(self, messages: List[Dict[str, Any]], max_tokens: int) -> Tuple[float, int]:
+        """
+        Upper-bound (cost_cents, tokens) for a call, priced at the more
+        expensive of the models the router may use
+        """
+        tokens_input = sum(len(message["content"]) for message in messages) // 4 + 1
+        cost_cents = max(
+            estimate_cost_cents(model, tokens_input, max_tokens)
+            for model in (self.model_router.primary, self.model_router.fallback)
+        )
+        return cost_cents, tokens_input + max_tokens
+
+    def _template_draft(self, lead: LeadSnapshot) -> str:
+        """
+        Fallback draft used when no LLM is configured
+        """
+        name = lead.name or "there"
+        company = lead.company or "your industry"
+        return f"Hi {name},\n\nI noticed your company is doing interesting work in {company}.\n\nI'd love to discuss how our AI agents could help with your sales process.\n\nWould you be open to a brief call next week?\n\nBest regards,\nSales Agent"
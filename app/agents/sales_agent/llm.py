@@ -0,0 +1,100 @@
+"""
+LLM client used by the sales agent
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional
+from app.core.config import settings
+
+# Prices in cents per 1M tokens (input, output)
+MODEL_PRICING = {
+    "gpt-4o-mini": (15, 60),
+    "gpt-4o": (250, 1000),
+}
+
+@dataclass
+class LLMResult:
+    text: str
+    model: str
+    tokens_input: int = 0
+    tokens_output: int = 0
+
+    @property
+    def cost_cents(self) -> float:
+        return estimate_cost_cents(self.model, self.tokens_input, self.tokens_output)
+
+def estimate_cost_cents(model: str, tokens_input: int, tokens_output: int) -> float:
+    """
+    Estimate the cost of a call in (fractional) cents
+    """
+    input_price, output_price = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o"])
+    return (tokens_input * input_price + tokens_output * output_price) / 1_000_000
+
+class LLMClient:
+    """
+    Thin async wrapper over the OpenAI chat completions API
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=api_key or settings.OPENAI_API_KEY)
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        **kwargs
+    ) -> LLMResult:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            **kwargs
+        )
+        usage = response.usage
+        return LLMResult(
+            text=response.choices[0].message.content or "",
+            model=model,
+            tokens_input=usage.prompt_tokens if usage else 0,
+            tokens_output=usage.completion_tokens if usage else 0
+        )
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        on_delta: Callable[[str], None],
+        **kwargs
+    ) -> LLMResult:
+        """
+        Stream a completion, calling on_delta for each text chunk
+        """
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+        parts: List[str] = []
+        usage = None
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                delta = choice.delta.content if choice.delta else None
+                if delta:
+                    parts.append(delta)
+                    on_delta(delta)
+        return LLMResult(
+            text="".join(parts),
+            model=model,
+            tokens_input=usage.prompt_tokens if usage else 0,
+            tokens_output=usage.completion_tokens if usage else 0
+        )
+
+def get_llm_client() -> Optional[LLMClient]:
+    """
+    Return an LLM client, or None when no API key is configured
+    """
+    if not settings.OPENAI_API_KEY:
+        return None
+    return LLMClient()
@@ -0,0 +1,209 @@
+"""
+Latency-aware routing between the primary and fallback models
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import AgentExecutionException
+from app.agents.sales_agent.llm import LLMResult
+
+ModelCall = Callable[[str], Awaitable[LLMResult]]
+
+class ModelStats:
+    """
+    Rolling latency and error-rate window for a single model
+    """
+
+    def __init__(self, window: int):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+
+    def record(self, latency: float, success: bool):
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "samples": len(self.outcomes)
+        }
+
+class ModelRouter:
+    """
+    Routes LLM calls to the primary model, hedging with the fallback model
+    when the primary is slow and failing over when it errors.
+
+    Each call returns a routing decision suitable for the agent trajectory.
+    """
+
+    def __init__(
+        self,
+        primary: str,
+        fallback: str,
+        hedge_delay_ms: float = 0,
+        window: int = 200,
+        error_rate_threshold: float = 0.5,
+        min_samples: int = 20
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.hedge_delay_ms = hedge_delay_ms
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.stats: Dict[str, ModelStats] = {
+            primary: ModelStats(window),
+            fallback: ModelStats(window),
+        }
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        return cls(
+            primary=settings.PRIMARY_MODEL,
+            fallback=settings.FALLBACK_MODEL,
+            hedge_delay_ms=settings.MODEL_HEDGE_DELAY_MS,
+            window=settings.MODEL_ROUTER_WINDOW,
+            error_rate_threshold=settings.MODEL_ROUTER_ERROR_THRESHOLD
+        )
+
+    def _healthy(self, model: str) -> bool:
+        stats = self.stats[model]
+        if len(stats.outcomes) < self.min_samples:
+            return True
+        return stats.error_rate < self.error_rate_threshold
+
+    def model_order(self) -> Tuple[str, str]:
+        """
+        Return (first, second) choice; an unhealthy primary is demoted
+        """
+        if not self._healthy(self.primary) and self._healthy(self.fallback):
+            return self.fallback, self.primary
+        return self.primary, self.fallback
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """
+        Seconds to wait on a model before hedging, or None to not hedge. A
+        configured delay of 0 means hedge at the model's observed p95, so
+        only its slowest calls pay for a second one; until it has
+        min_samples there is no p95 to go by and calls aren't hedged.
+        """
+        if self.hedge_delay_ms > 0:
+            return self.hedge_delay_ms / 1000
+        stats = self.stats[model]
+        if len(stats.latencies) < self.min_samples:
+            return None
+        return stats.percentile(95)
+
+    async def _timed(self, model: str, call: ModelCall) -> LLMResult:
+        start = time.perf_counter()
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            # Losing a hedge race says nothing about the model's health
+            raise
+        except Exception:
+            self.stats[model].record(time.perf_counter() - start, False)
+            raise
+        self.stats[model].record(time.perf_counter() - start, True)
+        return result
+
+    async def complete(self, call: ModelCall) -> Tuple[LLMResult, Dict[str, Any]]:
+        """
+        Run call(model) with hedging and failover
+        """
+        first, second = self.model_order()
+        start = time.perf_counter()
+        decision: Dict[str, Any] = {
+            "type": "model_routing",
+            "first_choice": first,
+            "hedged": False,
+            "failover": False,
+            "stats": {model: stats.snapshot() for model, stats in self.stats.items()},
+        }
+
+        first_task = asyncio.ensure_future(self._timed(first, call))
+        tasks: Dict[asyncio.Future, str] = {first_task: first}
+        errors: List[str] = []
+
+        try:
+            delay = self.hedge_delay(first)
+            done, _ = await asyncio.wait({first_task}, timeout=delay)
+            if not done:
+                decision["hedged"] = True
+                decision["hedge_after_ms"] = round(delay * 1000, 1)
+                tasks[asyncio.ensure_future(self._timed(second, call))] = second
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        decision["selected"] = tasks[task]
+                        abandoned = [
+                            model for other, model in tasks.items()
+                            if other is not task and not (other.done() and other.exception() is not None)
+                        ]
+                        if abandoned:
+                            # Cancelled below (or discarded), so they report no
+                            # usage; callers bill an estimate, see abandoned_usage
+                            decision["abandoned"] = abandoned
+                        decision["failover"] = bool(errors)
+                        decision["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                        if errors:
+                            decision["errors"] = errors
+                        return task.result(), decision
+                    errors.append(f"{tasks[task]}: {task.exception()}")
+
+                if not pending and second not in tasks.values():
+                    # The first choice failed before the hedge fired
+                    task = asyncio.ensure_future(self._timed(second, call))
+                    tasks[task] = second
+                    pending = {task}
+
+            raise AgentExecutionException(f"All models failed: {'; '.join(errors)}")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+def abandoned_usage(
+    decision: Dict[str, Any],
+    messages: List[Dict[str, Any]],
+    streamed_chars: Optional[Dict[str, int]] = None
+) -> List[LLMResult]:
+    """
+    Estimated usage of the hedged calls complete() abandoned: the prompt,
+    plus whatever each had streamed
+    """
+    tokens_input = sum(len(message["content"]) for message in messages) // 4 + 1
+    return [
+        LLMResult(
+            text="",
+            model=model,
+            tokens_input=tokens_input,
+            tokens_output=(streamed_chars or {}).get(model, 0) // 4
+        )
+        for model in decision.get("abandoned", [])
+    ]
+
+# Create a global instance
+MODEL_ROUTER = ModelRouter.from_settings()
@@ -1,16 +1,71 @@
+from dataclasses import dataclass, asdict, fields
 from typing import TypedDict, List, Dict, Any, Optional
 from datetime import datetime
-from app.db.models.lead import Lead
+import copy
+import json
+
+@dataclass(frozen=True, slots=True)
+class LeadSnapshot:
+    """
+    Immutable copy of the lead fields the agent needs.
+
+    Unlike the ORM object it has no session attached, so it can be pickled
+    to worker processes and the DB connection can be released mid-run.
+    """
+    id: str
+    tenant_id: str
+    user_id: Optional[str] = None
+    email: Optional[str] = None
+    name: Optional[str] = None
+    company: Optional[str] = None
+    domain: Optional[str] = None
+    title: Optional[str] = None
+    linkedin_url: Optional[str] = None
+    phone: Optional[str] = None
+    status: Optional[str] = None
+    source: Optional[str] = None
+    enriched_data: Optional[Dict[str, Any]] = None  # Treat as read-only
+
+    @classmethod
+    def from_orm(cls, lead: Any) -> "LeadSnapshot":
+        return cls(
+            id=str(lead.id),
+            tenant_id=str(lead.tenant_id),
+            user_id=str(lead.user_id) if lead.user_id else None,
+            email=lead.email,
+            name=lead.name,
+            company=lead.company,
+            domain=lead.domain,
+            title=lead.title,
+            linkedin_url=lead.linkedin_url,
+            phone=lead.phone,
+            status=lead.status,
+            source=lead.source,
+            enriched_data=copy.deepcopy(lead.enriched_data) if lead.enriched_data else None
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LeadSnapshot":
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
 
 class AgentState(TypedDict, total=False):
     """
     The complete state for the sales agent workflow
     """
     # Input parameters
-    lead: Lead
+    execution_id: str  # Topic for live progress events
+    lead: LeadSnapshot
     user_id: str
     tenant_id: str
     agent_type: str  # research, outreach, follow-up
+    priority: str  # interactive, bulk
+    budget_limits: Dict[str, Any]  # Snapshot of Tenant.limits
+    previous_emails: List[str]  # Emails already sent to the lead, for duplicate checks
+    sender_contacts: List[str]  # Sender's own addresses and numbers, allowed in drafts
     
     # Execution plan
     plan: List[str]
@@ -20,15 +75,77 @@ class AgentState(TypedDict, total=False):
     # Working memory
     research_results: Dict[str, Any]
     enriched_data: Dict[str, Any]
+    knowledge_results: List[Dict[str, Any]]  # Knowledge base chunks for the draft
     draft_email: str
     verification_result: Dict[str, Any]
     
     # Execution context
     trajectory: List[Dict[str, Any]]  # For audit trail
-    tokens_used: int
+    tokens_used: int  # Input + output tokens
+    tokens_output: int
     execution_time: float
     success: bool
     error: Optional[str]
     
     # Cost tracking
-    cost_cents: int
\ No newline at end of file
+    cost_cents: float  # Fractional cents, rounded when persisted
+
+def initial_state(
+    execution_id: str,
+    lead: LeadSnapshot,
+    user_id: str,
+    tenant_id: str,
+    agent_type: str = "research",
+    priority: str = "interactive",
+    budget_limits: Optional[Dict[str, Any]] = None,
+    previous_emails: Optional[List[str]] = None,
+    sender_contacts: Optional[List[str]] = None
+) -> AgentState:
+    """
+    Build the starting state for a run
+    """
+    return {
+        "execution_id": execution_id,
+        "lead": lead,
+        "user_id": user_id,
+        "tenant_id": tenant_id,
+        "agent_type": agent_type,
+        "priority": priority,
+        "budget_limits": budget_limits or {},
+        "previous_emails": previous_emails or [],
+        "sender_contacts": sender_contacts or [],
+        "plan": [],
+        "current_step": "initialized",
+        "step_history": [],
+        "research_results": {},
+        "enriched_data": {},
+        "knowledge_results": [],
+        "draft_email": "",
+        "verification_result": {},
+        "trajectory": [],
+        "tokens_used": 0,
+        "tokens_output": 0,
+        "execution_time": 0,
+        "success": False,
+        "error": None,
+        "cost_cents": 0
+    }
+
+def dump_state(state: AgentState) -> bytes:
+    """
+    Serialize an AgentState to compact JSON bytes (for checkpoints or
+    handing an execution to another process)
+    """
+    data = dict(state)
+    if isinstance(data.get("lead"), LeadSnapshot):
+        data["lead"] = data["lead"].to_dict()
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+
+def load_state(data: bytes) -> AgentState:
+    """
+    Restore an AgentState produced by dump_state
+    """
+    state: AgentState = json.loads(data)
+    if state.get("lead") is not None:
+        state["lead"] = LeadSnapshot.from_dict(state["lead"])
+    return state
\ No newline at end of file
@@ -1,10 +1,12 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Generator
+from typing import Any, Awaitable, Callable, Generator, Optional
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.services.auth.jwt import verify_token
 from app.db.models.user import User
+from app.core.exceptions import IdempotencyKeyInProgressException, IdempotencyKeyReusedException
+from app.core.idempotency import IDEMPOTENCY_STORE
 
 security = HTTPBearer()
 
@@ -46,4 +48,29 @@ async def get_current_admin(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied: Admin privileges required",
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_idempotency_key(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+) -> Optional[str]:
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Idempotency-Key must be between 1 and 255 characters",
+        )
+    return idempotency_key
+
+
+async def run_idempotent(
+    user: User,
+    idempotency_key: Optional[str],
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = 200
+) -> Any:
+    try:
+        return await IDEMPOTENCY_STORE.run(user.tenant_id, idempotency_key, fingerprint, handler, status_code)
+    except IdempotencyKeyReusedException as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyKeyInProgressException as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
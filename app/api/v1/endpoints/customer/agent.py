@@ -1,45 +1,208 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_db, SessionLocal
 from app.db.models.user import User
-from app.schemas.agent import AgentExecutionResponse
+from app.schemas.agent import AgentExecutionResponse, AgentBatchRequest
 from app.services.customer.agent_service import AgentService
-from app.api.deps import get_current_user
-from app.core.exceptions import LeadNotFoundException
+from app.api.deps import get_current_user, get_idempotency_key, run_idempotent
+from app.core.exceptions import LeadNotFoundException, BudgetExceededException
+from app.core.idempotency import request_fingerprint
+from app.agents.sales_agent.events import AGENT_EVENTS
+import asyncio
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Keep references to detached batch and stream runners so they aren't
+# garbage collected
+_batch_tasks = set()
+_stream_tasks = set()
+
 @router.post("/execute/{lead_id}")
 async def execute_agent(
     lead_id: str,
     agent_type: str = "research",
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Execute the sales agent for a specific lead
+    Execute the sales agent for a specific lead.
+
+    With an Idempotency-Key header, retries get the original response
+    instead of running the agent again.
     """
     agent_service = AgentService(db, current_user)
-    result = await agent_service.execute_agent(lead_id, agent_type)
-    
-    if not result:
-        raise HTTPException(status_code=500, detail="Agent execution failed")
-    
-    return result
+
+    async def run():
+        try:
+            result = await agent_service.execute_agent(lead_id, agent_type)
+        except BudgetExceededException as e:
+            raise HTTPException(status_code=402, detail=str(e))
+
+        if not result:
+            raise HTTPException(status_code=500, detail="Agent execution failed")
+
+        return result
+
+    fingerprint = request_fingerprint(current_user.id, "execute", lead_id, agent_type)
+    return await run_idempotent(current_user, idempotency_key, fingerprint, run)
+
+@router.post("/execute/{lead_id}/stream")
+async def stream_agent_execution(
+    lead_id: str,
+    agent_type: str = "research",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Execute the sales agent and stream its progress as Server-Sent Events.
+
+    Emits `step` events for each step_history entry, `token` events with
+    draft_email deltas, and a final `completed` or `failed` event.
+    """
+    if not AgentService(db, current_user).has_lead(lead_id):
+        raise HTTPException(status_code=404, detail="Lead not found")
+
+    execution_id = str(uuid.uuid4())
+
+    async def run_execution():
+        # The execution outlives the request, so it gets its own session
+        # instead of the one tied to the request
+        db = SessionLocal()
+        try:
+            await AgentService(db, current_user).execute_agent(
+                lead_id, agent_type, execution_id=execution_id
+            )
+        except Exception as e:
+            logger.error(f"Streamed agent execution {execution_id} failed: {str(e)}")
+        finally:
+            db.close()
+
+    async def event_stream():
+        # Subscribe and start only once the response is being sent, so a
+        # client that goes away first leaves no subscriber behind; starting
+        # after subscribing means no early events are missed
+        subscription = AGENT_EVENTS.subscribe(execution_id)
+        try:
+            task = asyncio.create_task(run_execution())
+            _stream_tasks.add(task)
+            task.add_done_callback(_stream_tasks.discard)
+
+            sequence = 0
+            yield format_sse("started", {"execution_id": execution_id}, sequence)
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.AGENT_EVENT_HEARTBEAT_SECONDS)
+                except StopAsyncIteration:
+                    break
+                if event is None:
+                    # Keep idle connections open through proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                sequence += 1
+                yield format_sse(event.get("type", "message"), event, sequence)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/execute-batch", status_code=202)
+async def execute_agent_batch(
+    request: AgentBatchRequest,
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queue the sales agent for many leads as bulk work.
+
+    Returns immediately with an execution ID per lead; each run is saved
+    (and can be fetched) once it completes. Bulk runs yield to interactive
+    ones and are shared fairly with other tenants' batches. A retry with
+    the same Idempotency-Key returns the original execution IDs without
+    queueing the batch again.
+    """
+    if len(request.lead_ids) > settings.AGENT_BATCH_MAX_LEADS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {settings.AGENT_BATCH_MAX_LEADS} leads"
+        )
+
+    async def queue():
+        executions = [
+            {"lead_id": lead_id, "execution_id": str(uuid.uuid4())}
+            for lead_id in request.lead_ids
+        ]
+        task = asyncio.create_task(run_batch(current_user, request.agent_type, executions))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+        return {"executions": executions, "total": len(executions)}
+
+    fingerprint = request_fingerprint(current_user.id, "execute-batch", request)
+    return await run_idempotent(current_user, idempotency_key, fingerprint, queue, status_code=202)
+
+async def run_batch(user: User, agent_type: str, executions: List[Dict[str, str]]):
+    """
+    Feed a batch to the scheduler, keeping at most AGENT_BATCH_WINDOW of
+    its runs queued or running so large batches don't pile up tasks
+    """
+    window = asyncio.Semaphore(settings.AGENT_BATCH_WINDOW)
+    running = set()
+
+    async def run_one(lead_id: str, execution_id: str):
+        db = SessionLocal()
+        try:
+            await AgentService(db, user).execute_agent(
+                lead_id, agent_type, execution_id=execution_id, priority="bulk"
+            )
+        except Exception as e:
+            logger.error(f"Batch agent execution {execution_id} failed: {str(e)}")
+        finally:
+            db.close()
+            window.release()
+
+    for item in executions:
+        await window.acquire()
+        task = asyncio.create_task(run_one(item["lead_id"], item["execution_id"]))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    if running:
+        await asyncio.gather(*running)
+
+def format_sse(event: str, data: Dict[str, Any], event_id: int) -> str:
+    """
+    Serialize an event in Server-Sent Events wire format
+    """
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 @router.get("/executions")
 async def get_agent_executions(
     skip: int = 0,
     limit: int = 50,
+    include_trajectory: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get agent execution history for the current user
+    Get agent execution history for the current user.
+    Trajectories are omitted unless include_trajectory is set.
     """
     agent_service = AgentService(db, current_user)
-    executions = await agent_service.get_executions(skip=skip, limit=limit)
+    executions = await agent_service.get_executions(
+        skip=skip, limit=limit, include_trajectory=include_trajectory
+    )
     return {"executions": executions, "total": len(executions)}
 
 @router.get("/executions/{execution_id}")
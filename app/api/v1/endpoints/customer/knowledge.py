@@ -0,0 +1,189 @@
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import get_db
+from app.db.models.user import User
+from app.db.models.knowledge_ingestion import KnowledgeIngestion
+from app.schemas.knowledge import (
+    KnowledgeDocumentBatch,
+    KnowledgeEntryResponse,
+    KnowledgeEntryUpdate,
+    KnowledgeIngestionResponse
+)
+from app.services.customer.knowledge_service import KnowledgeService
+from app.services.knowledge.ingestion import KNOWLEDGE_INGESTION, document_format, spool_documents, spool_upload
+from app.api.deps import get_current_user
+import asyncio
+import os
+import uuid
+
+router = APIRouter()
+
+def ingestion_to_response(ingestion: KnowledgeIngestion) -> KnowledgeIngestionResponse:
+    return KnowledgeIngestionResponse(
+        id=str(ingestion.id),
+        status=ingestion.status,
+        files=ingestion.files or [],
+        documents_total=ingestion.documents_total or 0,
+        documents_processed=ingestion.documents_processed or 0,
+        chunks_total=ingestion.chunks_total or 0,
+        chunks_inserted=ingestion.chunks_inserted or 0,
+        chunks_duplicate=ingestion.chunks_duplicate or 0,
+        chunks_failed=ingestion.chunks_failed or 0,
+        errors=ingestion.errors or [],
+        created_at=ingestion.created_at,
+        started_at=ingestion.started_at,
+        finished_at=ingestion.finished_at
+    )
+
+@router.post("/ingestions", response_model=KnowledgeIngestionResponse, status_code=202)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    category: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    source: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload documents to the knowledge base.
+
+    Accepts .jsonl/.ndjson files (one {"content", "title", "category",
+    "tags", "source"} object per line) and .txt/.md files (one document
+    each). category, tags (comma-separated) and source apply to documents
+    that don't set their own. The upload is chunked, deduplicated,
+    embedded and indexed in the background; poll the returned ingestion
+    for progress.
+    """
+    for upload in files:
+        if document_format(upload.filename) is None:
+            raise HTTPException(status_code=415, detail=f"Unsupported file type: {upload.filename}")
+
+    directory = KNOWLEDGE_INGESTION.spool_directory()
+    spooled = []
+    remaining = settings.KNOWLEDGE_UPLOAD_MAX_BYTES
+    try:
+        for upload in files:
+            spooled.append(await spool_upload(upload, directory, remaining))
+            remaining -= spooled[-1].size
+    except ValueError:
+        for item in spooled:
+            os.remove(item.path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Uploads may total at most {settings.KNOWLEDGE_UPLOAD_MAX_BYTES} bytes"
+        )
+
+    defaults = {
+        "category": category,
+        "tags": [tag.strip() for tag in (tags or "").split(",") if tag.strip()],
+        "source": source
+    }
+    ingestion = KNOWLEDGE_INGESTION.create(db, current_user.tenant_id, current_user.id, spooled)
+    KNOWLEDGE_INGESTION.start(str(ingestion.id), str(current_user.tenant_id), current_user.id, spooled, defaults)
+    return ingestion_to_response(ingestion)
+
+@router.post("/documents", response_model=KnowledgeIngestionResponse, status_code=202)
+async def add_documents(
+    batch: KnowledgeDocumentBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Add documents given as JSON; they go through the same pipeline as uploads
+    """
+    spooled = await asyncio.get_running_loop().run_in_executor(
+        None,
+        spool_documents,
+        [document.model_dump() for document in batch.documents],
+        KNOWLEDGE_INGESTION.spool_directory()
+    )
+    ingestion = KNOWLEDGE_INGESTION.create(db, current_user.tenant_id, current_user.id, [spooled])
+    KNOWLEDGE_INGESTION.start(str(ingestion.id), str(current_user.tenant_id), current_user.id, [spooled])
+    return ingestion_to_response(ingestion)
+
+@router.get("/ingestions", response_model=List[KnowledgeIngestionResponse])
+async def list_ingestions(
+    skip: int = 0,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List the tenant's ingestions, newest first
+    """
+    ingestions = db.query(KnowledgeIngestion).filter(
+        KnowledgeIngestion.tenant_id == current_user.tenant_id
+    ).order_by(KnowledgeIngestion.created_at.desc()).offset(skip).limit(limit).all()
+    return [ingestion_to_response(ingestion) for ingestion in ingestions]
+
+@router.get("/ingestions/{ingestion_id}", response_model=KnowledgeIngestionResponse)
+async def get_ingestion(
+    ingestion_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get an ingestion's status and progress
+    """
+    try:
+        ingestion_uuid = uuid.UUID(ingestion_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Ingestion not found")
+    ingestion = db.query(KnowledgeIngestion).filter(
+        KnowledgeIngestion.id == ingestion_uuid,
+        KnowledgeIngestion.tenant_id == current_user.tenant_id
+    ).first()
+    if not ingestion:
+        raise HTTPException(status_code=404, detail="Ingestion not found")
+    return ingestion_to_response(ingestion)
+
+@router.get("/entries/{entry_id}", response_model=KnowledgeEntryResponse)
+async def get_entry(
+    entry_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a knowledge base entry by ID
+    """
+    knowledge_service = KnowledgeService(db, current_user)
+    entry = await knowledge_service.get_entry(entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return entry
+
+@router.patch("/entries/{entry_id}", response_model=KnowledgeEntryResponse)
+async def update_entry(
+    entry_id: str,
+    entry_in: KnowledgeEntryUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Update a knowledge base entry; the search index follows immediately
+    """
+    knowledge_service = KnowledgeService(db, current_user)
+    try:
+        entry = await knowledge_service.update_entry(entry_id, entry_in)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return entry
+
+@router.delete("/entries/{entry_id}")
+async def delete_entry(
+    entry_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete a knowledge base entry
+    """
+    knowledge_service = KnowledgeService(db, current_user)
+    success = await knowledge_service.delete_entry(entry_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"message": "Entry deleted successfully"}
@@ -33,4 +33,23 @@ class UserNotFoundException(Exception):
 class UnauthorizedException(Exception):
     """Raised when a user is not authorized to perform an action"""
     def __init__(self, message: str = "Unauthorized"):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+class BudgetExceededException(Exception):
+    """Raised when a tenant's token or cost budget would be exceeded"""
+    def __init__(self, tenant_id: str, limit_name: str):
+        self.tenant_id = tenant_id
+        self.limit_name = limit_name
+        super().__init__(f"Tenant {tenant_id} has exhausted its {limit_name} budget")
+
+class IdempotencyKeyReusedException(Exception):
+    """Raised when an Idempotency-Key is reused for a different request"""
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency-Key {key} was already used for a different request")
+
+class IdempotencyKeyInProgressException(Exception):
+    """Raised when the request holding an Idempotency-Key is still running"""
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"A request with Idempotency-Key {key} is still in progress")
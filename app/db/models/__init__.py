@@ -1,8 +1,12 @@
 from app.db.models.user import User
 from app.db.models.tenant import Tenant
 from app.db.models.lead import Lead
-from app.db.models.agent_execution import AgentExecution
+from app.db.models.agent_execution import AgentExecution, AgentExecutionPayload
 from app.db.models.knowledge_base import KnowledgeBase
+from app.db.models.knowledge_ingestion import KnowledgeIngestion
 from app.db.models.usage_metrics import UsageMetrics
 from app.db.models.audit_log import AuditLog
-from app.db.models.campaign import Campaign, CampaignStep, CampaignAssignment
\ No newline at end of file
+from app.db.models.campaign import Campaign, CampaignStep, CampaignAssignment
+from app.db.models.company_profile import CompanyProfile
+from app.db.models.email_fingerprint import EmailFingerprint
+from app.db.models.idempotency_key import IdempotencyKey
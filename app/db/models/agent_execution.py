@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger, Text, ForeignKey, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,7 +13,7 @@ class AgentExecution(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     lead_id = Column(UUID(as_uuid=True), ForeignKey("leads.id"), nullable=False, index=True)
     agent_type = Column(String, nullable=False, index=True)  # research, outreach, follow-up, etc.
-    trajectory = Column(JSONB)  # Execution steps and results
+    trajectory = Column(JSONB)  # Versioned step document, see agents/sales_agent/trajectory.py
     success = Column(Boolean, default=False)
     tokens_input = Column(Integer, default=0)
     tokens_output = Column(Integer, default=0)
@@ -27,6 +27,24 @@ class AgentExecution(Base):
     tenant = relationship("Tenant", back_populates="agent_executions")
     user = relationship("User", back_populates="agent_executions")
     lead = relationship("Lead", back_populates="agent_executions")
+    payloads = relationship("AgentExecutionPayload", back_populates="execution", cascade="all, delete-orphan")
 
     def __repr__(self):
-        return f"<AgentExecution(id={self.id}, agent_type={self.agent_type}, success={self.success})>"
\ No newline at end of file
+        return f"<AgentExecution(id={self.id}, agent_type={self.agent_type}, success={self.success})>"
+
+class AgentExecutionPayload(Base):
+    __tablename__ = "agent_execution_payloads"
+
+    id = Column(BigInteger, primary_key=True)
+    execution_id = Column(UUID(as_uuid=True), ForeignKey("agent_executions.id"), nullable=False, index=True)
+    step_index = Column(Integer, nullable=False)  # Index into trajectory["steps"]
+    codec = Column(String, nullable=False)  # zstd, zlib
+    data = Column(LargeBinary, nullable=False)  # Compressed JSON of the full step
+    raw_size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    execution = relationship("AgentExecution", back_populates="payloads")
+
+    def __repr__(self):
+        return f"<AgentExecutionPayload(execution_id={self.execution_id}, step_index={self.step_index}, codec={self.codec})>"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -48,6 +48,10 @@ class CampaignStep(Base):
 
 class CampaignAssignment(Base):
     __tablename__ = "campaign_assignments"
+    __table_args__ = (
+        Index("ix_campaign_assignments_status_next_action_date", "status", "next_action_date"),
+        UniqueConstraint("campaign_id", "lead_id", name="uq_campaign_assignments_campaign_lead"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.id"), nullable=False, index=True)
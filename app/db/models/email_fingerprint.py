@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.db.base import Base
+
+class EmailFingerprint(Base):
+    __tablename__ = "email_fingerprints"
+    __table_args__ = (
+        Index("ix_email_fingerprints_tenant_created", "tenant_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=False)
+    domain = Column(String, nullable=False)  # Normalized recipient company domain
+    source = Column(String, nullable=False)  # draft, campaign
+    source_id = Column(String)  # Execution or campaign step ID
+    signature = Column(LargeBinary, nullable=False)  # MinHash signature (uint32 array)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<EmailFingerprint(id={self.id}, domain={self.domain}, source={self.source})>"
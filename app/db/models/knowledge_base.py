@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, LargeBinary, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -7,6 +7,9 @@ from app.db.base import Base
 
 class KnowledgeBase(Base):
     __tablename__ = "knowledge_base"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "content_hash", name="uq_knowledge_base_tenant_content_hash"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), nullable=False, index=True)
@@ -15,7 +18,9 @@ class KnowledgeBase(Base):
     tags = Column(JSONB)  # Array of tags
     category = Column(String, index=True)
     source = Column(String)  # url, file, manual, etc.
-    embedding = Column(String)  # Vector embedding as JSON string
+    content_hash = Column(String(64))  # SHA-256 of the normalized content, for dedupe
+    embedding_vector = Column(LargeBinary)  # Raw little-endian float32 embedding
+    embedding_model = Column(String)  # Embedder that produced embedding_vector
     active = Column(Boolean, default=True)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class AgentExecutionBase(BaseModel):
@@ -7,7 +7,7 @@ class AgentExecutionBase(BaseModel):
     user_id: str
     lead_id: str
     agent_type: str
-    trajectory: Optional[str] = None
+    trajectory: Optional[Dict[str, Any]] = None  # {"version": 1, "steps": [...]}
     success: bool
     tokens_input: int
     tokens_output: int
@@ -28,4 +28,8 @@ class AgentExecutionResponse(AgentExecutionBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AgentBatchRequest(BaseModel):
+    lead_ids: List[str]
+    agent_type: str = "research"
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
@@ -36,6 +36,26 @@ class CampaignUpdate(BaseModel):
     description: Optional[str] = None
     status: Optional[CampaignStatus] = None
 
+class CampaignLeadFilter(BaseModel):
+    status: Optional[str] = None
+    source: Optional[str] = None
+    company: Optional[str] = None
+    domain: Optional[str] = None
+    search: Optional[str] = None  # Name, email or company contains
+    has_email: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class CampaignLeadsAdd(BaseModel):
+    lead_ids: Optional[List[str]] = None
+    filter: Optional[CampaignLeadFilter] = None
+
+    @model_validator(mode="after")
+    def one_selector(self):
+        if (self.lead_ids is None) == (self.filter is None):
+            raise ValueError("Provide either lead_ids or filter")
+        return self
+
 class CampaignResponse(CampaignBase):
     id: str
     status: CampaignStatus
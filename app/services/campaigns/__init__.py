@@ -0,0 +1 @@
+from app.services.campaigns.engine import CampaignEngine, EmailSender, render_template, CAMPAIGN_ENGINE
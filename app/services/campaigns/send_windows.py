@@ -0,0 +1,118 @@
+"""
+Per-lead send windows: campaign steps run only during the recipient's
+local business hours.
+
+A lead's time zone is the IANA name enrichment stores in
+enriched_data["timezone"] (Clearbit's timeZone), falling back to
+CAMPAIGN_DEFAULT_TIMEZONE. The window itself comes from the campaign's
+config["send_window"] ({"start": "09:00", "end": "17:00", "days": [0, 1,
+2, 3, 4]}, Monday is 0), or the CAMPAIGN_SEND_* settings.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _parse_time(value: Any) -> Optional[time]:
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return time(value) if 0 <= value < 24 else None
+    try:
+        hours, minutes = str(value).split(":")
+        return time(int(hours), int(minutes))
+    except ValueError:
+        return None
+
+def _parse_days(value: Any) -> Optional[FrozenSet[int]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [part for part in value.split(",") if part.strip()]
+    try:
+        days = frozenset(int(day) for day in value)
+    except (TypeError, ValueError):
+        return None
+    return days if days and days <= set(range(7)) else None
+
+@lru_cache(maxsize=1024)
+def get_zone(name: Optional[str]) -> tzinfo:
+    """
+    ZoneInfo for an IANA name; CAMPAIGN_DEFAULT_TIMEZONE (or UTC) when
+    the name is missing or unknown
+    """
+    for candidate in (name, settings.CAMPAIGN_DEFAULT_TIMEZONE):
+        if not candidate:
+            continue
+        try:
+            return ZoneInfo(candidate)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.debug(f"Unknown time zone {candidate}")
+    return timezone.utc
+
+@dataclass(frozen=True)
+class SendWindow:
+    """
+    Local [start, end) on the given weekdays. A window with start >= end
+    or no days never holds a step back.
+    """
+    start: time
+    end: time
+    days: FrozenSet[int]
+
+    @classmethod
+    def default(cls) -> "SendWindow":
+        return _default_window(
+            settings.CAMPAIGN_SEND_WINDOW_START, settings.CAMPAIGN_SEND_WINDOW_END, settings.CAMPAIGN_SEND_DAYS
+        )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "SendWindow":
+        """
+        A campaign's config["send_window"]; unset or invalid fields keep
+        the defaults
+        """
+        window = cls.default()
+        if not isinstance(config, dict):
+            return window
+        return cls(
+            _parse_time(config.get("start")) or window.start,
+            _parse_time(config.get("end")) or window.end,
+            _parse_days(config.get("days")) or window.days
+        )
+
+    @property
+    def unrestricted(self) -> bool:
+        return self.start >= self.end or not self.days
+
+    def next_open(self, moment: datetime, zone: tzinfo) -> datetime:
+        """
+        The first time at or after moment (naive UTC) that falls in the
+        window in zone, as naive UTC
+        """
+        if self.unrestricted:
+            return moment
+        local = moment.replace(tzinfo=timezone.utc).astimezone(zone)
+        day: date = local.date()
+        for offset in range(8):
+            current = day + timedelta(days=offset)
+            if current.weekday() not in self.days:
+                continue
+            # Wall-clock times; zoneinfo resolves DST gaps and folds
+            opens = datetime.combine(current, self.start, tzinfo=zone)
+            if offset == 0:
+                if local >= datetime.combine(current, self.end, tzinfo=zone):
+                    continue
+                if local >= opens:
+                    return moment
+            return opens.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment
+
+@lru_cache(maxsize=16)
+def _default_window(start: str, end: str, days: str) -> SendWindow:
+    return SendWindow(_parse_time(start) or time(9), _parse_time(end) or time(17), _parse_days(days) or frozenset(range(5)))
@@ -0,0 +1,143 @@
+"""
+Hierarchical timer wheel for scheduled campaign steps.
+
+Time is counted in ticks of `resolution` seconds. Level 0 has one slot
+per tick; each higher level's slot spans a whole rotation of the level
+below (with the default 256/64/64/64 slots: 1s, 4m16s, 4h33m and 12d3h
+per slot). A timer goes into the lowest level that reaches its expiry
+and moves down a level each time the slot it sits in comes around, so
+scheduling is O(1), firing is O(1) per timer, and a timer is never more
+than one tick late. Timers beyond the top level's rotation wait in its
+farthest slot and are placed again each time it comes around.
+
+Timers are keyed; scheduling a key again replaces its timer. Replaced and
+cancelled timers stay in their slots and are skipped when reached.
+"""
+import time
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+DEFAULT_SLOTS = (256, 64, 64, 64)
+
+class TimerWheel:
+    def __init__(self, resolution: float = 1.0, slots: Sequence[int] = DEFAULT_SLOTS, now: Optional[float] = None):
+        self.resolution = resolution
+        self.slots = tuple(slots)
+        # Ticks per slot at each level
+        self.spans = [1]
+        for count in self.slots[:-1]:
+            self.spans.append(self.spans[-1] * count)
+        self.wheels: List[List[List[Tuple[Hashable, int]]]] = [[[] for _ in range(count)] for count in self.slots]
+        # Entries (live or not) per level, to skip empty stretches
+        self.counts = [0] * len(self.slots)
+        self.current = self._tick(time.time() if now is None else now)
+        self._expiries: Dict[Hashable, int] = {}
+        self._due: List[Tuple[Hashable, int]] = []
+
+    def _tick(self, moment: float) -> int:
+        return int(moment // self.resolution)
+
+    def __len__(self) -> int:
+        return len(self._expiries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._expiries
+
+    def expiry(self, key: Hashable) -> Optional[float]:
+        tick = self._expiries.get(key)
+        return None if tick is None else tick * self.resolution
+
+    def schedule(self, key: Hashable, moment: float):
+        """
+        Fire key at moment (seconds, same clock as advance); a moment
+        already passed fires on the next advance
+        """
+        expiry = max(self._tick(moment), self.current)
+        self._expiries[key] = expiry
+        self._place(key, expiry)
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._expiries.pop(key, None) is not None
+
+    def _place(self, key: Hashable, expiry: int):
+        delta = expiry - self.current
+        if delta <= 0:
+            self._due.append((key, expiry))
+            return
+        if delta < self.slots[0]:
+            self.wheels[0][expiry % self.slots[0]].append((key, expiry))
+            self.counts[0] += 1
+            return
+        for level in range(1, len(self.slots)):
+            span = self.spans[level]
+            if expiry // span - self.current // span < self.slots[level]:
+                self.wheels[level][(expiry // span) % self.slots[level]].append((key, expiry))
+                self.counts[level] += 1
+                return
+        # Past the top level: park in its farthest slot
+        level = len(self.slots) - 1
+        span = self.spans[level]
+        self.wheels[level][(self.current // span - 1) % self.slots[level]].append((key, expiry))
+        self.counts[level] += 1
+
+    def advance(self, moment: float) -> List[Hashable]:
+        """
+        Move the wheel to moment and return the keys whose timers expired,
+        earliest first
+        """
+        target = self._tick(moment)
+        fired: List[Hashable] = []
+        self._collect(self._due, fired)
+        self._due = []
+        while self.current < target:
+            self._skip(target)
+            if self.current >= target:
+                break
+            self.current += 1
+            self._cascade()
+            slot = self.wheels[0][self.current % self.slots[0]]
+            if slot:
+                self.wheels[0][self.current % self.slots[0]] = []
+                self.counts[0] -= len(slot)
+                self._collect(slot, fired)
+            if self._due:
+                self._collect(self._due, fired)
+                self._due = []
+        return fired
+
+    def _skip(self, target: int):
+        # With every level below L empty, nothing happens before level L's
+        # next slot boundary; jump to just before it
+        for level, count in enumerate(self.counts):
+            if count:
+                break
+        else:
+            self.current = target
+            return
+        if level:
+            boundary = (self.current // self.spans[level] + 1) * self.spans[level]
+            self.current = min(target, boundary - 1)
+
+    def _cascade(self):
+        # Highest level whose slot boundary is this tick; empty its slots
+        # from the top down so timers can drop more than one level
+        top = 0
+        for level in range(1, len(self.slots)):
+            if self.current % self.spans[level]:
+                break
+            top = level
+        for level in range(top, 0, -1):
+            index = (self.current // self.spans[level]) % self.slots[level]
+            entries = self.wheels[level][index]
+            if not entries:
+                continue
+            self.wheels[level][index] = []
+            self.counts[level] -= len(entries)
+            for key, expiry in entries:
+                if self._expiries.get(key) == expiry:
+                    self._place(key, expiry)
+
+    def _collect(self, entries: List[Tuple[Hashable, int]], fired: List[Hashable]):
+        for key, expiry in entries:
+            if self._expiries.get(key) == expiry:
+                del self._expiries[key]
+                fired.append(key)
@@ -1,24 +1,103 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, defer
 from datetime import datetime
+from app.core.config import settings
 from app.db.models.user import User
 from app.db.models.lead import Lead
-from app.db.models.agent_execution import AgentExecution
+from app.db.models.tenant import Tenant
+from app.db.models.agent_execution import AgentExecution, AgentExecutionPayload
+from app.db.models.campaign import CampaignAssignment, CampaignStep
 from app.schemas.agent import AgentExecutionResponse
 from app.agents.sales_agent.graph import SalesAgent
-from app.agents.sales_agent.state import AgentState
+from app.agents.sales_agent.state import LeadSnapshot, initial_state
+from app.agents.sales_agent.events import AGENT_EVENTS
+from app.agents.sales_agent.scheduler import AGENT_SCHEDULER
+from app.observability.instrumentation import instrument_execution
+from app.agents.sales_agent.trajectory import encode_trajectory, decode_trajectory
+from app.agents.sales_agent.tools import is_fallback
+import math
 import uuid
 
+# Earlier emails a new draft is compared against, at most
+PREVIOUS_EMAILS_LIMIT = 20
+
+def merge_enrichment(
+    existing: Optional[Dict[str, Any]],
+    enriched: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    The lead's enriched_data with a run's enrichment merged in, or None
+    when there is nothing to write. Stand-in results are skipped, and
+    fields the provider left empty keep the lead's value.
+    """
+    if is_fallback(enriched):
+        return None
+    found = {key: value for key, value in enriched.items() if value is not None}
+    if not found:
+        return None
+    return {**(existing or {}), **found}
+
 class AgentService:
     def __init__(self, db: Session, user: User):
         self.db = db
         self.user = user
         self.tenant_id = user.tenant_id
 
-    async def execute_agent(self, lead_id: str, agent_type: str = "research") -> Optional[AgentExecutionResponse]:
+    async def execute_agent(
+        self,
+        lead_id: str,
+        agent_type: str = "research",
+        execution_id: Optional[str] = None,
+        priority: str = "interactive"
+    ) -> Optional[AgentExecutionResponse]:
+        """
+        Execute a sales agent on a lead.
+
+        The run waits for a slot in AGENT_SCHEDULER, which shares capacity
+        fairly between tenants; priority is "interactive" or "bulk".
+        Progress is published to AGENT_EVENTS under the execution ID, and the
+        topic is closed once the execution finishes either way.
+        """
+        execution_id = execution_id or str(uuid.uuid4())
+        try:
+            plan = self.db.query(Tenant.plan).filter(Tenant.id == self.tenant_id).scalar()
+            # Don't hold a connection while queued
+            self.db.close()
+            async with AGENT_SCHEDULER.slot(self.tenant_id, plan, priority):
+                response = await self._execute_agent(lead_id, agent_type, execution_id, priority)
+        except Exception as e:
+            AGENT_EVENTS.publish(execution_id, {"type": "failed", "error": str(e)})
+            raise
+        else:
+            if response is None:
+                AGENT_EVENTS.publish(execution_id, {"type": "failed", "error": "Lead not found"})
+            else:
+                AGENT_EVENTS.publish(execution_id, {
+                    "type": "completed",
+                    "execution": response.model_dump(mode="json")
+                })
+            return response
+        finally:
+            AGENT_EVENTS.close(execution_id)
+
+    def has_lead(self, lead_id: str) -> bool:
         """
-        Execute a sales agent on a lead
+        Whether the lead exists for the current tenant
         """
+        return self.db.query(
+            self.db.query(Lead).filter(
+                Lead.id == lead_id,
+                Lead.tenant_id == self.tenant_id
+            ).exists()
+        ).scalar()
+
+    async def _execute_agent(
+        self,
+        lead_id: str,
+        agent_type: str,
+        execution_id: str,
+        priority: str = "interactive"
+    ) -> Optional[AgentExecutionResponse]:
         # Get the lead
         lead = self.db.query(Lead).filter(
             Lead.id == lead_id,
@@ -28,106 +107,132 @@ class AgentService:
         if not lead:
             return None
 
+        # The agent works on a detached snapshot, so the connection can go
+        # back to the pool for the (long) duration of the run
+        snapshot = LeadSnapshot.from_orm(lead)
+        budget_limits = self.db.query(Tenant.limits).filter(Tenant.id == self.tenant_id).scalar()
+        previous_emails = self._previous_emails(lead.id)
+        self.db.close()
+
         # Create initial state
-        initial_state: AgentState = {
-            "lead": lead,
-            "user_id": str(self.user.id),
-            "tenant_id": str(self.tenant_id),
-            "agent_type": agent_type,
-            "plan": [],
-            "current_step": "initialized",
-            "step_history": [],
-            "research_results": {},
-            "enriched_data": {},
-            "draft_email": "",
-            "verification_result": {},
-            "trajectory": [],
-            "tokens_used": 0,
-            "execution_time": 0,
-            "success": False,
-            "error": None,
-            "cost_cents": 0
-        }
+        state = initial_state(
+            execution_id,
+            snapshot,
+            user_id=str(self.user.id),
+            tenant_id=str(self.tenant_id),
+            agent_type=agent_type,
+            priority=priority,
+            budget_limits=budget_limits,
+            previous_emails=previous_emails,
+            sender_contacts=self._sender_contacts()
+        )
 
         # Execute the agent
         agent = SalesAgent()
         start_time = datetime.utcnow()
-        result = await agent.run(initial_state)
+        async with instrument_execution(agent_type, str(self.tenant_id), snapshot.id, execution_id) as outcome:
+            result = await agent.run(state)
+            outcome["success"] = result.get("success", False)
         execution_time = (datetime.utcnow() - start_time).total_seconds()
 
+        # Company-level enrichment (possibly served from the shared cache)
+        # is merged into the lead so it doesn't have to be re-fetched
+        enriched = merge_enrichment(snapshot.enriched_data, result.get('enriched_data'))
+        if enriched is not None:
+            self.db.query(Lead).filter(Lead.id == snapshot.id).update(
+                {Lead.enriched_data: enriched},
+                synchronize_session=False
+            )
+
         # Save execution record
+        document, payloads = encode_trajectory(result.get('trajectory', []))
         execution = AgentExecution(
-            id=uuid.uuid4(),
+            id=uuid.UUID(execution_id),
             tenant_id=self.tenant_id,
             user_id=self.user.id,
-            lead_id=lead_id,
+            lead_id=snapshot.id,
             agent_type=agent_type,
-            trajectory=str(result.get('trajectory', [])),
+            trajectory=document,
             success=result.get('success', False),
-            tokens_input=result.get('tokens_used', 0),
-            tokens_output=0,  # Would track output tokens separately
-            cost_cents=result.get('cost_cents', 0),
+            tokens_input=result.get('tokens_used', 0) - result.get('tokens_output', 0),
+            tokens_output=result.get('tokens_output', 0),
+            cost_cents=math.ceil(result.get('cost_cents', 0)),
             started_at=start_time,
             completed_at=datetime.utcnow()
         )
+        execution.payloads = [AgentExecutionPayload(**payload) for payload in payloads]
         
         self.db.add(execution)
         self.db.commit()
         self.db.refresh(execution)
 
-        return AgentExecutionResponse(
-            id=str(execution.id),
-            tenant_id=str(execution.tenant_id),
-            user_id=str(execution.user_id),
-            lead_id=str(execution.lead_id),
-            agent_type=execution.agent_type,
-            trajectory=execution.trajectory or "",
-            success=execution.success,
-            tokens_input=execution.tokens_input,
-            tokens_output=execution.tokens_output,
-            cost_cents=execution.cost_cents,
-            started_at=execution.started_at,
-            completed_at=execution.completed_at,
-            created_at=execution.created_at,
-            updated_at=execution.updated_at
-        )
+        trajectory = decode_trajectory(document, {
+            payload["step_index"]: (payload["codec"], payload["data"]) for payload in payloads
+        })
+        return self.execution_to_response(execution, trajectory)
+
+    def _sender_contacts(self) -> List[str]:
+        """
+        Addresses the user's emails may go out from, for the signature
+        """
+        return [
+            contact for contact in (self.user.email, settings.CAMPAIGN_EMAIL_FROM, settings.SMTP_USER)
+            if contact
+        ]
+
+    def _previous_emails(self, lead_id: uuid.UUID) -> List[str]:
+        """
+        Content of the campaign email steps already completed for a lead
+        """
+        step_ids = []
+        for (completed,) in self.db.query(CampaignAssignment.completed_steps).filter(CampaignAssignment.lead_id == lead_id):
+            for step_id in completed or []:
+                try:
+                    step_ids.append(uuid.UUID(str(step_id)))
+                except ValueError:
+                    continue
+        if not step_ids:
+            return []
+
+        rows = self.db.query(CampaignStep.content).filter(
+            CampaignStep.id.in_(step_ids),
+            CampaignStep.type == "email"
+        ).limit(PREVIOUS_EMAILS_LIMIT).all()
+        return [content for (content,) in rows if content]
 
     async def get_executions(
         self, 
         skip: int = 0, 
-        limit: int = 50
+        limit: int = 50,
+        include_trajectory: bool = False
     ) -> List[AgentExecutionResponse]:
         """
-        Get agent execution history
+        Get agent execution history.
+
+        Trajectories are not loaded unless requested, and even then only the
+        inline document is returned; offloaded step payloads stay in the
+        side table until a single execution is fetched.
         """
-        executions = self.db.query(AgentExecution).filter(
+        query = self.db.query(AgentExecution).filter(
             AgentExecution.tenant_id == self.tenant_id,
             AgentExecution.user_id == self.user.id
-        ).order_by(AgentExecution.created_at.desc()).offset(skip).limit(limit).all()
+        )
+        if not include_trajectory:
+            query = query.options(defer(AgentExecution.trajectory))
+
+        executions = query.order_by(AgentExecution.created_at.desc()).offset(skip).limit(limit).all()
 
         return [
-            AgentExecutionResponse(
-                id=str(exec.id),
-                tenant_id=str(exec.tenant_id),
-                user_id=str(exec.user_id),
-                lead_id=str(exec.lead_id),
-                agent_type=exec.agent_type,
-                trajectory=exec.trajectory or "",
-                success=exec.success,
-                tokens_input=exec.tokens_input,
-                tokens_output=exec.tokens_output,
-                cost_cents=exec.cost_cents,
-                started_at=exec.started_at,
-                completed_at=exec.completed_at,
-                created_at=exec.created_at,
-                updated_at=exec.updated_at
+            self.execution_to_response(
+                exec,
+                decode_trajectory(exec.trajectory) if include_trajectory else None
             )
             for exec in executions
         ]
 
     async def get_execution(self, execution_id: str) -> Optional[AgentExecutionResponse]:
         """
-        Get specific execution
+        Get specific execution with its full trajectory
         """
         execution = self.db.query(AgentExecution).filter(
             AgentExecution.id == execution_id,
@@ -136,14 +241,35 @@ class AgentService:
         
         if not execution:
             return None
-            
+
+        payloads = self.db.query(
+            AgentExecutionPayload.step_index,
+            AgentExecutionPayload.codec,
+            AgentExecutionPayload.data
+        ).filter(
+            AgentExecutionPayload.execution_id == execution.id
+        ).all()
+
+        trajectory = decode_trajectory(execution.trajectory, {
+            payload.step_index: (payload.codec, payload.data) for payload in payloads
+        })
+        return self.execution_to_response(execution, trajectory)
+
+    def execution_to_response(
+        self,
+        execution: AgentExecution,
+        trajectory: Optional[Dict[str, Any]] = None
+    ) -> AgentExecutionResponse:
+        """
+        Convert AgentExecution model to AgentExecutionResponse schema
+        """
         return AgentExecutionResponse(
             id=str(execution.id),
             tenant_id=str(execution.tenant_id),
             user_id=str(execution.user_id),
             lead_id=str(execution.lead_id),
             agent_type=execution.agent_type,
-            trajectory=execution.trajectory or "",
+            trajectory=trajectory,
             success=execution.success,
             tokens_input=execution.tokens_input,
             tokens_output=execution.tokens_output,
@@ -0,0 +1,106 @@
+"""
+Text embedders for knowledge base retrieval.
+
+Every embedder returns L2-normalized float32 rows, so inner product is
+cosine similarity throughout the index.
+"""
+import re
+import zlib
+from typing import List, Optional
+import numpy as np
+from app.core.config import settings
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+# KnowledgeBase.embedding_vector layout
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens; SKU-like tokens (a-12.b) are kept whole
+    """
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+def vector_to_bytes(vector: np.ndarray) -> bytes:
+    """
+    KnowledgeBase.embedding_vector value for a vector
+    """
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+def vectors_from_bytes(values: List[bytes], dim: int) -> np.ndarray:
+    """
+    Stack embedding_vector values into an (n, dim) matrix: one join, then
+    a zero-copy view instead of a per-vector parse
+    """
+    if not values:
+        return np.empty((0, dim), dtype=np.float32)
+    return np.frombuffer(b"".join(values), dtype=EMBEDDING_DTYPE).reshape(len(values), dim)
+
+def embedding_text(title: Optional[str], content: Optional[str]) -> str:
+    return f"{title or ''}\n\n{content or ''}"[:settings.KNOWLEDGE_EMBEDDING_MAX_CHARS]
+
+class HashingEmbedder:
+    """
+    Local embedder that hashes unigrams and bigrams into a signed feature
+    vector. No model or network, so it is deterministic and fast; used
+    when no API key is configured, and in benchmarks.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.KNOWLEDGE_EMBEDDING_DIM
+        self.name = f"hashing-{self.dim}"
+
+    def _embed_one(self, text: str, row: np.ndarray):
+        tokens = tokenize(text)
+        features = tokens + [f"{left} {right}" for left, right in zip(tokens, tokens[1:])]
+        for feature in features:
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            row[hashed % self.dim] += sign
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for index, text in enumerate(texts):
+            self._embed_one(text, vectors[index])
+        return normalize_rows(vectors)
+
+class OpenAIEmbedder:
+    """
+    OpenAI embeddings API, truncated to KNOWLEDGE_EMBEDDING_DIM dimensions
+    """
+
+    def __init__(self, model: Optional[str] = None, dim: Optional[int] = None, api_key: Optional[str] = None):
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=api_key or settings.OPENAI_API_KEY)
+        self.model = model or settings.KNOWLEDGE_EMBEDDING_MODEL
+        self.dim = dim or settings.KNOWLEDGE_EMBEDDING_DIM
+        self.name = f"{self.model}-{self.dim}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=[text or " " for text in texts],
+            dimensions=self.dim
+        )
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return normalize_rows(np.array([item.embedding for item in ordered], dtype=np.float32))
+
+def get_embedder():
+    """
+    Return the embedder chosen by KNOWLEDGE_EMBEDDER. With "auto" that is
+    the OpenAI embedder, or the local hashing embedder when no API key is
+    configured; "hashing" forces the local one (tests, offline use).
+    """
+    if settings.KNOWLEDGE_EMBEDDER == "hashing":
+        return HashingEmbedder()
+    if settings.KNOWLEDGE_EMBEDDER == "auto" and not settings.OPENAI_API_KEY:
+        return HashingEmbedder()
+    return OpenAIEmbedder()
@@ -0,0 +1,255 @@
+"""
+BM25 postings for the lexical half of hybrid knowledge search.
+
+Postings live on the vector index segments and use the same row numbers,
+so alive flags and category/tag filters apply to both halves unchanged.
+A sealed segment holds them as CSR arrays: term t's postings are
+rows[offsets[t]:offsets[t + 1]] with their term frequencies. The delta
+keeps a growable pair of arrays per term. As in Lucene, document
+frequencies and lengths include removed rows until the next compaction.
+"""
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.knowledge.embeddings import tokenize
+
+# Term frequencies are stored as uint16
+MAX_TERM_FREQUENCY = 65535
+
+def lexical_text(title: Optional[str], content: Optional[str]) -> str:
+    return f"{title or ''}\n{content or ''}"
+
+def term_counts(text: Optional[str]) -> Dict[str, int]:
+    return dict(Counter(tokenize(text or "")))
+
+def bm25_idf(rows: int, df: np.ndarray) -> np.ndarray:
+    return np.log1p((rows - df + 0.5) / (df + 0.5))
+
+def bm25_weights(tf: np.ndarray, lengths: np.ndarray, average_length: float, k1: float, b: float) -> np.ndarray:
+    tf = tf.astype(np.float32)
+    return tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / average_length))
+
+class DeltaPostings:
+    """
+    Postings of the append-only delta segment. Per-row term counts are
+    kept too, to carry rows into a new delta after compaction.
+    """
+
+    def __init__(self):
+        self.terms: Dict[str, List] = {}  # term -> [rows, tf, count]
+        self.lengths = np.empty(1024, dtype=np.float32)
+        self.row_counts: List[Dict[str, int]] = []
+        self.total_length = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.row_counts)
+
+    def add(self, row: int, counts: Dict[str, int]):
+        if row == len(self.lengths):
+            grown = np.empty(2 * row, dtype=np.float32)
+            grown[:row] = self.lengths
+            self.lengths = grown
+        length = float(sum(counts.values()))
+        self.lengths[row] = length
+        self.total_length += length
+        self.row_counts.append(counts)
+        for term, tf in counts.items():
+            entry = self.terms.get(term)
+            if entry is None:
+                entry = [np.empty(4, dtype=np.int32), np.empty(4, dtype=np.uint16), 0]
+                self.terms[term] = entry
+            rows, frequencies, count = entry
+            if count == len(rows):
+                entry[0] = rows = np.concatenate((rows, np.empty(count, dtype=np.int32)))
+                entry[1] = frequencies = np.concatenate((frequencies, np.empty(count, dtype=np.uint16)))
+            rows[count] = row
+            frequencies[count] = min(tf, MAX_TERM_FREQUENCY)
+            entry[2] = count + 1
+
+    def df(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[2] if entry is not None else 0
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry = self.terms.get(term)
+        if entry is None:
+            return None
+        rows, frequencies, count = entry
+        return rows[:count], frequencies[:count]
+
+class LexicalPostings:
+    """
+    CSR postings of a sealed segment; arrays may be mapped from a snapshot
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        vocabulary: Optional[Dict[str, int]] = None
+    ):
+        self.term_list = terms
+        self.vocabulary = vocabulary if vocabulary is not None else {term: code for code, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.total_length = float(lengths.sum(dtype=np.float64)) if len(lengths) else 0.0
+
+    @classmethod
+    def empty(cls, size: int = 0) -> "LexicalPostings":
+        return cls([], np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                   np.empty(0, dtype=np.uint16), np.zeros(size, dtype=np.float32))
+
+    @classmethod
+    def from_postings(
+        cls,
+        terms: List[str],
+        term_ids: np.ndarray,
+        rows: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray
+    ) -> "LexicalPostings":
+        """
+        Group (term id, row, tf) triples by term
+        """
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=len(terms)) if len(term_ids) else np.zeros(len(terms), dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return cls(
+            terms,
+            offsets,
+            np.ascontiguousarray(rows[order], dtype=np.int32),
+            np.ascontiguousarray(frequencies[order], dtype=np.uint16),
+            np.asarray(lengths, dtype=np.float32)
+        )
+
+    def df(self, term: str) -> int:
+        code = self.vocabulary.get(term)
+        if code is None:
+            return 0
+        return int(self.offsets[code + 1] - self.offsets[code])
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        code = self.vocabulary.get(term)
+        if code is None:
+            return None
+        start, end = self.offsets[code], self.offsets[code + 1]
+        return self.rows[start:end], self.frequencies[start:end]
+
+    def reorder(self, order: np.ndarray) -> "LexicalPostings":
+        """
+        Postings after the segment's rows are permuted so new row i is old
+        row order[i]
+        """
+        inverse = np.empty(len(order), dtype=np.int32)
+        inverse[order] = np.arange(len(order), dtype=np.int32)
+        return LexicalPostings(
+            self.term_list, self.offsets, inverse[self.rows], self.frequencies,
+            np.asarray(self.lengths)[order], self.vocabulary
+        )
+
+class LexicalBuilder:
+    """
+    Collects term counts row by row (initial loads) and seals them
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.term_ids = array("i")
+        self.rows = array("i")
+        self.frequencies = array("H")
+        self.lengths = array("f")
+
+    def add(self, counts: Dict[str, int]):
+        row = len(self.lengths)
+        vocabulary = self.vocabulary
+        length = 0
+        for term, tf in counts.items():
+            code = vocabulary.get(term)
+            if code is None:
+                code = len(self.terms)
+                vocabulary[term] = code
+                self.terms.append(term)
+            self.term_ids.append(code)
+            self.rows.append(row)
+            self.frequencies.append(min(tf, MAX_TERM_FREQUENCY))
+            length += tf
+        self.lengths.append(length)
+
+    def build(self) -> LexicalPostings:
+        return LexicalPostings.from_postings(
+            self.terms,
+            np.frombuffer(self.term_ids, dtype=np.int32) if len(self.term_ids) else np.empty(0, dtype=np.int32),
+            np.frombuffer(self.rows, dtype=np.int32) if len(self.rows) else np.empty(0, dtype=np.int32),
+            np.frombuffer(self.frequencies, dtype=np.uint16) if len(self.frequencies) else np.empty(0, dtype=np.uint16),
+            np.frombuffer(self.lengths, dtype=np.float32).copy() if len(self.lengths) else np.empty(0, dtype=np.float32)
+        )
+
+def merge_postings(parts: Sequence[Tuple[object, int, np.ndarray]]) -> LexicalPostings:
+    """
+    Seal the live rows of (postings, size, live rows) parts, in order, into
+    one CSR. Rows are renumbered as they would be by concatenating the live
+    rows of each part.
+    """
+    vocabulary: Dict[str, int] = {}
+    terms: List[str] = []
+
+    def code_of(term: str) -> int:
+        code = vocabulary.get(term)
+        if code is None:
+            code = len(terms)
+            vocabulary[term] = code
+            terms.append(term)
+        return code
+
+    term_ids: List[np.ndarray] = []
+    rows: List[np.ndarray] = []
+    frequencies: List[np.ndarray] = []
+    lengths: List[np.ndarray] = []
+    offset = 0
+    for postings, size, live in parts:
+        if isinstance(postings, DeltaPostings):
+            builder_terms = array("i")
+            builder_rows = array("i")
+            builder_frequencies = array("H")
+            for new_row, row in enumerate(live.tolist(), offset):
+                for term, tf in postings.row_counts[row].items():
+                    builder_terms.append(code_of(term))
+                    builder_rows.append(new_row)
+                    builder_frequencies.append(min(tf, MAX_TERM_FREQUENCY))
+            term_ids.append(np.array(builder_terms, dtype=np.int32))
+            rows.append(np.array(builder_rows, dtype=np.int32))
+            frequencies.append(np.array(builder_frequencies, dtype=np.uint16))
+            lengths.append(np.asarray(postings.lengths[:size])[live])
+        elif postings is not None:
+            remap = np.full(size, -1, dtype=np.int64)
+            remap[live] = np.arange(offset, offset + len(live))
+            lookup = np.fromiter((code_of(term) for term in postings.term_list), dtype=np.int32, count=len(postings.term_list))
+            posting_terms = np.repeat(np.arange(len(postings.term_list), dtype=np.int32), np.diff(postings.offsets))
+            posting_rows = np.asarray(postings.rows)
+            keep = posting_rows < size
+            keep[keep] = remap[posting_rows[keep]] >= 0
+            term_ids.append(lookup[posting_terms[keep]])
+            rows.append(remap[posting_rows[keep]].astype(np.int32))
+            frequencies.append(np.asarray(postings.frequencies)[keep])
+            lengths.append(np.asarray(postings.lengths[:size])[live])
+        else:
+            lengths.append(np.zeros(len(live), dtype=np.float32))
+        offset += len(live)
+
+    if not term_ids:
+        return LexicalPostings.empty(offset)
+    return LexicalPostings.from_postings(
+        terms,
+        np.concatenate(term_ids),
+        np.concatenate(rows),
+        np.concatenate(frequencies),
+        np.concatenate(lengths) if lengths else np.empty(0, dtype=np.float32)
+    )
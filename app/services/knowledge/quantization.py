@@ -0,0 +1,169 @@
+"""
+Compressed embeddings for large knowledge index bases.
+
+A quantized base scans compact codes instead of float32 rows to pick
+candidates, then re-ranks the best of them with the float vectors. With
+snapshots the float vectors are memory-mapped, so only the codes and the
+pages re-ranking touches are resident.
+
+- int8 (ScalarQuantizer): one byte per dimension, 4x smaller
+- pq (ProductQuantizer): one byte per group of dimensions, scored with a
+  per-query lookup table; 16x smaller with the default dim / 4 groups
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+# Rows encoded or scored per chunk; small enough for the temporaries to
+# stay in cache
+CHUNK_ROWS = 4096
+
+# Rows sampled to train a quantizer
+TRAIN_ROWS = 65536
+
+# Rows sampled per centroid to train a product quantizer
+PQ_TRAIN_PER_CENTROID = 40
+
+# Centroids per product quantizer group; codes are one byte
+PQ_CENTROIDS = 256
+
+def _sample(vectors: np.ndarray, rows: int, seed: int) -> np.ndarray:
+    if len(vectors) <= rows:
+        return np.asarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    return np.asarray(vectors[np.sort(rng.choice(len(vectors), rows, replace=False))], dtype=np.float32)
+
+class ScalarQuantizer:
+    """
+    Per-dimension linear int8 codes: x ~ offset + scale * (code + 128)
+    """
+    kind = "int8"
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = offset
+        self.scale = scale
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, seed: int = 0) -> "ScalarQuantizer":
+        sample = _sample(vectors, TRAIN_ROWS, seed)
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0
+        return cls(low.astype(np.float32), scale.astype(np.float32))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            chunk = (vectors[start:start + CHUNK_ROWS] - self.offset) / self.scale
+            codes[start:start + len(chunk)] = np.clip(np.rint(chunk) - 128, -128, 127)
+        return codes
+
+    def prepare(self, query: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Per-query state for scores: the scaled query and the offset term
+        """
+        return query * self.scale, float(query @ (self.offset + 128 * self.scale))
+
+    def scores(self, codes: np.ndarray, prepared: Tuple[np.ndarray, float]) -> np.ndarray:
+        """
+        Approximate inner products of a prepared query with the rows codes
+        encode
+        """
+        weights, bias = prepared
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_ROWS):
+            chunk = codes[start:start + CHUNK_ROWS]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ weights
+        scores += bias
+        return scores
+
+class ProductQuantizer:
+    """
+    Splits rows into groups of dimensions and stores each group as the
+    index of its nearest of PQ_CENTROIDS centroids; inner products are
+    summed from a per-query table of group-centroid products
+    """
+    kind = "pq"
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids  # (groups, PQ_CENTROIDS, dim / groups)
+
+    @property
+    def groups(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, groups: int, iterations: int = 10, seed: int = 0) -> "ProductQuantizer":
+        dim = vectors.shape[1]
+        if dim % groups:
+            raise ValueError(f"Product quantizer groups ({groups}) must divide the dimension ({dim})")
+        sample = _sample(vectors, PQ_CENTROIDS * PQ_TRAIN_PER_CENTROID, seed)
+        width = dim // groups
+        rng = np.random.default_rng(seed)
+        centroids = np.empty((groups, PQ_CENTROIDS, width), dtype=np.float32)
+        for group in range(groups):
+            part = np.ascontiguousarray(sample[:, group * width:(group + 1) * width])
+            chosen = rng.choice(len(part), PQ_CENTROIDS, replace=len(part) < PQ_CENTROIDS)
+            group_centroids = part[chosen].copy()
+            for _ in range(iterations):
+                assignment = cls._nearest(part, group_centroids)
+                counts = np.bincount(assignment, minlength=PQ_CENTROIDS)
+                sums = np.stack([
+                    np.bincount(assignment, weights=part[:, column], minlength=PQ_CENTROIDS)
+                    for column in range(width)
+                ], axis=1)
+                nonempty = counts > 0
+                # Empty centroids keep their old position
+                group_centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            centroids[group] = group_centroids
+        return cls(centroids)
+
+    @staticmethod
+    def _nearest(part: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin |x - c|^2 = argmin |c|^2 - 2 x.c
+        distances = (centroids * centroids).sum(axis=1) - 2 * (part @ centroids.T)
+        return np.argmin(distances, axis=1).astype(np.uint8)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        groups, _, width = self.centroids.shape
+        codes = np.empty((len(vectors), groups), dtype=np.uint8)
+        for start in range(0, len(vectors), CHUNK_ROWS):
+            chunk = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+            for group in range(groups):
+                part = chunk[:, group * width:(group + 1) * width]
+                codes[start:start + len(chunk), group] = self._nearest(part, self.centroids[group])
+        return codes
+
+    def prepare(self, query: np.ndarray) -> np.ndarray:
+        """
+        Per-query state for scores: each group's centroid inner products
+        """
+        groups, _, width = self.centroids.shape
+        return np.einsum("gcw,gw->gc", self.centroids, query.reshape(groups, width))
+
+    def scores(self, codes: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products of a prepared query with the rows codes
+        encode
+        """
+        groups = self.centroids.shape[0]
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), CHUNK_ROWS):
+            # Transposed so each group's codes are contiguous
+            chunk = np.ascontiguousarray(codes[start:start + CHUNK_ROWS].T)
+            total = scores[start:start + chunk.shape[1]]
+            for group in range(groups):
+                total += table[group].take(chunk[group])
+        return scores
+
+def train_quantizer(kind: str, vectors: np.ndarray, groups: Optional[int] = None):
+    """
+    Train the quantizer named by kind (KNOWLEDGE_QUANTIZATION) on vectors;
+    None for "none"
+    """
+    if kind == "int8":
+        return ScalarQuantizer.train(vectors)
+    if kind == "pq":
+        return ProductQuantizer.train(vectors, groups or max(1, vectors.shape[1] // 4))
+    if kind != "none":
+        raise ValueError(f"Unknown knowledge quantization: {kind}")
+    return None
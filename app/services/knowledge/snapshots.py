@@ -0,0 +1,383 @@
+"""
+Memory-mapped snapshots of tenant knowledge indexes.
+
+A snapshot is a versioned directory per tenant holding the sealed base
+segment as .npy arrays (vectors, category codes, alive flags, tag
+postings, BM25 postings, quantized codes and the IVF lists or HNSW
+graph), the id map and a JSON manifest. Workers open the arrays with mmap_mode="r", so every
+process on a host shares the same page cache pages instead of rebuilding
+the index from the database, and startup costs one pass over the id map.
+
+Changes made after a snapshot are written as small delta files and
+replayed on top of the base: when a snapshot is opened, and by workers
+that already have it open when they poll. A newer snapshot folds the
+deltas its writer had applied; its manifest lists them so they are not
+replayed twice.
+
+    {root}/{tenant_id}/CURRENT              name of the current version
+    {root}/{tenant_id}/v{n}/manifest.json   written last
+    {root}/{tenant_id}/v{n}/ids.txt         one KnowledgeBase.id per row
+    {root}/{tenant_id}/v{n}/terms.txt       BM25 vocabulary, one term per line
+    {root}/{tenant_id}/v{n}/*.npy           base segment arrays
+    {root}/{tenant_id}/deltas/{n}.json      upserts and removals
+    {root}/{tenant_id}/deltas/{n}.npy       vectors of the upserts
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.knowledge.lexical import LexicalPostings
+from app.services.knowledge.quantization import ProductQuantizer, ScalarQuantizer
+from app.services.knowledge.vector_index import (
+    HNSWIndex,
+    IVFIndex,
+    KnowledgeIndex,
+    faiss,
+    open_index
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 2
+
+# Deltas folded into the current base are deleted once they are this old,
+# giving workers on an older base time to switch
+DELTA_RETENTION_SECONDS = 600
+
+_TENANT_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+def _write_atomic(path: str, data: bytes):
+    staging = f"{path}.{os.getpid()}.tmp"
+    with open(staging, "wb") as handle:
+        handle.write(data)
+    os.replace(staging, path)
+
+def _sequence() -> str:
+    # Sorts by creation time; the pid keeps concurrent writers apart
+    return f"{time.time_ns():020d}-{os.getpid()}"
+
+class SnapshotStore:
+    """
+    Snapshot files for all tenants under one root directory
+    """
+
+    def __init__(self, root: str, keep: Optional[int] = None):
+        self.root = root
+        self.keep = max(1, keep or settings.KNOWLEDGE_SNAPSHOT_KEEP)
+
+    def _tenant_dir(self, tenant_id: str) -> str:
+        tenant_id = str(tenant_id)
+        if not _TENANT_PATTERN.match(tenant_id):
+            raise ValueError(f"Invalid tenant id for snapshot path: {tenant_id!r}")
+        return os.path.join(self.root, tenant_id)
+
+    def _deltas_dir(self, tenant_id: str) -> str:
+        return os.path.join(self._tenant_dir(tenant_id), "deltas")
+
+    def current(self, tenant_id: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._tenant_dir(tenant_id), "CURRENT")) as handle:
+                return handle.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def discard(self, tenant_id: str):
+        """
+        Stop serving the tenant's snapshot; the next load rebuilds it
+        """
+        try:
+            os.remove(os.path.join(self._tenant_dir(tenant_id), "CURRENT"))
+        except FileNotFoundError:
+            pass
+
+    def lock(self, tenant_id: str) -> int:
+        """
+        Block until this process holds the tenant's build lock, so workers
+        starting together build a missing snapshot once. Returns the file
+        descriptor to pass to unlock.
+        """
+        tenant_dir = self._tenant_dir(tenant_id)
+        os.makedirs(tenant_dir, exist_ok=True)
+        fd = os.open(os.path.join(tenant_dir, ".lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except Exception:
+            os.close(fd)
+            raise
+        return fd
+
+    def unlock(self, fd: int):
+        os.close(fd)
+
+    def write(self, tenant_id: str, index: KnowledgeIndex, embedder: str, folded: Set[str]) -> str:
+        """
+        Write the index's base segment as a new version and make it current.
+        folded names the deltas already contained in the base. Safe to run
+        on a thread.
+        """
+        tenant_dir = self._tenant_dir(tenant_id)
+        os.makedirs(tenant_dir, exist_ok=True)
+        base = index.base
+        size = base.size
+        version = f"v{_sequence()}"
+        staging = os.path.join(tenant_dir, f".{version}.tmp")
+        os.makedirs(staging)
+        try:
+            np.save(os.path.join(staging, "vectors.npy"), base.vectors[:size])
+            np.save(os.path.join(staging, "categories.npy"), base.categories[:size])
+            np.save(os.path.join(staging, "alive.npy"), base.alive[:size].copy())
+
+            tags: Dict[str, List[int]] = {}
+            postings: List[np.ndarray] = []
+            offset = 0
+            for tag in sorted(base.tags):
+                rows = np.asarray(base.tags[tag], dtype=np.int64)
+                tags[tag] = [offset, offset + len(rows)]
+                postings.append(rows)
+                offset += len(rows)
+            tag_rows = np.concatenate(postings) if postings else np.empty(0, dtype=np.int64)
+            np.save(os.path.join(staging, "tag_rows.npy"), tag_rows)
+
+            with open(os.path.join(staging, "ids.txt"), "wb") as handle:
+                handle.write("\n".join(base.ids[:size]).encode("utf-8"))
+
+            lexical = isinstance(base.lexical, LexicalPostings)
+            if lexical:
+                with open(os.path.join(staging, "terms.txt"), "wb") as handle:
+                    handle.write("\n".join(base.lexical.term_list).encode("utf-8"))
+                np.save(os.path.join(staging, "lexical_offsets.npy"), np.asarray(base.lexical.offsets, dtype=np.int64))
+                np.save(os.path.join(staging, "lexical_rows.npy"), np.asarray(base.lexical.rows, dtype=np.int32))
+                np.save(os.path.join(staging, "lexical_tf.npy"), np.asarray(base.lexical.frequencies, dtype=np.uint16))
+                np.save(os.path.join(staging, "lexical_lengths.npy"), np.asarray(base.lexical.lengths[:size], dtype=np.float32))
+
+            ann = base.ann.kind if base.ann is not None else None
+            if ann == "ivf":
+                np.save(os.path.join(staging, "centroids.npy"), base.ann.centroids)
+                np.save(os.path.join(staging, "offsets.npy"), np.asarray(base.ann.offsets, dtype=np.int64))
+            elif ann == "hnsw":
+                faiss.write_index(base.ann.index, os.path.join(staging, "hnsw.faiss"))
+
+            quantizer = base.quantizer.kind if base.quantizer is not None else None
+            if quantizer is not None:
+                np.save(os.path.join(staging, "codes.npy"), base.codes[:size])
+            if quantizer == "int8":
+                np.save(os.path.join(staging, "quantizer_offset.npy"), base.quantizer.offset)
+                np.save(os.path.join(staging, "quantizer_scale.npy"), base.quantizer.scale)
+            elif quantizer == "pq":
+                np.save(os.path.join(staging, "quantizer_centroids.npy"), base.quantizer.centroids)
+
+            codes = sorted(index.category_codes.items(), key=lambda item: item[1])
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "version": version,
+                "dim": index.dim,
+                "embedder": embedder,
+                "rows": size,
+                "ann": ann,
+                "lexical": lexical,
+                "quantizer": quantizer,
+                "categories": [category for category, _ in codes],
+                "tags": tags,
+                "deltas": sorted(folded),
+                "created_at": time.time()
+            }
+            _write_atomic(os.path.join(staging, "manifest.json"), json.dumps(manifest).encode("utf-8"))
+            os.rename(staging, os.path.join(tenant_dir, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        _write_atomic(os.path.join(tenant_dir, "CURRENT"), version.encode("utf-8"))
+        self.prune(tenant_id)
+        return version
+
+    def open(self, tenant_id: str, dim: int, embedder: str) -> Optional[Tuple[KnowledgeIndex, str, Set[str]]]:
+        """
+        Map the tenant's current snapshot and replay its pending deltas.
+        Returns (index, version, applied delta names), or None when there is
+        no usable snapshot. Safe to run on a thread.
+        """
+        version = self.current(tenant_id)
+        if version is None:
+            return None
+        directory = os.path.join(self._tenant_dir(tenant_id), version)
+        try:
+            with open(os.path.join(directory, "manifest.json")) as handle:
+                manifest = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            logger.warning(f"Knowledge snapshot {version} for tenant {tenant_id} is missing or unreadable")
+            return None
+        if manifest.get("format") != SNAPSHOT_FORMAT or manifest["dim"] != dim or manifest["embedder"] != embedder:
+            return None
+
+        def mapped(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        ann = None
+        if manifest["ann"] == "ivf":
+            ann = IVFIndex(mapped("centroids.npy"), mapped("offsets.npy"), settings.KNOWLEDGE_IVF_NPROBE)
+        elif manifest["ann"] == "hnsw":
+            if faiss is None:
+                logger.warning(f"Knowledge snapshot {version} needs faiss for its HNSW index")
+                return None
+            path = os.path.join(directory, "hnsw.faiss")
+            try:
+                graph = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+            except RuntimeError:
+                graph = faiss.read_index(path)
+            graph.hnsw.efSearch = settings.KNOWLEDGE_HNSW_EF_SEARCH
+            ann = HNSWIndex(graph)
+
+        with open(os.path.join(directory, "ids.txt"), "rb") as handle:
+            text = handle.read().decode("utf-8")
+        ids = text.split("\n") if text else []
+        if len(ids) != manifest["rows"]:
+            logger.warning(f"Knowledge snapshot {version} for tenant {tenant_id} has a truncated id map")
+            return None
+
+        lexical = None
+        if manifest["lexical"]:
+            with open(os.path.join(directory, "terms.txt"), "rb") as handle:
+                text = handle.read().decode("utf-8")
+            lexical = LexicalPostings(
+                text.split("\n") if text else [],
+                mapped("lexical_offsets.npy"),
+                mapped("lexical_rows.npy"),
+                mapped("lexical_tf.npy"),
+                mapped("lexical_lengths.npy")
+            )
+
+        quantizer = None
+        if manifest.get("quantizer") == "int8":
+            quantizer = ScalarQuantizer(mapped("quantizer_offset.npy"), mapped("quantizer_scale.npy"))
+        elif manifest.get("quantizer") == "pq":
+            quantizer = ProductQuantizer(np.load(os.path.join(directory, "quantizer_centroids.npy")))
+
+        tag_rows = mapped("tag_rows.npy")
+        index = open_index(
+            dim,
+            ids,
+            mapped("vectors.npy"),
+            mapped("categories.npy"),
+            np.load(os.path.join(directory, "alive.npy")),
+            {tag: tag_rows[start:end] for tag, (start, end) in manifest["tags"].items()},
+            {category: code for code, category in enumerate(manifest["categories"])},
+            ann,
+            lexical,
+            quantizer,
+            mapped("codes.npy") if quantizer is not None else None
+        )
+
+        applied = set(manifest["deltas"])
+        for name, record, vectors in self.read_deltas(tenant_id, self.pending_deltas(tenant_id, applied)):
+            apply_delta(index, record, vectors)
+            applied.add(name)
+        return index, version, applied
+
+    def append_delta(
+        self,
+        tenant_id: str,
+        ids: Sequence[str],
+        vectors: Optional[np.ndarray],
+        categories: Sequence[Optional[str]],
+        tags: Sequence[Sequence[str]],
+        removed: Sequence[str],
+        texts: Optional[Sequence[Optional[str]]] = None
+    ) -> str:
+        """
+        Record upserts and removals made after the current snapshot.
+        Returns the delta name.
+        """
+        directory = self._deltas_dir(tenant_id)
+        os.makedirs(directory, exist_ok=True)
+        name = _sequence()
+        if len(ids):
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(vectors, dtype=np.float32))
+        record = {
+            "ids": [str(entry_id) for entry_id in ids],
+            "categories": list(categories),
+            "tags": [list(entry_tags or ()) for entry_tags in tags],
+            "texts": list(texts) if texts is not None else None,
+            "removed": [str(entry_id) for entry_id in removed]
+        }
+        # The record is the commit marker, so it is written last
+        _write_atomic(os.path.join(directory, f"{name}.json"), json.dumps(record).encode("utf-8"))
+        return name
+
+    def list_deltas(self, tenant_id: str) -> List[str]:
+        try:
+            files = os.listdir(self._deltas_dir(tenant_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in files if name.endswith(".json"))
+
+    def pending_deltas(self, tenant_id: str, applied: Set[str]) -> List[str]:
+        return [name for name in self.list_deltas(tenant_id) if name not in applied]
+
+    def read_deltas(self, tenant_id: str, names: Sequence[str]) -> List[Tuple[str, Dict[str, Any], Optional[np.ndarray]]]:
+        directory = self._deltas_dir(tenant_id)
+        deltas = []
+        for name in names:
+            try:
+                with open(os.path.join(directory, f"{name}.json")) as handle:
+                    record = json.load(handle)
+                vectors = np.load(os.path.join(directory, f"{name}.npy")) if record["ids"] else None
+            except FileNotFoundError:
+                # Pruned after being folded into a newer base
+                continue
+            deltas.append((name, record, vectors))
+        return deltas
+
+    def prune(self, tenant_id: str):
+        """
+        Drop versions beyond the newest keep, and deltas folded into the
+        current version. Workers that still map a dropped version keep
+        reading it until they switch; the files go when they unmap.
+        """
+        tenant_dir = self._tenant_dir(tenant_id)
+        current = self.current(tenant_id)
+        versions = sorted(name for name in os.listdir(tenant_dir) if name.startswith("v"))
+        for name in versions[:-self.keep]:
+            if name != current:
+                shutil.rmtree(os.path.join(tenant_dir, name), ignore_errors=True)
+        if current is None:
+            return
+        try:
+            with open(os.path.join(tenant_dir, current, "manifest.json")) as handle:
+                folded = json.load(handle)["deltas"]
+        except (FileNotFoundError, ValueError):
+            return
+        directory = self._deltas_dir(tenant_id)
+        cutoff = time.time() - DELTA_RETENTION_SECONDS
+        for name in folded:
+            record = os.path.join(directory, f"{name}.json")
+            try:
+                if os.path.getmtime(record) >= cutoff:
+                    continue
+                os.remove(record)
+            except FileNotFoundError:
+                continue
+            try:
+                os.remove(os.path.join(directory, f"{name}.npy"))
+            except FileNotFoundError:
+                pass
+
+def apply_delta(index: KnowledgeIndex, record: Dict[str, Any], vectors: Optional[np.ndarray]):
+    if record["ids"] and vectors is not None and vectors.shape == (len(record["ids"]), index.dim):
+        index.upsert(record["ids"], vectors, record["categories"], record["tags"], record.get("texts"))
+    if record["removed"]:
+        index.remove(record["removed"])
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """
+    Return the snapshot store, or None when KNOWLEDGE_SNAPSHOT_DIR is empty
+    """
+    if not settings.KNOWLEDGE_SNAPSHOT_DIR:
+        return None
+    return SnapshotStore(settings.KNOWLEDGE_SNAPSHOT_DIR)
@@ -5,7 +5,7 @@ from alembic import context
 from app.core.config import settings
 from app.db.base import Base
 # Import all models to ensure they are registered with SQLAlchemy
-from app.db.models import user, tenant, lead, agent_execution, knowledge_base, usage_metrics, audit_log, campaign
+from app.db.models import user, tenant, lead, agent_execution, knowledge_base, usage_metrics, audit_log, campaign, company_profile, email_fingerprint, idempotency_key, knowledge_ingestion
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,124 @@
+"""Store knowledge base embeddings as raw float32 bytes
+
+Replaces the JSON-string knowledge_base.embedding column with
+embedding_vector (little-endian float32) and embedding_model. Existing
+values are converted in batches; values that do not parse are dropped
+and re-embedded on the next index load.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+import json
+import numpy as np
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_ROWS = 1000
+
+knowledge_base = sa.table(
+    "knowledge_base",
+    sa.column("id", sa.Uuid),
+    sa.column("embedding", sa.String),
+    sa.column("embedding_vector", sa.LargeBinary),
+    sa.column("embedding_model", sa.String)
+)
+
+def _columns():
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("knowledge_base")}
+
+def _parse(value):
+    """
+    (vector bytes, model) for a stored JSON embedding: either a bare list
+    or {"model": ..., "vector": [...]}
+    """
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return None, None
+    model = None
+    if isinstance(parsed, dict):
+        model = parsed.get("model")
+        parsed = parsed.get("vector")
+    if not isinstance(parsed, list) or not parsed:
+        return None, None
+    try:
+        return np.asarray(parsed, dtype="<f4").tobytes(), model
+    except (TypeError, ValueError):
+        return None, None
+
+def upgrade():
+    bind = op.get_bind()
+    columns = _columns()
+    if "embedding_vector" not in columns:
+        op.add_column("knowledge_base", sa.Column("embedding_vector", sa.LargeBinary(), nullable=True))
+    if "embedding_model" not in columns:
+        op.add_column("knowledge_base", sa.Column("embedding_model", sa.String(), nullable=True))
+    if "embedding" not in columns:
+        return
+
+    # Keyset batches by id so large tables convert without holding every row
+    last_id = None
+    while True:
+        query = sa.select(knowledge_base.c.id, knowledge_base.c.embedding).where(
+            knowledge_base.c.embedding.isnot(None)
+        )
+        if last_id is not None:
+            query = query.where(knowledge_base.c.id > last_id)
+        rows = bind.execute(query.order_by(knowledge_base.c.id).limit(BATCH_ROWS)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for entry_id, value in rows:
+            vector, model = _parse(value)
+            if vector is not None:
+                updates.append({"entry_id": entry_id, "vector": vector, "model": model})
+        if updates:
+            bind.execute(
+                knowledge_base.update()
+                .where(knowledge_base.c.id == sa.bindparam("entry_id"))
+                .values(embedding_vector=sa.bindparam("vector"), embedding_model=sa.bindparam("model")),
+                updates
+            )
+        last_id = rows[-1][0]
+
+    op.drop_column("knowledge_base", "embedding")
+
+def downgrade():
+    bind = op.get_bind()
+    columns = _columns()
+    if "embedding" not in columns:
+        op.add_column("knowledge_base", sa.Column("embedding", sa.String(), nullable=True))
+    if "embedding_vector" not in columns:
+        return
+
+    last_id = None
+    while True:
+        query = sa.select(
+            knowledge_base.c.id, knowledge_base.c.embedding_vector, knowledge_base.c.embedding_model
+        ).where(knowledge_base.c.embedding_vector.isnot(None))
+        if last_id is not None:
+            query = query.where(knowledge_base.c.id > last_id)
+        rows = bind.execute(query.order_by(knowledge_base.c.id).limit(BATCH_ROWS)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for entry_id, vector, model in rows:
+            values = np.frombuffer(bytes(vector), dtype="<f4").tolist()
+            value = {"model": model, "vector": values} if model else values
+            updates.append({"entry_id": entry_id, "value": json.dumps(value)})
+        bind.execute(
+            knowledge_base.update()
+            .where(knowledge_base.c.id == sa.bindparam("entry_id"))
+            .values(embedding=sa.bindparam("value")),
+            updates
+        )
+        last_id = rows[-1][0]
+
+    op.drop_column("knowledge_base", "embedding_model")
+    op.drop_column("knowledge_base", "embedding_vector")
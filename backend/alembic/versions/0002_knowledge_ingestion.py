@@ -0,0 +1,103 @@
+"""Knowledge base ingestion jobs and content hashes
+
+Adds knowledge_ingestions, and knowledge_base.content_hash with a unique
+(tenant_id, content_hash) constraint for deduplicated bulk inserts.
+Existing rows are hashed in batches; later copies of a tenant's content
+keep a NULL hash so the constraint can be created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+import hashlib
+import re
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BATCH_ROWS = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+
+knowledge_base = sa.table(
+    "knowledge_base",
+    sa.column("id", sa.Uuid),
+    sa.column("tenant_id", sa.Uuid),
+    sa.column("content", sa.Text),
+    sa.column("content_hash", sa.String)
+)
+
+def _content_hash(text):
+    # Same normalization as app.services.knowledge.ingestion.content_hash
+    normalized = _WHITESPACE.sub(" ", text or "").strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table("knowledge_ingestions"):
+        op.create_table(
+            "knowledge_ingestions",
+            sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+            sa.Column("tenant_id", postgresql.UUID(as_uuid=True), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("files", postgresql.JSONB()),
+            sa.Column("documents_total", sa.Integer()),
+            sa.Column("documents_processed", sa.Integer()),
+            sa.Column("chunks_total", sa.Integer()),
+            sa.Column("chunks_inserted", sa.Integer()),
+            sa.Column("chunks_duplicate", sa.Integer()),
+            sa.Column("chunks_failed", sa.Integer()),
+            sa.Column("errors", postgresql.JSONB()),
+            sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("started_at", sa.DateTime()),
+            sa.Column("finished_at", sa.DateTime())
+        )
+        op.create_index("ix_knowledge_ingestions_tenant_id", "knowledge_ingestions", ["tenant_id"])
+
+    columns = {column["name"] for column in inspector.get_columns("knowledge_base")}
+    if "content_hash" in columns:
+        return
+    op.add_column("knowledge_base", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    seen = set()
+    last_id = None
+    while True:
+        query = sa.select(knowledge_base.c.id, knowledge_base.c.tenant_id, knowledge_base.c.content)
+        if last_id is not None:
+            query = query.where(knowledge_base.c.id > last_id)
+        rows = bind.execute(query.order_by(knowledge_base.c.id).limit(BATCH_ROWS)).fetchall()
+        if not rows:
+            break
+        updates = []
+        for entry_id, tenant_id, content in rows:
+            value = _content_hash(content)
+            if (tenant_id, value) in seen:
+                continue
+            seen.add((tenant_id, value))
+            updates.append({"entry_id": entry_id, "value": value})
+        if updates:
+            bind.execute(
+                knowledge_base.update()
+                .where(knowledge_base.c.id == sa.bindparam("entry_id"))
+                .values(content_hash=sa.bindparam("value")),
+                updates
+            )
+        last_id = rows[-1][0]
+
+    op.create_unique_constraint(
+        "uq_knowledge_base_tenant_content_hash", "knowledge_base", ["tenant_id", "content_hash"]
+    )
+
+def downgrade():
+    op.drop_constraint("uq_knowledge_base_tenant_content_hash", "knowledge_base", type_="unique")
+    op.drop_column("knowledge_base", "content_hash")
+    op.drop_index("ix_knowledge_ingestions_tenant_id", table_name="knowledge_ingestions")
+    op.drop_table("knowledge_ingestions")
@@ -0,0 +1,36 @@
+"""Index campaign assignments by status and next action date
+
+The campaign engine claims due work with status = ? AND
+next_action_date <= now() ORDER BY next_action_date; this index keeps
+that a range scan on large assignment tables. Built concurrently so
+claims and inserts aren't blocked while it builds.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_campaign_assignments_status_next_action_date"
+
+def upgrade():
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("campaign_assignments")}
+    if INDEX_NAME in indexes:
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "campaign_assignments",
+            ["status", "next_action_date"],
+            postgresql_concurrently=True
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="campaign_assignments", postgresql_concurrently=True)
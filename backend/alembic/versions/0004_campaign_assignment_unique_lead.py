@@ -0,0 +1,46 @@
+"""Unique campaign assignment per (campaign_id, lead_id)
+
+Lets add-leads enroll leads with INSERT ... SELECT ... ON CONFLICT DO
+NOTHING instead of checking each lead first. Existing duplicates are
+removed first, keeping each pair's earliest assignment.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+CONSTRAINT_NAME = "uq_campaign_assignments_campaign_lead"
+
+def upgrade():
+    bind = op.get_bind()
+    constraints = {
+        constraint["name"] for constraint in sa.inspect(bind).get_unique_constraints("campaign_assignments")
+    }
+    if CONSTRAINT_NAME in constraints:
+        return
+
+    bind.execute(sa.text(
+        """
+        DELETE FROM campaign_assignments
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY campaign_id, lead_id ORDER BY created_at NULLS LAST, id
+                ) AS copy
+                FROM campaign_assignments
+            ) ranked
+            WHERE copy > 1
+        )
+        """
+    ))
+    op.create_unique_constraint(CONSTRAINT_NAME, "campaign_assignments", ["campaign_id", "lead_id"])
+
+def downgrade():
+    op.drop_constraint(CONSTRAINT_NAME, "campaign_assignments", type_="unique")
@@ -0,0 +1,209 @@
+import asyncio
+import copy
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.company_profile import CompanyProfile
+from app.agents.sales_agent.tools import is_fallback
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Dict[str, Any]]]
+
+# Cache kinds map to the CompanyProfile payload / freshness columns
+KIND_COLUMNS = {
+    "research": ("research", "research_fetched_at"),
+    "enrichment": ("enrichment", "enrichment_fetched_at"),
+}
+
+def normalize_domain(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize a domain, URL or email address to a bare company domain
+    """
+    if not value:
+        return None
+
+    value = value.strip().lower()
+    if "@" in value and "://" not in value:
+        value = value.rsplit("@", 1)[1]
+    if "://" not in value:
+        value = f"//{value}"
+
+    host = urlsplit(value).hostname or ""
+    host = host.rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+
+    return host or None
+
+class CompanyCache:
+    """
+    Per-tenant research and enrichment cache keyed by normalized company domain.
+
+    Lookups go through an in-process LRU, then the company_profiles table, and
+    only then to the upstream fetcher. Concurrent misses for the same key share
+    a single in-flight fetch. With session_factory=None the cache is
+    in-process only.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_entries: Optional[int] = None):
+        self.session_factory = session_factory
+        self.max_entries = max_entries or settings.COMPANY_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Dict[str, Any], datetime]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+
+    def ttl(self, kind: str) -> timedelta:
+        if kind == "research":
+            return timedelta(seconds=settings.COMPANY_RESEARCH_TTL_SECONDS)
+        return timedelta(seconds=settings.COMPANY_ENRICHMENT_TTL_SECONDS)
+
+    async def get_or_fetch(
+        self,
+        tenant_id: str,
+        domain: Optional[str],
+        kind: str,
+        fetcher: Fetcher
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Return (payload, cache_status) where cache_status is one of
+        hit, miss, coalesced or bypass (no usable domain)
+        """
+        if kind not in KIND_COLUMNS:
+            raise ValueError(f"Unknown company cache kind: {kind}")
+
+        domain = normalize_domain(domain)
+        if not domain:
+            return await fetcher(), "bypass"
+
+        key = (str(tenant_id), domain, kind)
+
+        cached = self._get_fresh(key)
+        if cached is not None:
+            return copy.deepcopy(cached), "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            payload, _ = await asyncio.shield(task)
+            return copy.deepcopy(payload), "coalesced"
+
+        # The fill runs as its own task so a cancelled caller doesn't abort
+        # the fetch other executions are waiting on
+        task = asyncio.ensure_future(self._fill(key, fetcher))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        payload, status = await asyncio.shield(task)
+        return copy.deepcopy(payload), status
+
+    def invalidate(self, tenant_id: str, domain: Optional[str] = None):
+        """
+        Drop in-process entries for a tenant (optionally a single domain)
+        """
+        domain = normalize_domain(domain)
+        for key in list(self._entries):
+            if key[0] == str(tenant_id) and (domain is None or key[1] == domain):
+                del self._entries[key]
+
+    def _get_fresh(self, key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        payload, fetched_at = entry
+        if datetime.utcnow() - fetched_at > self.ttl(key[2]):
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return payload
+
+    def _remember(self, key: Tuple[str, str, str], payload: Dict[str, Any], fetched_at: datetime):
+        self._entries[key] = (payload, fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _fill(self, key: Tuple[str, str, str], fetcher: Fetcher) -> Tuple[Dict[str, Any], str]:
+        loop = asyncio.get_running_loop()
+
+        stored = None
+        if self.session_factory is not None:
+            stored = await loop.run_in_executor(None, self._load, key)
+        if stored is not None:
+            payload, fetched_at = stored
+            if datetime.utcnow() - fetched_at <= self.ttl(key[2]):
+                self._remember(key, payload, fetched_at)
+                return payload, "hit"
+
+        payload = await fetcher()
+        if payload and is_fallback(payload):
+            # A stand-in for a failed or unconfigured provider; keeping it
+            # would hide the real profile for the whole TTL
+            return payload, "miss"
+        fetched_at = datetime.utcnow()
+        self._remember(key, payload, fetched_at)
+        if self.session_factory is None:
+            return payload, "miss"
+
+        try:
+            await loop.run_in_executor(None, self._store, key, payload, fetched_at)
+        except Exception as e:
+            # A failed write only costs a future refetch
+            logger.warning(f"Failed to persist company cache entry for {key[1]}: {str(e)}")
+
+        return payload, "miss"
+
+    def _load(self, key: Tuple[str, str, str]) -> Optional[Tuple[Dict[str, Any], datetime]]:
+        tenant_id, domain, kind = key
+        payload_column, fetched_column = KIND_COLUMNS[kind]
+
+        db = self.session_factory()
+        try:
+            row = db.query(
+                getattr(CompanyProfile, payload_column),
+                getattr(CompanyProfile, fetched_column)
+            ).filter(
+                CompanyProfile.tenant_id == tenant_id,
+                CompanyProfile.domain == domain
+            ).first()
+        finally:
+            db.close()
+
+        if not row or row[0] is None or row[1] is None:
+            return None
+        return row[0], row[1]
+
+    def _store(self, key: Tuple[str, str, str], payload: Dict[str, Any], fetched_at: datetime):
+        tenant_id, domain, kind = key
+        payload_column, fetched_column = KIND_COLUMNS[kind]
+
+        values = {
+            "tenant_id": tenant_id,
+            "domain": domain,
+            payload_column: payload,
+            fetched_column: fetched_at,
+            "updated_at": fetched_at
+        }
+        statement = insert(CompanyProfile).values(**values).on_conflict_do_update(
+            constraint="uq_company_profiles_tenant_domain",
+            set_={
+                payload_column: payload,
+                fetched_column: fetched_at,
+                "updated_at": fetched_at
+            }
+        )
+
+        db = self.session_factory()
+        try:
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+# Create a global instance
+COMPANY_CACHE = CompanyCache()
@@ -0,0 +1,204 @@
+"""
+Micro-batching of draft_email LLM calls for bulk runs.
+
+Drafts requested within AGENT_DRAFT_BATCH_WAIT_MS of each other (up to
+AGENT_DRAFT_BATCH_SIZE, per tenant) are sent as one JSON request that
+shares the system prompt. Drafts that come back missing or invalid are
+returned empty, and the caller falls back to a single call for them.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.agents.sales_agent.llm import LLMClient, LLMResult, get_llm_client
+from app.agents.sales_agent.model_router import MODEL_ROUTER, ModelRouter, abandoned_usage
+from app.observability.metrics import draft_batch_size, draft_batch_fallbacks_total
+
+logger = logging.getLogger(__name__)
+
+DRAFT_SYSTEM_PROMPT = (
+    "You are a B2B sales development rep. Write a concise, personalized "
+    "cold outreach email in plain text (under 150 words, no subject line) "
+    "using only the facts provided. Collateral is material from the "
+    "seller's own knowledge base; draw on it where it fits the lead."
+)
+
+BATCH_INSTRUCTIONS = (
+    " You will receive several leads as JSON. Write one email per lead, using "
+    "only that lead's facts, and reply with a JSON object of the form "
+    '{"drafts": [{"id": "<lead id>", "email": "<email text>"}]}.'
+)
+
+# Drafts longer than this are treated as malformed output
+MAX_DRAFT_WORDS = 250
+
+@dataclass
+class BatchDraft:
+    text: Optional[str]  # None when the lead needs a single call
+    result: LLMResult  # This lead's share of the batch call's usage
+    decision: Dict[str, Any] = field(default_factory=dict)
+    abandoned: List[LLMResult] = field(default_factory=list)  # Its share of cancelled hedge calls
+
+@dataclass
+class _PendingDraft:
+    context: Dict[str, Any]
+    future: asyncio.Future
+
+def validate_draft(text: Any) -> bool:
+    if not isinstance(text, str) or not text.strip():
+        return False
+    return len(text.split()) <= MAX_DRAFT_WORDS
+
+def _share(result: LLMResult, size: int, index: int, text: str = "") -> LLMResult:
+    """
+    Lead index's part of a batch call's usage; remainders go to the first
+    leads so the shares add up
+    """
+    input_share, input_rest = divmod(result.tokens_input, size)
+    output_share, output_rest = divmod(result.tokens_output, size)
+    return LLMResult(
+        text=text,
+        model=result.model,
+        tokens_input=input_share + (1 if index < input_rest else 0),
+        tokens_output=output_share + (1 if index < output_rest else 0)
+    )
+
+class DraftBatcher:
+    """
+    Collects draft requests per tenant and flushes them as one LLM call
+    when max_size are waiting or max_wait has passed since the first
+    """
+
+    def __init__(
+        self,
+        llm: Optional[LLMClient],
+        model_router: ModelRouter,
+        max_size: int,
+        max_wait: float
+    ):
+        self.llm = llm
+        self.model_router = model_router
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: Dict[str, List[_PendingDraft]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    @classmethod
+    def from_settings(cls) -> "DraftBatcher":
+        return cls(
+            llm=get_llm_client(),
+            model_router=MODEL_ROUTER,
+            max_size=settings.AGENT_DRAFT_BATCH_SIZE,
+            max_wait=settings.AGENT_DRAFT_BATCH_WAIT_MS / 1000
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.llm is not None and self.max_size > 1
+
+    async def draft(self, tenant_id: str, context: Dict[str, Any]) -> BatchDraft:
+        """
+        Queue one lead's draft context and wait for its batch
+        """
+        tenant_id = str(tenant_id)
+        pending = _PendingDraft(context=context, future=asyncio.get_running_loop().create_future())
+        batch = self._pending.setdefault(tenant_id, [])
+        batch.append(pending)
+
+        if len(batch) >= self.max_size:
+            self._flush(tenant_id)
+        elif len(batch) == 1:
+            self._timers[tenant_id] = asyncio.get_running_loop().call_later(
+                self.max_wait, self._flush, tenant_id
+            )
+        return await pending.future
+
+    def _flush(self, tenant_id: str):
+        timer = self._timers.pop(tenant_id, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(tenant_id, [])
+        batch = [pending for pending in batch if not pending.future.done()]
+        if not batch:
+            return
+        task = asyncio.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[_PendingDraft]):
+        size = len(batch)
+        draft_batch_size.observe(size)
+        if size == 1:
+            # Nothing to share; the single-call prompt is the better one
+            self._resolve(batch[0], BatchDraft(text=None, result=LLMResult(text="", model="")))
+            return
+
+        messages = self._batch_messages(batch)
+        try:
+            result, decision = await self.model_router.complete(
+                lambda model: self.llm.complete(
+                    model,
+                    messages,
+                    max_tokens=settings.AGENT_DRAFT_MAX_TOKENS * size,
+                    response_format={"type": "json_object"}
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Batched draft of {size} leads failed: {str(e)}")
+            draft_batch_fallbacks_total.inc(size)
+            for pending in batch:
+                self._resolve(pending, BatchDraft(
+                    text=None,
+                    result=LLMResult(text="", model=""),
+                    decision={"batch_size": size, "error": str(e)}
+                ))
+            return
+
+        drafts = self._parse_drafts(result.text)
+        abandoned = abandoned_usage(decision, messages)
+        for index, pending in enumerate(batch):
+            text = drafts.get(str(index))
+            if validate_draft(text):
+                text = text.strip()
+            else:
+                text = None
+                draft_batch_fallbacks_total.inc()
+            self._resolve(pending, BatchDraft(
+                text=text,
+                result=_share(result, size, index, text or ""),
+                decision={**decision, "batch_size": size},
+                abandoned=[_share(spent, size, index) for spent in abandoned]
+            ))
+
+    def _batch_messages(self, batch: List[_PendingDraft]) -> List[Dict[str, Any]]:
+        leads = [{"id": str(index), **pending.context} for index, pending in enumerate(batch)]
+        return [
+            {"role": "system", "content": DRAFT_SYSTEM_PROMPT + BATCH_INSTRUCTIONS},
+            {"role": "user", "content": json.dumps({"leads": leads}, default=str)}
+        ]
+
+    def _parse_drafts(self, text: str) -> Dict[str, Any]:
+        """
+        Map lead id -> draft text, tolerating malformed output
+        """
+        try:
+            document = json.loads(text)
+        except (TypeError, ValueError):
+            return {}
+        drafts = document.get("drafts") if isinstance(document, dict) else None
+        if not isinstance(drafts, list):
+            return {}
+        return {
+            str(item.get("id")): item.get("email")
+            for item in drafts if isinstance(item, dict)
+        }
+
+    def _resolve(self, pending: _PendingDraft, draft: BatchDraft):
+        if not pending.future.done():
+            pending.future.set_result(draft)
+
+# Create a global instance
+DRAFT_BATCHER = DraftBatcher.from_settings()
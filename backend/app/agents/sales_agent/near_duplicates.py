@@ -0,0 +1,353 @@
+"""
+Near-duplicate detection for outreach sent to the same company.
+
+Each sent email is reduced to a MinHash signature over its word
+3-shingles. Signatures are indexed per tenant with LSH buckets keyed by
+(domain, band), so a lookup only touches emails to the same domain that
+share at least one band, and the Jaccard similarity of a candidate is
+estimated from signature agreement. Signatures are persisted in
+email_fingerprints; a tenant's index is loaded from there (plus campaign
+email steps already completed) on first use and updated in place after.
+"""
+import asyncio
+import logging
+import time
+import uuid
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.campaign import Campaign, CampaignAssignment, CampaignStep
+from app.db.models.email_fingerprint import EmailFingerprint
+from app.db.models.lead import Lead
+from app.agents.sales_agent.checks import shingles
+from app.agents.sales_agent.company_cache import normalize_domain
+from app.observability.metrics import near_duplicate_check_duration, near_duplicate_checks_total
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+class MinHasher:
+    """
+    MinHash over word shingles with num_perm universal hash functions
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Coefficients below 2^32 keep a * hash + b inside uint64
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)),
+            dtype=np.uint64
+        )
+        if not hashes.size:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        values = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return values.min(axis=0).astype(np.uint32)
+
+def estimate_similarity(left: np.ndarray, right: np.ndarray) -> float:
+    """
+    Estimated Jaccard similarity of the texts behind two signatures
+    """
+    return float(np.count_nonzero(left == right)) / len(left)
+
+@dataclass
+class _Fingerprint:
+    domain: str
+    source: str
+    source_id: Optional[str]
+    signature: np.ndarray
+    created_at: datetime
+
+class _TenantIndex:
+    """
+    LSH buckets for one tenant. Entries are expired in insertion order,
+    which is also created_at order.
+    """
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.entries: Dict[Tuple[str, str, Optional[str]], _Fingerprint] = {}
+        self.buckets: List[Dict[Tuple[str, bytes], Set[Tuple[str, str, Optional[str]]]]] = [{} for _ in range(bands)]
+        self.order: Deque[Tuple[datetime, Tuple[str, str, Optional[str]]]] = deque()
+
+    def _band_keys(self, domain: str, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, (domain, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+
+    def insert(self, fingerprint: _Fingerprint):
+        key = (fingerprint.domain, fingerprint.source, fingerprint.source_id)
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = fingerprint
+        for band, band_key in self._band_keys(fingerprint.domain, fingerprint.signature):
+            self.buckets[band].setdefault(band_key, set()).add(key)
+        self.order.append((fingerprint.created_at, key))
+
+    def remove(self, key: Tuple[str, str, Optional[str]]):
+        fingerprint = self.entries.pop(key, None)
+        if fingerprint is None:
+            return
+        for band, band_key in self._band_keys(fingerprint.domain, fingerprint.signature):
+            bucket = self.buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band][band_key]
+
+    def expire(self, cutoff: datetime):
+        while self.order and self.order[0][0] < cutoff:
+            created_at, key = self.order.popleft()
+            fingerprint = self.entries.get(key)
+            # Skip keys that were re-inserted later
+            if fingerprint is not None and fingerprint.created_at == created_at:
+                self.remove(key)
+
+    def candidates(self, domain: str, signature: np.ndarray) -> Set[Tuple[str, str, Optional[str]]]:
+        found = set()
+        for band, band_key in self._band_keys(domain, signature):
+            bucket = self.buckets[band].get(band_key)
+            if bucket:
+                found.update(bucket)
+        return found
+
+class NearDuplicateIndex:
+    """
+    Per-tenant MinHash/LSH index of outreach over the last window_days.
+    With session_factory=None the index is in-process only.
+
+    With the default 16 bands of 8 rows, a pair becomes a candidate with
+    probability 1 - (1 - s^8)^16: about 0.93 at s=0.8 and 0.03 at s=0.5.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        window_days: Optional[int] = None,
+        threshold: Optional[float] = None,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.window = timedelta(days=window_days or settings.NEAR_DUPLICATE_WINDOW_DAYS)
+        self.threshold = threshold or settings.NEAR_DUPLICATE_THRESHOLD
+        self.hasher = MinHasher(num_perm=num_perm or settings.NEAR_DUPLICATE_NUM_PERM)
+        self.bands = bands or settings.NEAR_DUPLICATE_BANDS
+        if self.hasher.num_perm % self.bands:
+            raise ValueError("NEAR_DUPLICATE_NUM_PERM must be a multiple of NEAR_DUPLICATE_BANDS")
+        self.rows = self.hasher.num_perm // self.bands
+        self._tenants: Dict[str, _TenantIndex] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def check(self, tenant_id: str, domain: Optional[str], text: str) -> Dict[str, Any]:
+        """
+        Compare text against outreach to the same domain in the window.
+        Returns duplicate, similarity (best estimate) and match (the
+        closest earlier email) plus the number of LSH candidates.
+        """
+        domain = normalize_domain(domain)
+        if not domain or not text:
+            return {"duplicate": False, "similarity": 0.0, "match": None, "candidates": 0}
+
+        index = await self._ensure_loaded(str(tenant_id))
+        started = time.perf_counter()
+        signature = self.hasher.signature(text)
+        result = self._query(index, domain, signature)
+        near_duplicate_check_duration.observe(time.perf_counter() - started)
+        near_duplicate_checks_total.labels(result="duplicate" if result["duplicate"] else "unique").inc()
+        return result
+
+    async def add(
+        self,
+        tenant_id: str,
+        domain: Optional[str],
+        text: str,
+        source: str,
+        source_id: Optional[str] = None,
+        persist: bool = True
+    ):
+        """
+        Index an email sent (or about to be sent) to domain and persist its
+        signature. Campaign sends pass persist=False: completed_steps
+        already records them for the next load.
+        """
+        domain = normalize_domain(domain)
+        if not domain or not text:
+            return
+
+        index = await self._ensure_loaded(str(tenant_id))
+        fingerprint = _Fingerprint(
+            domain=domain,
+            source=source,
+            source_id=str(source_id) if source_id is not None else None,
+            signature=self.hasher.signature(text),
+            created_at=datetime.utcnow()
+        )
+        index.insert(fingerprint)
+        if self.session_factory is None or not persist:
+            return
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._store, str(tenant_id), fingerprint)
+        except Exception as e:
+            # The in-process index still has it; only a restart would forget it
+            logger.warning(f"Failed to persist email fingerprint for {domain}: {str(e)}")
+
+    def invalidate(self, tenant_id: str):
+        """
+        Drop a tenant's in-process index; it is reloaded on next use
+        """
+        self._tenants.pop(str(tenant_id), None)
+
+    def _query(self, index: _TenantIndex, domain: str, signature: np.ndarray) -> Dict[str, Any]:
+        index.expire(datetime.utcnow() - self.window)
+        candidates = index.candidates(domain, signature)
+
+        best_similarity, best = 0.0, None
+        for key in candidates:
+            fingerprint = index.entries[key]
+            similarity = estimate_similarity(signature, fingerprint.signature)
+            if similarity > best_similarity:
+                best_similarity, best = similarity, fingerprint
+
+        match = None
+        if best is not None:
+            match = {
+                "source": best.source,
+                "source_id": best.source_id,
+                "created_at": best.created_at.isoformat()
+            }
+        return {
+            "duplicate": best_similarity >= self.threshold,
+            "similarity": round(best_similarity, 4),
+            "match": match,
+            "candidates": len(candidates)
+        }
+
+    async def _ensure_loaded(self, tenant_id: str) -> _TenantIndex:
+        index = self._tenants.get(tenant_id)
+        if index is not None:
+            return index
+
+        task = self._loading.get(tenant_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_tenant(tenant_id))
+            self._loading[tenant_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(tenant_id, None))
+        return await asyncio.shield(task)
+
+    async def _load_tenant(self, tenant_id: str) -> _TenantIndex:
+        index = _TenantIndex(self.bands, self.rows)
+        if self.session_factory is not None:
+            try:
+                fingerprints = await asyncio.get_running_loop().run_in_executor(None, self._load, tenant_id)
+            except Exception as e:
+                # Start empty rather than fail drafting; history fills back in
+                logger.warning(f"Failed to load email fingerprints for tenant {tenant_id}: {str(e)}")
+                fingerprints = []
+            for fingerprint in sorted(fingerprints, key=lambda item: item.created_at):
+                index.insert(fingerprint)
+        self._tenants[tenant_id] = index
+        return index
+
+    def _load(self, tenant_id: str) -> List[_Fingerprint]:
+        cutoff = datetime.utcnow() - self.window
+        db = self.session_factory()
+        try:
+            fingerprints = [
+                _Fingerprint(
+                    domain=row.domain,
+                    source=row.source,
+                    source_id=row.source_id,
+                    signature=np.frombuffer(row.signature, dtype=np.uint32),
+                    created_at=row.created_at
+                )
+                for row in db.query(EmailFingerprint).filter(
+                    EmailFingerprint.tenant_id == tenant_id,
+                    EmailFingerprint.created_at >= cutoff,
+                    # Unsent drafts were indexed once; they aren't history
+                    EmailFingerprint.source != "draft"
+                )
+                if len(row.signature) == self.hasher.num_perm * 4
+            ]
+            fingerprints.extend(self._load_campaign_sends(db, tenant_id, cutoff))
+        finally:
+            db.close()
+        return fingerprints
+
+    def _load_campaign_sends(self, db: Session, tenant_id: str, cutoff: datetime) -> List[_Fingerprint]:
+        """
+        Campaign email steps completed in the window. The assignment's
+        updated_at stands in for the send time.
+        """
+        sends: Dict[Tuple[str, uuid.UUID], datetime] = {}
+        rows = db.query(
+            CampaignAssignment.completed_steps, CampaignAssignment.updated_at, Lead.domain, Lead.email
+        ).join(
+            Campaign, Campaign.id == CampaignAssignment.campaign_id
+        ).join(
+            Lead, Lead.id == CampaignAssignment.lead_id
+        ).filter(
+            Campaign.tenant_id == tenant_id,
+            CampaignAssignment.updated_at >= cutoff
+        )
+        for completed, updated_at, lead_domain, lead_email in rows:
+            domain = normalize_domain(lead_domain or lead_email)
+            if not domain:
+                continue
+            for step_id in completed or []:
+                try:
+                    key = (domain, uuid.UUID(str(step_id)))
+                except ValueError:
+                    continue
+                sends[key] = max(sends.get(key, updated_at), updated_at)
+        if not sends:
+            return []
+
+        contents = dict(db.query(CampaignStep.id, CampaignStep.content).filter(
+            CampaignStep.id.in_({step_id for _, step_id in sends}),
+            CampaignStep.type == "email"
+        ))
+        signatures = {step_id: self.hasher.signature(content) for step_id, content in contents.items() if content}
+        return [
+            _Fingerprint(
+                domain=domain,
+                source="campaign",
+                source_id=str(step_id),
+                signature=signatures[step_id],
+                created_at=sent_at
+            )
+            for (domain, step_id), sent_at in sends.items()
+            if step_id in signatures
+        ]
+
+    def _store(self, tenant_id: str, fingerprint: _Fingerprint):
+        db = self.session_factory()
+        try:
+            db.add(EmailFingerprint(
+                tenant_id=tenant_id,
+                domain=fingerprint.domain,
+                source=fingerprint.source,
+                source_id=fingerprint.source_id,
+                signature=fingerprint.signature.tobytes(),
+                created_at=fingerprint.created_at
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+# Create a global instance
+NEAR_DUPLICATE_INDEX = NearDuplicateIndex()
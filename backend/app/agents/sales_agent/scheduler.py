@@ -0,0 +1,202 @@
+"""
+Weighted fair scheduling of agent runs across tenants.
+
+At most AGENT_MAX_CONCURRENT_RUNS agents run at once. Runs beyond that
+wait in one queue per priority class (interactive, bulk). Classes share
+slots by weighted round robin, so bulk work never starves. Inside a class,
+tenants are served by deficit round robin weighted by Tenant.plan, so one
+tenant's large batch can't hold everyone else's runs back.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+from app.core.config import settings
+from app.observability.metrics import agent_queue_depth, agent_queue_wait
+
+# Runs dispatched per round robin turn, by Tenant.plan
+PLAN_WEIGHTS = {"free": 1, "pro": 2, "enterprise": 4}
+
+# Share of dispatches per priority class when both have queued runs
+PRIORITY_WEIGHTS = {"interactive": 4, "bulk": 1}
+
+@dataclass
+class _Waiter:
+    tenant_id: str
+    priority: str
+    future: asyncio.Future
+    enqueued_at: float
+
+@dataclass
+class _Flow:
+    weight: int
+    waiters: Deque[_Waiter] = field(default_factory=deque)
+    deficit: float = 0
+
+class DeficitRoundRobin:
+    """
+    Deficit round robin over per-tenant FIFO queues. Every run costs one
+    unit, so a tenant with weight w gets w runs per turn.
+    """
+
+    def __init__(self):
+        self.flows: Dict[str, _Flow] = {}
+        self.active: Deque[str] = deque()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, key: str, waiter: _Waiter, weight: int):
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = _Flow(weight=weight)
+        if not flow.waiters:
+            flow.deficit = weight
+            self.active.append(key)
+        flow.weight = weight
+        flow.waiters.append(waiter)
+        self._size += 1
+
+    def pop(self) -> Optional[_Waiter]:
+        while self.active:
+            key = self.active[0]
+            flow = self.flows[key]
+            if flow.deficit >= 1:
+                flow.deficit -= 1
+                self._size -= 1
+                waiter = flow.waiters.popleft()
+                if not flow.waiters:
+                    self._deactivate(key)
+                return waiter
+            # Turn used up: go to the back and top up for the next one
+            flow.deficit += flow.weight
+            self.active.rotate(-1)
+        return None
+
+    def remove(self, key: str, waiter: _Waiter) -> bool:
+        flow = self.flows.get(key)
+        if flow is None or waiter not in flow.waiters:
+            return False
+        flow.waiters.remove(waiter)
+        self._size -= 1
+        if not flow.waiters:
+            # A later push must start a fresh flow, not find this key
+            # still in active and add it twice
+            self.active.remove(key)
+            del self.flows[key]
+        return True
+
+    def depth(self, key: str) -> int:
+        flow = self.flows.get(key)
+        return len(flow.waiters) if flow else 0
+
+    def _deactivate(self, key: str):
+        self.active.popleft()
+        self.flows.pop(key, None)
+
+class AgentScheduler:
+    """
+    Admission control for agent runs, used as
+
+        async with AGENT_SCHEDULER.slot(tenant_id, plan, "interactive"):
+            ...
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.running = 0
+        self.queues: Dict[str, DeficitRoundRobin] = {
+            priority: DeficitRoundRobin() for priority in PRIORITY_WEIGHTS
+        }
+        self._credit: Dict[str, int] = {priority: 0 for priority in PRIORITY_WEIGHTS}
+
+    @classmethod
+    def from_settings(cls) -> "AgentScheduler":
+        return cls(max_concurrent=settings.AGENT_MAX_CONCURRENT_RUNS)
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queued": {priority: len(queue) for priority, queue in self.queues.items()}
+        }
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str, plan: Optional[str], priority: str = "interactive"):
+        await self.acquire(tenant_id, plan, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tenant_id: str, plan: Optional[str], priority: str = "interactive"):
+        """
+        Wait for a run slot. Cancelling the wait gives up the place in
+        the queue (or the slot, if it was granted in the meantime).
+        """
+        if priority not in self.queues:
+            raise ValueError(f"Unknown agent priority: {priority}")
+        tenant_id = str(tenant_id)
+
+        if self.running < self.max_concurrent and not self.queued():
+            self.running += 1
+            agent_queue_wait.labels(tenant_id=tenant_id, priority=priority).observe(0)
+            return
+
+        waiter = _Waiter(
+            tenant_id=tenant_id,
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic()
+        )
+        self.queues[priority].push(tenant_id, waiter, PLAN_WEIGHTS.get(plan or "free", 1))
+        agent_queue_depth.labels(tenant_id=tenant_id, priority=priority).inc()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled; hand the slot on
+                self.release()
+            elif self.queues[priority].remove(tenant_id, waiter):
+                agent_queue_depth.labels(tenant_id=tenant_id, priority=priority).dec()
+            raise
+
+    def release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            agent_queue_depth.labels(tenant_id=waiter.tenant_id, priority=waiter.priority).dec()
+            if waiter.future.done():
+                continue
+            self.running += 1
+            agent_queue_wait.labels(tenant_id=waiter.tenant_id, priority=waiter.priority).observe(
+                time.monotonic() - waiter.enqueued_at
+            )
+            waiter.future.set_result(None)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        # Smooth weighted round robin between non-empty classes
+        candidates = [priority for priority, queue in self.queues.items() if queue]
+        if not candidates:
+            return None
+        total = 0
+        for priority in candidates:
+            self._credit[priority] += PRIORITY_WEIGHTS[priority]
+            total += PRIORITY_WEIGHTS[priority]
+        chosen = max(candidates, key=lambda priority: self._credit[priority])
+        self._credit[chosen] -= total
+        return self.queues[chosen].pop()
+
+# Create a global instance
+AGENT_SCHEDULER = AgentScheduler.from_settings()
@@ -0,0 +1,126 @@
+"""
+Research and enrichment tools used by the sales agent
+"""
+import logging
+from typing import Dict, Any, Optional
+import httpx
+from app.core.config import settings
+from app.core.http_client import OUTBOUND_HTTP, OutboundHTTPClient
+
+logger = logging.getLogger(__name__)
+
+def _research_fallback(company: Optional[str]) -> Dict[str, Any]:
+    return {"company_info": {"name": company or "Test Company", "industry": "Technology"}}
+
+def _enrichment_fallback() -> Dict[str, Any]:
+    return {"linkedin_url": "https://linkedin.com/company/test"}
+
+def is_fallback(result: Optional[Dict[str, Any]]) -> bool:
+    """
+    Whether a research or enrichment result is empty or a stand-in for a
+    provider that isn't configured or failed, rather than real facts
+    """
+    if not result:
+        return True
+    if result == _enrichment_fallback():
+        return True
+    company_info = result.get("company_info")
+    return (
+        set(result) == {"company_info"}
+        and isinstance(company_info, dict)
+        and company_info == _research_fallback(company_info.get("name"))["company_info"]
+    )
+
+async def research_company(
+    domain: Optional[str],
+    company: Optional[str],
+    tenant_id: str,
+    http: OutboundHTTPClient = None
+) -> Dict[str, Any]:
+    """
+    Research a company through SerpAPI web search
+    """
+    if not settings.SERPAPI_API_KEY:
+        # No search provider configured; keep the agent usable in development
+        return _research_fallback(company)
+
+    http = http or OUTBOUND_HTTP
+    try:
+        response = await http.request(
+            "serpapi",
+            "GET",
+            "/search.json",
+            tenant_id=tenant_id,
+            params={
+                "engine": "google",
+                "q": " ".join(part for part in (company, domain) if part),
+                "num": 5,
+                "api_key": settings.SERPAPI_API_KEY
+            }
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        # Research is best effort; a failed search must not fail the run
+        logger.warning(f"Company research failed for {domain or company}: {str(e)}")
+        return _research_fallback(company)
+
+    knowledge_graph = data.get("knowledge_graph") or {}
+    return {
+        "company_info": {
+            "name": knowledge_graph.get("title") or company,
+            "industry": knowledge_graph.get("type"),
+            "description": knowledge_graph.get("description"),
+            "website": knowledge_graph.get("website") or (f"https://{domain}" if domain else None)
+        },
+        "search_results": [
+            {
+                "title": result.get("title"),
+                "link": result.get("link"),
+                "snippet": result.get("snippet")
+            }
+            for result in (data.get("organic_results") or [])[:5]
+        ]
+    }
+
+async def enrich_company(
+    domain: Optional[str],
+    tenant_id: str,
+    http: OutboundHTTPClient = None
+) -> Dict[str, Any]:
+    """
+    Enrich a company through the Clearbit company API
+    """
+    if not settings.CLEARBIT_API_KEY or not domain:
+        return _enrichment_fallback()
+
+    http = http or OUTBOUND_HTTP
+    try:
+        response = await http.request(
+            "clearbit",
+            "GET",
+            "/v2/companies/find",
+            tenant_id=tenant_id,
+            params={"domain": domain},
+            headers={"Authorization": f"Bearer {settings.CLEARBIT_API_KEY}"}
+        )
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Company enrichment failed for {domain}: {str(e)}")
+        return _enrichment_fallback()
+
+    linkedin_handle = (data.get("linkedin") or {}).get("handle")
+    category = data.get("category") or {}
+    metrics = data.get("metrics") or {}
+    return {
+        "company_name": data.get("name"),
+        "linkedin_url": f"https://linkedin.com/{linkedin_handle}" if linkedin_handle else None,
+        "industry": category.get("industry"),
+        "employees": metrics.get("employees"),
+        "location": data.get("location"),
+        "timezone": data.get("timeZone"),
+        "tech": data.get("tech") or []
+    }
@@ -0,0 +1,108 @@
+"""
+Structured, versioned storage format for agent trajectories.
+
+A trajectory is stored on AgentExecution.trajectory as
+
+    {"version": 1, "steps": [{...}, ...]}
+
+Steps whose JSON encoding exceeds TRAJECTORY_INLINE_LIMIT_BYTES are
+compressed into the agent_execution_payloads side table and replaced by a
+stub that keeps the summary fields and a payload_ref.
+"""
+import ast
+import json
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TRAJECTORY_SCHEMA_VERSION = 1
+
+# Fields kept inline on offloaded steps so timelines render without payloads
+SUMMARY_FIELDS = ("step", "status", "timestamp", "duration_ms", "cache", "model")
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """
+    Compress with zstd when available, zlib otherwise
+    """
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd trajectory payloads")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "none":
+        return data
+    raise ValueError(f"Unknown trajectory payload codec: {codec}")
+
+def encode_trajectory(
+    steps: List[Dict[str, Any]],
+    inline_limit: Optional[int] = None
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Encode steps into (document, payloads). Each payload is a dict with
+    step_index, codec, data and raw_size, ready for AgentExecutionPayload.
+    """
+    inline_limit = settings.TRAJECTORY_INLINE_LIMIT_BYTES if inline_limit is None else inline_limit
+
+    document_steps: List[Dict[str, Any]] = []
+    payloads: List[Dict[str, Any]] = []
+    for index, step in enumerate(steps):
+        raw = json.dumps(step, default=str, separators=(",", ":")).encode("utf-8")
+        if len(raw) <= inline_limit:
+            document_steps.append(json.loads(raw))
+            continue
+
+        codec, data = compress(raw)
+        payloads.append({
+            "step_index": index,
+            "codec": codec,
+            "data": data,
+            "raw_size": len(raw)
+        })
+        stub = {field: step[field] for field in SUMMARY_FIELDS if field in step}
+        stub["payload_ref"] = index
+        document_steps.append(stub)
+
+    return {"version": TRAJECTORY_SCHEMA_VERSION, "steps": document_steps}, payloads
+
+def decode_trajectory(
+    document: Any,
+    payloads: Optional[Dict[int, Tuple[str, bytes]]] = None
+) -> Dict[str, Any]:
+    """
+    Decode a stored trajectory, inflating offloaded steps from
+    payloads ({step_index: (codec, data)}). Offloaded steps without a
+    loaded payload are returned as their stubs.
+    """
+    if document is None:
+        return {"version": TRAJECTORY_SCHEMA_VERSION, "steps": []}
+
+    if isinstance(document, str):
+        # Rows written before the structured format hold a Python repr
+        try:
+            steps = ast.literal_eval(document)
+        except (ValueError, SyntaxError):
+            steps = [{"raw": document}]
+        return {"version": 0, "steps": steps if isinstance(steps, list) else [steps]}
+
+    payloads = payloads or {}
+    steps = []
+    for step in document.get("steps", []):
+        ref = step.get("payload_ref")
+        if ref is not None and ref in payloads:
+            codec, data = payloads[ref]
+            steps.append(json.loads(decompress(codec, data)))
+        else:
+            steps.append(step)
+
+    return {"version": document.get("version", TRAJECTORY_SCHEMA_VERSION), "steps": steps}
@@ -0,0 +1,139 @@
+"""
+Verification engine for drafted emails.
+
+The checks in checks.py are CPU-bound, so they run in a process pool
+instead of on the event loop. Drafts verified within
+VERIFICATION_BATCH_WAIT_MS of each other are sent to a worker as one
+batch, which amortizes the pickling and IPC cost per call.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.agents.sales_agent.checks import verify_batch
+
+logger = logging.getLogger(__name__)
+
+# Thresholds that fail verification
+MAX_SPAM_SCORE = 5.0
+MAX_SIMILARITY = 0.8
+# Below this the email is flagged as hard to read, without failing it
+MIN_READING_EASE = 30.0
+
+@dataclass
+class _PendingCheck:
+    item: Dict[str, Any]
+    future: asyncio.Future
+
+def summarize_checks(checks: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn raw check output into verification_result: the checks plus
+    passed, issues (blocking) and warnings
+    """
+    issues: List[str] = []
+    warnings: List[str] = []
+    if checks["spam"]["score"] > MAX_SPAM_SCORE:
+        issues.append("spam_score")
+    if checks["pii"]["found"]:
+        issues.append("pii")
+    if checks["similarity"] > MAX_SIMILARITY:
+        issues.append("duplicate")
+    if checks["links"]["flagged"]:
+        warnings.append("links")
+    reading_ease = checks["readability"]["flesch_reading_ease"]
+    if reading_ease is not None and reading_ease < MIN_READING_EASE:
+        warnings.append("readability")
+    return {**checks, "passed": not issues, "issues": issues, "warnings": warnings}
+
+class VerificationEngine:
+    """
+    Batches verification requests onto a process pool. With workers=0 the
+    checks run on the default thread pool instead (for environments that
+    can't spawn processes); the event loop still isn't blocked.
+    """
+
+    def __init__(self, workers: int, max_batch: int, max_wait: float):
+        self.workers = workers
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._executor: Optional[Executor] = None
+        self._pending: List[_PendingCheck] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    @classmethod
+    def from_settings(cls) -> "VerificationEngine":
+        return cls(
+            workers=settings.VERIFICATION_WORKERS,
+            max_batch=settings.VERIFICATION_BATCH_SIZE,
+            max_wait=settings.VERIFICATION_BATCH_WAIT_MS / 1000
+        )
+
+    def executor(self) -> Optional[Executor]:
+        if self._executor is None and self.workers > 0:
+            # spawn, because forking a process with running threads (the
+            # event loop's executors, connection pools) isn't safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def verify(
+        self,
+        text: str,
+        previous: Optional[List[str]] = None,
+        allowed_pii: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run every check on a draft and return its verification_result
+        """
+        pending = _PendingCheck(
+            item={"text": text, "previous": previous or [], "allowed_pii": allowed_pii or []},
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._pending.append(pending)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return summarize_checks(await pending.future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        batch = [pending for pending in batch if not pending.future.done()]
+        if not batch:
+            return
+        task = asyncio.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[_PendingCheck]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor(), verify_batch, [pending.item for pending in batch]
+            )
+        except Exception as e:
+            logger.error(f"Verification batch of {len(batch)} failed: {str(e)}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create a global instance
+VERIFICATION_ENGINE = VerificationEngine.from_settings()
@@ -1 +1 @@
-from app.api.v1.endpoints.customer import leads, agent, campaigns, crm
\ No newline at end of file
+from app.api.v1.endpoints.customer import leads, agent, campaigns, crm, knowledge
\ No newline at end of file
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from typing import List, Optional, Union
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db.models.user import User
-from app.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse
+from app.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse, CampaignLeadsAdd
 from app.services.customer.campaign_service import CampaignService
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_idempotency_key, run_idempotent
+from app.core.idempotency import request_fingerprint
 
 router = APIRouter()
 
@@ -115,13 +116,26 @@ async def deactivate_campaign(
 @router.post("/{campaign_id}/add-leads")
 async def add_leads_to_campaign(
     campaign_id: str,
-    lead_ids: List[str],
+    request: Union[List[str], CampaignLeadsAdd],
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Add leads to a campaign
+    Add leads to a campaign: a list of lead IDs, {"lead_ids": [...]}, or
+    {"filter": {...}} to enroll every matching lead server-side. Leads
+    already in the campaign are skipped. Retries with the same
+    Idempotency-Key return the original result.
     """
     campaign_service = CampaignService(db, current_user)
-    result = await campaign_service.add_leads_to_campaign(campaign_id, lead_ids)
-    return result
\ No newline at end of file
+    fingerprint = request_fingerprint(current_user.id, "add-leads", campaign_id, request)
+    if isinstance(request, list):
+        request = CampaignLeadsAdd(lead_ids=request)
+
+    async def add():
+        try:
+            return await campaign_service.add_leads_to_campaign(campaign_id, request.lead_ids, request.filter)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    return await run_idempotent(current_user, idempotency_key, fingerprint, add)
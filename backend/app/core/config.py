@@ -25,9 +25,108 @@ class Settings(BaseSettings):
     PRIMARY_MODEL: str = os.getenv("PRIMARY_MODEL", "gpt-4o-mini")
     FALLBACK_MODEL: str = os.getenv("FALLBACK_MODEL", "gpt-4o")
 
+    # Model routing (hedge delay of 0 means hedge at the primary's observed
+    # p95, once it has enough samples)
+    MODEL_HEDGE_DELAY_MS: float = float(os.getenv("MODEL_HEDGE_DELAY_MS", "0"))
+    MODEL_ROUTER_WINDOW: int = int(os.getenv("MODEL_ROUTER_WINDOW", "200"))
+    MODEL_ROUTER_ERROR_THRESHOLD: float = float(os.getenv("MODEL_ROUTER_ERROR_THRESHOLD", "0.5"))
+
     # External API settings
     SERPAPI_API_KEY: str = os.getenv("SERPAPI_API_KEY", "")
     CLEARBIT_API_KEY: str = os.getenv("CLEARBIT_API_KEY", "")
+    SERPAPI_BASE_URL: str = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+    CLEARBIT_BASE_URL: str = os.getenv("CLEARBIT_BASE_URL", "https://company.clearbit.com")
+
+    # Outbound API rate limits (requests per second and burst size)
+    SERPAPI_RATE_LIMIT_PER_SECOND: float = float(os.getenv("SERPAPI_RATE_LIMIT_PER_SECOND", "5"))
+    SERPAPI_RATE_LIMIT_BURST: int = int(os.getenv("SERPAPI_RATE_LIMIT_BURST", "10"))
+    CLEARBIT_RATE_LIMIT_PER_SECOND: float = float(os.getenv("CLEARBIT_RATE_LIMIT_PER_SECOND", "10"))
+    CLEARBIT_RATE_LIMIT_BURST: int = int(os.getenv("CLEARBIT_RATE_LIMIT_BURST", "20"))
+    OUTBOUND_TENANT_RATE_LIMIT_PER_SECOND: float = float(os.getenv("OUTBOUND_TENANT_RATE_LIMIT_PER_SECOND", "2"))
+    OUTBOUND_TENANT_RATE_LIMIT_BURST: int = int(os.getenv("OUTBOUND_TENANT_RATE_LIMIT_BURST", "5"))
+    OUTBOUND_MAX_CONNECTIONS: int = int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "20"))
+
+    # Company research/enrichment cache (shared per tenant, keyed by domain)
+    COMPANY_RESEARCH_TTL_SECONDS: int = int(os.getenv("COMPANY_RESEARCH_TTL_SECONDS", "86400"))
+    COMPANY_ENRICHMENT_TTL_SECONDS: int = int(os.getenv("COMPANY_ENRICHMENT_TTL_SECONDS", "604800"))
+    COMPANY_CACHE_MAX_ENTRIES: int = int(os.getenv("COMPANY_CACHE_MAX_ENTRIES", "10000"))
+
+    # Agent progress streaming
+    AGENT_EVENT_BUFFER_SIZE: int = int(os.getenv("AGENT_EVENT_BUFFER_SIZE", "256"))
+    AGENT_EVENT_HEARTBEAT_SECONDS: float = float(os.getenv("AGENT_EVENT_HEARTBEAT_SECONDS", "15"))
+
+    # Agent run scheduling (weighted fair queuing across tenants)
+    AGENT_MAX_CONCURRENT_RUNS: int = int(os.getenv("AGENT_MAX_CONCURRENT_RUNS", "16"))
+    AGENT_BATCH_WINDOW: int = int(os.getenv("AGENT_BATCH_WINDOW", "32"))  # Queued + running runs per batch
+    AGENT_BATCH_MAX_LEADS: int = int(os.getenv("AGENT_BATCH_MAX_LEADS", "100000"))
+
+    # Start interactive drafts from the lead's own fields before research lands
+    AGENT_SPECULATIVE_DRAFT: bool = os.getenv("AGENT_SPECULATIVE_DRAFT", "false").lower() == "true"
+
+    # Draft micro-batching for bulk runs (batch size 1 disables it)
+    AGENT_DRAFT_BATCH_SIZE: int = int(os.getenv("AGENT_DRAFT_BATCH_SIZE", "8"))
+    AGENT_DRAFT_BATCH_WAIT_MS: int = int(os.getenv("AGENT_DRAFT_BATCH_WAIT_MS", "250"))
+
+    # Draft verification checks (0 workers runs them on a thread instead)
+    VERIFICATION_WORKERS: int = int(os.getenv("VERIFICATION_WORKERS", "2"))
+    VERIFICATION_BATCH_SIZE: int = int(os.getenv("VERIFICATION_BATCH_SIZE", "16"))
+    VERIFICATION_BATCH_WAIT_MS: int = int(os.getenv("VERIFICATION_BATCH_WAIT_MS", "5"))
+
+    # Near-duplicate outreach detection per tenant and recipient domain
+    NEAR_DUPLICATE_WINDOW_DAYS: int = int(os.getenv("NEAR_DUPLICATE_WINDOW_DAYS", "30"))
+    NEAR_DUPLICATE_THRESHOLD: float = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+    NEAR_DUPLICATE_NUM_PERM: int = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "128"))
+    NEAR_DUPLICATE_BANDS: int = int(os.getenv("NEAR_DUPLICATE_BANDS", "16"))
+
+    # Knowledge base retrieval (hashing embedder when no OpenAI key is set)
+    KNOWLEDGE_EMBEDDER: str = os.getenv("KNOWLEDGE_EMBEDDER", "auto")  # auto, openai, hashing
+    KNOWLEDGE_EMBEDDING_MODEL: str = os.getenv("KNOWLEDGE_EMBEDDING_MODEL", "text-embedding-3-small")
+    KNOWLEDGE_EMBEDDING_DIM: int = int(os.getenv("KNOWLEDGE_EMBEDDING_DIM", "384"))
+    KNOWLEDGE_EMBEDDING_MAX_CHARS: int = int(os.getenv("KNOWLEDGE_EMBEDDING_MAX_CHARS", "8000"))
+    KNOWLEDGE_EMBED_BATCH_SIZE: int = int(os.getenv("KNOWLEDGE_EMBED_BATCH_SIZE", "64"))
+    KNOWLEDGE_TOP_K: int = int(os.getenv("KNOWLEDGE_TOP_K", "5"))
+    KNOWLEDGE_MIN_SCORE: float = float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.2"))
+    KNOWLEDGE_CACHE_MAX_ENTRIES: int = int(os.getenv("KNOWLEDGE_CACHE_MAX_ENTRIES", "10000"))  # 0 disables
+    KNOWLEDGE_CACHE_QUERY_LEVELS: int = int(os.getenv("KNOWLEDGE_CACHE_QUERY_LEVELS", "64"))  # Query vector grid
+    KNOWLEDGE_SEARCH_MODE: str = os.getenv("KNOWLEDGE_SEARCH_MODE", "hybrid")  # hybrid, vector, lexical
+    KNOWLEDGE_HYBRID_DEPTH: int = int(os.getenv("KNOWLEDGE_HYBRID_DEPTH", "50"))  # Candidates per ranking fused
+    KNOWLEDGE_RRF_K: int = int(os.getenv("KNOWLEDGE_RRF_K", "60"))
+    KNOWLEDGE_BM25_K1: float = float(os.getenv("KNOWLEDGE_BM25_K1", "1.2"))
+    KNOWLEDGE_BM25_B: float = float(os.getenv("KNOWLEDGE_BM25_B", "0.75"))
+    KNOWLEDGE_SNIPPET_CHARS: int = int(os.getenv("KNOWLEDGE_SNIPPET_CHARS", "600"))
+    KNOWLEDGE_ANN_BACKEND: str = os.getenv("KNOWLEDGE_ANN_BACKEND", "auto")  # auto, hnsw, ivf, flat
+    KNOWLEDGE_ANN_MIN_ROWS: int = int(os.getenv("KNOWLEDGE_ANN_MIN_ROWS", "50000"))
+    KNOWLEDGE_IVF_NPROBE: int = int(os.getenv("KNOWLEDGE_IVF_NPROBE", "8"))
+    KNOWLEDGE_HNSW_M: int = int(os.getenv("KNOWLEDGE_HNSW_M", "32"))
+    KNOWLEDGE_HNSW_EF_SEARCH: int = int(os.getenv("KNOWLEDGE_HNSW_EF_SEARCH", "64"))
+    KNOWLEDGE_QUANTIZATION: str = os.getenv("KNOWLEDGE_QUANTIZATION", "none")  # none, int8, pq
+    KNOWLEDGE_QUANT_MIN_ROWS: int = int(os.getenv("KNOWLEDGE_QUANT_MIN_ROWS", "20000"))
+    KNOWLEDGE_PQ_GROUPS: int = int(os.getenv("KNOWLEDGE_PQ_GROUPS", "0"))  # 0: dim / 4 (16x smaller)
+    KNOWLEDGE_RERANK_FACTOR: int = int(os.getenv("KNOWLEDGE_RERANK_FACTOR", "8"))  # Candidates re-ranked per result
+    KNOWLEDGE_DELTA_MIN_ROWS: int = int(os.getenv("KNOWLEDGE_DELTA_MIN_ROWS", "10000"))
+    KNOWLEDGE_DELTA_RATIO: float = float(os.getenv("KNOWLEDGE_DELTA_RATIO", "0.05"))
+    KNOWLEDGE_SNAPSHOT_DIR: str = os.getenv("KNOWLEDGE_SNAPSHOT_DIR", "./knowledge_snapshots")  # empty disables
+    KNOWLEDGE_SNAPSHOT_KEEP: int = int(os.getenv("KNOWLEDGE_SNAPSHOT_KEEP", "2"))
+    KNOWLEDGE_SNAPSHOT_POLL_SECONDS: float = float(os.getenv("KNOWLEDGE_SNAPSHOT_POLL_SECONDS", "5"))
+    KNOWLEDGE_CHUNK_CHARS: int = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "1500"))
+    KNOWLEDGE_CHUNK_OVERLAP: int = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "200"))
+    KNOWLEDGE_INGEST_CONCURRENCY: int = int(os.getenv("KNOWLEDGE_INGEST_CONCURRENCY", "4"))  # Embedding calls in flight per upload
+    KNOWLEDGE_INGEST_MAX_ERRORS: int = int(os.getenv("KNOWLEDGE_INGEST_MAX_ERRORS", "50"))
+    KNOWLEDGE_UPLOAD_MAX_BYTES: int = int(os.getenv("KNOWLEDGE_UPLOAD_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Tenant spend enforcement (limits come from Tenant.limits)
+    BUDGET_BACKEND: str = os.getenv("BUDGET_BACKEND", "memory")  # memory, redis
+    AGENT_BUDGET_WAIT_SECONDS: float = float(os.getenv("AGENT_BUDGET_WAIT_SECONDS", "0"))
+    AGENT_DRAFT_MAX_TOKENS: int = int(os.getenv("AGENT_DRAFT_MAX_TOKENS", "400"))
+
+    # Idempotency-Key handling for retried POSTs
+    IDEMPOTENCY_BACKEND: str = os.getenv("IDEMPOTENCY_BACKEND", "database")  # database, redis
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LEASE_SECONDS: int = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+
+    # Trajectory steps larger than this are compressed into a side table
+    TRAJECTORY_INLINE_LIMIT_BYTES: int = int(os.getenv("TRAJECTORY_INLINE_LIMIT_BYTES", "4096"))
 
     # Redis settings
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -54,6 +153,24 @@ class Settings(BaseSettings):
     SMTP_USER: str = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
 
+    # Campaign execution (workers in every process share due assignments)
+    CAMPAIGN_ENGINE_ENABLED: bool = os.getenv("CAMPAIGN_ENGINE_ENABLED", "false").lower() == "true"
+    CAMPAIGN_WORKERS: int = int(os.getenv("CAMPAIGN_WORKERS", "2"))  # Claim loops per process
+    CAMPAIGN_BATCH_SIZE: int = int(os.getenv("CAMPAIGN_BATCH_SIZE", "500"))
+    CAMPAIGN_HORIZON_SECONDS: int = int(os.getenv("CAMPAIGN_HORIZON_SECONDS", "600"))  # How far ahead due steps are loaded into the timer wheel
+    CAMPAIGN_LOAD_INTERVAL_SECONDS: float = float(os.getenv("CAMPAIGN_LOAD_INTERVAL_SECONDS", "60"))  # Keep well under the horizon
+    CAMPAIGN_LOAD_MAX_ROWS: int = int(os.getenv("CAMPAIGN_LOAD_MAX_ROWS", "100000"))  # Per load
+    CAMPAIGN_TIMER_RESOLUTION_SECONDS: float = float(os.getenv("CAMPAIGN_TIMER_RESOLUTION_SECONDS", "1"))
+    CAMPAIGN_LEASE_SECONDS: int = int(os.getenv("CAMPAIGN_LEASE_SECONDS", "600"))  # Claims rerun after this if a worker dies
+    CAMPAIGN_RETRY_SECONDS: int = int(os.getenv("CAMPAIGN_RETRY_SECONDS", "900"))
+    CAMPAIGN_SMTP_CONNECTIONS: int = int(os.getenv("CAMPAIGN_SMTP_CONNECTIONS", "4"))  # Per batch
+    CAMPAIGN_EMAIL_FROM: str = os.getenv("CAMPAIGN_EMAIL_FROM", "")  # Defaults to SMTP_USER
+    CAMPAIGN_ENROLL_CHUNK_SIZE: int = int(os.getenv("CAMPAIGN_ENROLL_CHUNK_SIZE", "5000"))  # Leads per add-leads insert
+    CAMPAIGN_SEND_WINDOW_START: str = os.getenv("CAMPAIGN_SEND_WINDOW_START", "09:00")  # Recipient's local time
+    CAMPAIGN_SEND_WINDOW_END: str = os.getenv("CAMPAIGN_SEND_WINDOW_END", "17:00")
+    CAMPAIGN_SEND_DAYS: str = os.getenv("CAMPAIGN_SEND_DAYS", "0,1,2,3,4")  # Weekdays, Monday is 0
+    CAMPAIGN_DEFAULT_TIMEZONE: str = os.getenv("CAMPAIGN_DEFAULT_TIMEZONE", "UTC")  # For leads without an enriched time zone
+
     # OAuth settings
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID", "")
     GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET", "")
@@ -0,0 +1,249 @@
+"""
+Shared outbound HTTP client layer for third-party APIs (SerpAPI, Clearbit)
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+import httpx
+from app.core.config import settings
+from app.observability.metrics import (
+    outbound_requests_total,
+    outbound_request_duration,
+    outbound_rate_limit_wait,
+    outbound_throttled_total
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProviderConfig:
+    name: str
+    base_url: str
+    rate_per_second: float
+    burst: int
+    tenant_rate_per_second: float
+    tenant_burst: int
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    timeout_seconds: float = 10.0
+    max_retries: int = 3
+
+class TokenBucket:
+    """
+    Async token bucket with adaptive rate.
+
+    Callers take their tokens at once, running the bucket into debt if
+    need be, and sleep until the refill has paid it off. Each caller thus
+    queues behind everyone before it (FIFO) without holding a lock while
+    it sleeps. The rate is halved whenever the upstream answers 429 and
+    recovers additively on successful calls, up to the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        # Refill runs from here; in the future while blocked by Retry-After
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """
+        Wait until tokens are available, returning the time spent waiting
+        """
+        start = time.monotonic()
+        # No await until the tokens are taken, so this is atomic on the loop
+        self._refill(start)
+        self.tokens -= tokens
+        wait = self.updated_at + max(0.0, -self.tokens) / self.rate - start
+        while wait > 0:
+            await asyncio.sleep(wait)
+            # A 429 while we slept holds us back too
+            wait = self.blocked_until - time.monotonic()
+        return time.monotonic() - start
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """
+        Back off after the upstream rejected a request
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        # Callers already in debt keep their place
+        self.tokens = min(self.tokens, 0.0)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Nothing refills until the block is over
+            self.updated_at = max(self.updated_at, self.blocked_until)
+
+    def recover(self):
+        """
+        Creep back towards the configured rate after a successful call
+        """
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class OutboundHTTPClient:
+    """
+    Keep-alive connection pools plus per-provider and per-tenant rate limits
+    """
+
+    def __init__(self, providers: Dict[str, ProviderConfig]):
+        self.providers = providers
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._provider_buckets: Dict[str, TokenBucket] = {}
+        self._tenant_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    @classmethod
+    def from_settings(cls) -> "OutboundHTTPClient":
+        return cls({
+            "serpapi": ProviderConfig(
+                name="serpapi",
+                base_url=settings.SERPAPI_BASE_URL,
+                rate_per_second=settings.SERPAPI_RATE_LIMIT_PER_SECOND,
+                burst=settings.SERPAPI_RATE_LIMIT_BURST,
+                tenant_rate_per_second=settings.OUTBOUND_TENANT_RATE_LIMIT_PER_SECOND,
+                tenant_burst=settings.OUTBOUND_TENANT_RATE_LIMIT_BURST,
+                max_connections=settings.OUTBOUND_MAX_CONNECTIONS
+            ),
+            "clearbit": ProviderConfig(
+                name="clearbit",
+                base_url=settings.CLEARBIT_BASE_URL,
+                rate_per_second=settings.CLEARBIT_RATE_LIMIT_PER_SECOND,
+                burst=settings.CLEARBIT_RATE_LIMIT_BURST,
+                tenant_rate_per_second=settings.OUTBOUND_TENANT_RATE_LIMIT_PER_SECOND,
+                tenant_burst=settings.OUTBOUND_TENANT_RATE_LIMIT_BURST,
+                max_connections=settings.OUTBOUND_MAX_CONNECTIONS
+            ),
+        })
+
+    def client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Get (or lazily create) the pooled client for a provider
+        """
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            config = self.providers[provider]
+            client = httpx.AsyncClient(
+                base_url=config.base_url,
+                timeout=config.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections
+                )
+            )
+            self._clients[provider] = client
+        return client
+
+    def _buckets(self, provider: str, tenant_id: str) -> Tuple[TokenBucket, TokenBucket]:
+        config = self.providers[provider]
+
+        provider_bucket = self._provider_buckets.get(provider)
+        if provider_bucket is None:
+            provider_bucket = TokenBucket(config.rate_per_second, config.burst)
+            self._provider_buckets[provider] = provider_bucket
+
+        tenant_bucket = self._tenant_buckets.get((provider, tenant_id))
+        if tenant_bucket is None:
+            tenant_bucket = TokenBucket(config.tenant_rate_per_second, config.tenant_burst)
+            self._tenant_buckets[(provider, tenant_id)] = tenant_bucket
+
+        return provider_bucket, tenant_bucket
+
+    async def request(
+        self,
+        provider: str,
+        method: str,
+        url: str,
+        tenant_id: str = "unknown",
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a rate-limited request, retrying 429s with adaptive backoff
+        """
+        config = self.providers[provider]
+        provider_bucket, tenant_bucket = self._buckets(provider, str(tenant_id))
+        client = self.client(provider)
+
+        attempt = 0
+        while True:
+            # Tenant first, so one noisy tenant queues on its own bucket
+            # instead of holding provider-wide capacity
+            waited = await tenant_bucket.acquire()
+            outbound_rate_limit_wait.labels(provider=provider, scope="tenant").observe(waited)
+            waited = await provider_bucket.acquire()
+            outbound_rate_limit_wait.labels(provider=provider, scope="provider").observe(waited)
+
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                outbound_requests_total.labels(
+                    provider=provider, status_code="error", tenant_id=str(tenant_id)
+                ).inc()
+                raise
+            finally:
+                outbound_request_duration.labels(provider=provider).observe(time.perf_counter() - start)
+
+            outbound_requests_total.labels(
+                provider=provider, status_code=response.status_code, tenant_id=str(tenant_id)
+            ).inc()
+
+            if response.status_code != 429:
+                provider_bucket.recover()
+                tenant_bucket.recover()
+                return response
+
+            outbound_throttled_total.labels(provider=provider).inc()
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            # The tenant too, or it keeps sending into the Retry-After window
+            # as fast as its own bucket allows
+            provider_bucket.throttle(retry_after)
+            tenant_bucket.throttle(retry_after)
+
+            if attempt >= config.max_retries:
+                return response
+
+            delay = retry_after if retry_after is not None else min(30.0, 0.5 * 2 ** attempt)
+            delay += random.uniform(0, delay * 0.1)
+            logger.warning(f"{provider} returned 429, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        """
+        Close all pooled connections
+        """
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+# Create a global instance
+OUTBOUND_HTTP = OutboundHTTPClient.from_settings()
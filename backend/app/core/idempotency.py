@@ -0,0 +1,390 @@
+"""
+Idempotency-Key handling for POST endpoints that do paid or
+non-repeatable work.
+
+The first request with a key claims it with a lease and runs; its response
+is stored (zlib-compressed JSON) for IDEMPOTENCY_TTL_SECONDS and replayed
+to retries with the same key. Retries that arrive while the original is
+still running wait for it instead of running again: in the same process
+on its future, across workers by polling the store. A key reused with a
+different request is rejected. Failed requests release their key so the
+client can retry.
+
+Keys live in the idempotency_keys table or, with IDEMPOTENCY_BACKEND=redis,
+in Redis hashes that expire on their own.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.core.exceptions import IdempotencyKeyInProgressException, IdempotencyKeyReusedException
+from app.db.session import SessionLocal
+from app.db.models.idempotency_key import IdempotencyKey
+from app.observability.metrics import idempotency_requests_total
+
+logger = logging.getLogger(__name__)
+
+# Header set on responses replayed from the store
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Expired rows are overwritten when their key is reused; the rest are
+# deleted at most this often
+PURGE_INTERVAL_SECONDS = 3600
+
+Handler = Callable[[], Awaitable[Any]]
+
+@dataclass
+class StoredKey:
+    fingerprint: str
+    status: str  # in_progress, completed
+    response_status: Optional[int] = None
+    response_body: Optional[bytes] = None
+
+def request_fingerprint(*parts: Any) -> str:
+    """
+    Hash of everything that identifies a request (user, method, path,
+    parameters, body), used to detect a key reused for a different request
+    """
+    encoded = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def encode_body(body: Any) -> bytes:
+    return zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"), 6)
+
+def decode_body(data: bytes) -> Any:
+    return json.loads(zlib.decompress(data))
+
+class DatabaseIdempotencyBackend:
+    """
+    Keys in the idempotency_keys table. A claim is a single INSERT ... ON
+    CONFLICT that only overwrites an expired row, so it is atomic across
+    workers.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._last_purge = 0.0
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def claim(self, tenant_id: str, key: str, fingerprint: str, lease: int) -> Optional[StoredKey]:
+        return await self._run(self._claim, tenant_id, key, fingerprint, lease)
+
+    async def get(self, tenant_id: str, key: str) -> Optional[StoredKey]:
+        return await self._run(self._get, tenant_id, key)
+
+    async def renew(self, tenant_id: str, key: str, fingerprint: str, lease: int):
+        await self._run(self._update, tenant_id, key, fingerprint, {
+            "expires_at": datetime.utcnow() + timedelta(seconds=lease)
+        })
+
+    async def complete(self, tenant_id: str, key: str, fingerprint: str, status_code: int, body: bytes, ttl: int):
+        await self._run(self._update, tenant_id, key, fingerprint, {
+            "status": "completed",
+            "response_status": status_code,
+            "response_body": body,
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl)
+        })
+
+    async def release(self, tenant_id: str, key: str, fingerprint: str):
+        await self._run(self._delete, tenant_id, key, fingerprint)
+
+    def _claim(self, tenant_id: str, key: str, fingerprint: str, lease: int) -> Optional[StoredKey]:
+        now = datetime.utcnow()
+        values = {
+            "tenant_id": tenant_id,
+            "key": key,
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "response_status": None,
+            "response_body": None,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=lease)
+        }
+        statement = insert(IdempotencyKey).values(**values).on_conflict_do_update(
+            constraint="uq_idempotency_keys_tenant_key",
+            set_={name: value for name, value in values.items() if name not in ("tenant_id", "key")},
+            where=IdempotencyKey.expires_at < now
+        ).returning(IdempotencyKey.id)
+
+        db = self.session_factory()
+        try:
+            claimed = db.execute(statement).first() is not None
+            db.commit()
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                db.query(IdempotencyKey).filter(IdempotencyKey.expires_at < now).delete(synchronize_session=False)
+                db.commit()
+        finally:
+            db.close()
+        return None if claimed else self._get(tenant_id, key)
+
+    def _get(self, tenant_id: str, key: str) -> Optional[StoredKey]:
+        db = self.session_factory()
+        try:
+            row = db.query(IdempotencyKey).filter(
+                IdempotencyKey.tenant_id == tenant_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at >= datetime.utcnow()
+            ).first()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return StoredKey(row.fingerprint, row.status, row.response_status, row.response_body)
+
+    def _owned(self, tenant_id: str, key: str, fingerprint: str):
+        return and_(
+            IdempotencyKey.tenant_id == tenant_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.fingerprint == fingerprint,
+            IdempotencyKey.status == "in_progress"
+        )
+
+    def _update(self, tenant_id: str, key: str, fingerprint: str, values: Dict[str, Any]):
+        db = self.session_factory()
+        try:
+            db.query(IdempotencyKey).filter(self._owned(tenant_id, key, fingerprint)).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _delete(self, tenant_id: str, key: str, fingerprint: str):
+        db = self.session_factory()
+        try:
+            db.query(IdempotencyKey).filter(self._owned(tenant_id, key, fingerprint)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+class RedisIdempotencyBackend:
+    """
+    Keys as Redis hashes whose TTL is the lease, then the response TTL.
+    Claims and owner-only updates are Lua scripts so they are atomic.
+    """
+
+    CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HMGET', KEYS[1], 'fingerprint', 'status', 'response_status', 'response_body')
+end
+redis.call('HSET', KEYS[1], 'fingerprint', ARGV[1], 'status', 'in_progress')
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return false
+"""
+
+    # ARGV: fingerprint, ttl, then field/value pairs to set (none deletes the key)
+    UPDATE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'fingerprint') ~= ARGV[1] or redis.call('HGET', KEYS[1], 'status') ~= 'in_progress' then
+    return 0
+end
+if #ARGV == 2 then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+        self._claim = self.redis.register_script(self.CLAIM_SCRIPT)
+        self._update = self.redis.register_script(self.UPDATE_SCRIPT)
+
+    def _key(self, tenant_id: str, key: str) -> str:
+        return f"idempotency:{tenant_id}:{key}"
+
+    def _stored(self, values) -> Optional[StoredKey]:
+        if not values or values[0] is None:
+            return None
+        fingerprint, status, response_status, response_body = values
+        return StoredKey(
+            fingerprint=fingerprint.decode(),
+            status=status.decode(),
+            response_status=int(response_status) if response_status is not None else None,
+            response_body=response_body
+        )
+
+    async def claim(self, tenant_id: str, key: str, fingerprint: str, lease: int) -> Optional[StoredKey]:
+        result = await self._claim(keys=[self._key(tenant_id, key)], args=[fingerprint, lease])
+        return self._stored(result)
+
+    async def get(self, tenant_id: str, key: str) -> Optional[StoredKey]:
+        values = await self.redis.hmget(
+            self._key(tenant_id, key), "fingerprint", "status", "response_status", "response_body"
+        )
+        return self._stored(values)
+
+    async def renew(self, tenant_id: str, key: str, fingerprint: str, lease: int):
+        await self._update(keys=[self._key(tenant_id, key)], args=[fingerprint, lease, "status", "in_progress"])
+
+    async def complete(self, tenant_id: str, key: str, fingerprint: str, status_code: int, body: bytes, ttl: int):
+        await self._update(keys=[self._key(tenant_id, key)], args=[
+            fingerprint, ttl, "status", "completed", "response_status", status_code, "response_body", body
+        ])
+
+    async def release(self, tenant_id: str, key: str, fingerprint: str):
+        await self._update(keys=[self._key(tenant_id, key)], args=[fingerprint, 0])
+
+class IdempotencyStore:
+    """
+    Runs a request handler at most once per (tenant, Idempotency-Key)
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        ttl: Optional[int] = None,
+        lease: Optional[int] = None,
+        wait: Optional[float] = None,
+        poll_interval: float = 0.25
+    ):
+        self.backend = backend or DatabaseIdempotencyBackend()
+        self.ttl = ttl or settings.IDEMPOTENCY_TTL_SECONDS
+        self.lease = lease or settings.IDEMPOTENCY_LEASE_SECONDS
+        self.wait = settings.IDEMPOTENCY_WAIT_SECONDS if wait is None else wait
+        self.poll_interval = poll_interval
+        self._inflight: Dict[Tuple[str, str], Tuple[str, asyncio.Task]] = {}
+
+    @classmethod
+    def from_settings(cls) -> "IdempotencyStore":
+        backend = None
+        if settings.IDEMPOTENCY_BACKEND == "redis":
+            backend = RedisIdempotencyBackend(settings.REDIS_URL)
+        return cls(backend=backend)
+
+    async def run(
+        self,
+        tenant_id: str,
+        key: Optional[str],
+        fingerprint: str,
+        handler: Handler,
+        status_code: int = 200
+    ) -> Any:
+        """
+        Return handler's response, running it only if no request with this
+        key has completed or is still running. Without a key the handler
+        just runs.
+        """
+        if not key:
+            return await handler()
+
+        scope = (str(tenant_id), key)
+        inflight = self._inflight.get(scope)
+        if inflight is not None:
+            owner_fingerprint, task = inflight
+            if owner_fingerprint != fingerprint:
+                idempotency_requests_total.labels(outcome="reused").inc()
+                raise IdempotencyKeyReusedException(key)
+            idempotency_requests_total.labels(outcome="coalesced").inc()
+            stored_status, body = await asyncio.shield(task)
+            return self._response(stored_status, body, replayed=True)
+
+        deadline = time.monotonic() + self.wait
+        while True:
+            stored = await self.backend.claim(scope[0], key, fingerprint, self.lease)
+            if stored is None:
+                break
+            if stored.fingerprint != fingerprint:
+                idempotency_requests_total.labels(outcome="reused").inc()
+                raise IdempotencyKeyReusedException(key)
+            if stored.status == "completed":
+                idempotency_requests_total.labels(outcome="replayed").inc()
+                return self._response(stored.response_status, decode_body(stored.response_body), replayed=True)
+
+            # Another worker is running it: wait for its response, or for
+            # the key to be released or its lease to lapse, then claim again
+            stored = await self._wait_for_completion(scope, fingerprint, deadline)
+            if stored is not None:
+                idempotency_requests_total.labels(outcome="replayed").inc()
+                return self._response(stored.response_status, decode_body(stored.response_body), replayed=True)
+
+        # Claimed. The run is a task of its own so local retries can share
+        # it and a disconnected client doesn't abort paid work halfway.
+        task = asyncio.ensure_future(self._execute(scope, fingerprint, handler, status_code))
+        self._inflight[scope] = (fingerprint, task)
+        task.add_done_callback(lambda _: self._inflight.pop(scope, None))
+        idempotency_requests_total.labels(outcome="executed").inc()
+        stored_status, body = await asyncio.shield(task)
+        return self._response(stored_status, body)
+
+    async def _wait_for_completion(
+        self,
+        scope: Tuple[str, str],
+        fingerprint: str,
+        deadline: float
+    ) -> Optional[StoredKey]:
+        while True:
+            if time.monotonic() >= deadline:
+                idempotency_requests_total.labels(outcome="in_progress").inc()
+                raise IdempotencyKeyInProgressException(scope[1])
+            await asyncio.sleep(self.poll_interval)
+            stored = await self.backend.get(*scope)
+            if stored is None:
+                return None
+            if stored.fingerprint != fingerprint:
+                # Released and claimed again by a different request
+                raise IdempotencyKeyReusedException(scope[1])
+            if stored.status == "completed":
+                return stored
+
+    async def _execute(
+        self,
+        scope: Tuple[str, str],
+        fingerprint: str,
+        handler: Handler,
+        status_code: int
+    ) -> Tuple[int, Any]:
+        renewing = asyncio.ensure_future(self._renew(scope, fingerprint))
+        try:
+            result = await handler()
+        except BaseException:
+            renewing.cancel()
+            try:
+                await self.backend.release(*scope, fingerprint)
+            except Exception as e:
+                # The lease lapses on its own; retries wait for it meanwhile
+                logger.warning(f"Failed to release idempotency key {scope[1]}: {str(e)}")
+            raise
+        renewing.cancel()
+
+        body = jsonable_encoder(result)
+        try:
+            await self.backend.complete(*scope, fingerprint, status_code, encode_body(body), self.ttl)
+        except Exception as e:
+            # The work is done; a lost record only means a retry redoes it
+            logger.error(f"Failed to store response for idempotency key {scope[1]}: {str(e)}")
+        return status_code, body
+
+    async def _renew(self, scope: Tuple[str, str], fingerprint: str):
+        """
+        Extend the lease while the handler runs so long runs (queued agent
+        executions) aren't taken over by a retry
+        """
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.backend.renew(*scope, fingerprint, self.lease)
+            except Exception as e:
+                logger.warning(f"Failed to renew idempotency key {scope[1]}: {str(e)}")
+
+    def _response(self, status_code: int, body: Any, replayed: bool = False) -> JSONResponse:
+        headers = {REPLAYED_HEADER: "true"} if replayed else None
+        return JSONResponse(content=body, status_code=status_code, headers=headers)
+
+# Create a global instance
+IDEMPOTENCY_STORE = IdempotencyStore.from_settings()
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import datetime
+import uuid
+from app.db.base import Base
+
+class CompanyProfile(Base):
+    __tablename__ = "company_profiles"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "domain", name="uq_company_profiles_tenant_domain"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    domain = Column(String, nullable=False, index=True)  # Normalized company domain
+    research = Column(JSONB)  # Shared research results (company_info, etc.)
+    research_fetched_at = Column(DateTime)
+    enrichment = Column(JSONB)  # Shared enrichment data
+    enrichment_fetched_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CompanyProfile(id={self.id}, domain={self.domain}, tenant_id={self.tenant_id})>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+from app.db.base import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "key", name="uq_idempotency_keys_tenant_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=False)
+    key = Column(String(255), nullable=False)  # Client-supplied Idempotency-Key header
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the request it was first used with
+    status = Column(String, nullable=False, default="in_progress")  # in_progress, completed
+    response_status = Column(Integer)
+    response_body = Column(LargeBinary)  # zlib-compressed JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)  # Lease while in progress, TTL once completed
+
+    def __repr__(self):
+        return f"<IdempotencyKey(id={self.id}, key={self.key}, status={self.status})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import datetime
+import uuid
+from app.db.base import Base
+
+class KnowledgeIngestion(Base):
+    __tablename__ = "knowledge_ingestions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    files = Column(JSONB)  # Uploaded file names
+    documents_total = Column(Integer, default=0)
+    documents_processed = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    chunks_inserted = Column(Integer, default=0)
+    chunks_duplicate = Column(Integer, default=0)  # Already in the knowledge base or earlier in the upload
+    chunks_failed = Column(Integer, default=0)
+    errors = Column(JSONB)  # First KNOWLEDGE_INGEST_MAX_ERRORS problems
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def __repr__(self):
+        return f"<KnowledgeIngestion(id={self.id}, tenant_id={self.tenant_id}, status={self.status})>"
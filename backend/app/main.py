@@ -7,6 +7,9 @@ from app.observability.logging import setup_logging
 from app.observability.tracing import instrument_app
 from app.observability.alerting import ALERT_MANAGER
 from app.core.config import settings
+from app.core.http_client import OUTBOUND_HTTP
+from app.agents.sales_agent.verification import VERIFICATION_ENGINE
+from app.services.campaigns import CAMPAIGN_ENGINE
 from app.db.session import engine
 from app.db.base import Base
 import asyncio
@@ -67,12 +70,25 @@ def create_app() -> FastAPI:
         
         # Start alert monitoring in background
         asyncio.create_task(ALERT_MANAGER.start_monitoring())
+
+        # Run due campaign steps in background
+        if settings.CAMPAIGN_ENGINE_ENABLED:
+            asyncio.create_task(CAMPAIGN_ENGINE.start())
     
     # Shutdown event
     @app.on_event("shutdown")
     async def shutdown_event():
         # Stop alert monitoring
         ALERT_MANAGER.stop_monitoring()
+
+        # Stop claiming campaign steps
+        CAMPAIGN_ENGINE.stop()
+
+        # Close pooled outbound API connections
+        await OUTBOUND_HTTP.aclose()
+
+        # Stop verification worker processes
+        VERIFICATION_ENGINE.shutdown()
     
     return app
 
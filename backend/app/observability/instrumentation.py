@@ -0,0 +1,110 @@
+"""
+Instrumentation hook for agent executions and their steps.
+
+Every SalesAgent node runs inside instrument_step, which records its
+duration, token usage, cost, cache outcome and errors as Prometheus
+metrics and as a child span of the execution span. Only the OpenTelemetry
+API is used here; spans are no-ops unless tracing.py has installed a
+tracer provider, so the hook is cheap enough to leave on.
+"""
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+from app.observability.metrics import (
+    agent_execution_duration,
+    agent_step_cache_total,
+    agent_step_duration,
+    agent_step_errors_total,
+    increment_agent_execution,
+    record_cost,
+    record_token_usage
+)
+
+tracer = trace.get_tracer("app.agents.sales_agent")
+
+@dataclass
+class StepRecord:
+    """
+    What a step reports back to the hook; entry becomes its
+    step_history record
+    """
+    name: str
+    entry: Dict[str, Any] = field(default_factory=dict)
+    tokens: Dict[str, int] = field(default_factory=dict)  # model -> tokens
+    cost_cents: float = 0.0
+
+    def update(self, **fields: Any):
+        self.entry.update(fields)
+
+    def add_usage(self, model: str, tokens: int, cost_cents: float):
+        self.tokens[model] = self.tokens.get(model, 0) + tokens
+        self.cost_cents += cost_cents
+
+@asynccontextmanager
+async def instrument_execution(agent_type: str, tenant_id: str, lead_id: str, execution_id: str):
+    """
+    Span and metrics for a whole agent execution. The yielded dict takes
+    a "success" flag; a raised exception counts as a failure.
+    """
+    outcome = {"success": False}
+    started = time.perf_counter()
+    with tracer.start_as_current_span(f"agent_execution_{agent_type}") as span:
+        span.set_attribute("agent.type", agent_type)
+        span.set_attribute("tenant.id", tenant_id)
+        span.set_attribute("lead.id", lead_id)
+        span.set_attribute("execution.id", execution_id)
+        try:
+            yield outcome
+        except Exception as e:
+            outcome["success"] = False
+            span.set_attribute("execution.error", str(e))
+            raise
+        finally:
+            agent_execution_duration.labels(agent_type=agent_type, tenant_id=tenant_id).observe(
+                time.perf_counter() - started
+            )
+            increment_agent_execution(agent_type, tenant_id, outcome["success"])
+            span.set_attribute("execution.success", outcome["success"])
+
+@asynccontextmanager
+async def instrument_step(name: str, agent_type: str, tenant_id: str):
+    """
+    Span and metrics for one agent step. The step fills in the yielded
+    StepRecord; duration_ms and (on failure) status/error are added here.
+    """
+    step = StepRecord(name=name, entry={"step": name, "status": "completed"})
+    started = time.perf_counter()
+    with tracer.start_as_current_span(f"agent_step_{name}", record_exception=False, set_status_on_exception=False) as span:
+        try:
+            yield step
+        except Exception as e:
+            step.update(status="failed", error=str(e))
+            agent_step_errors_total.labels(step_name=name, error_type=type(e).__name__).inc()
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            step.entry["duration_ms"] = round(duration * 1000, 3)
+            agent_step_duration.labels(step_name=name, agent_type=agent_type, tenant_id=tenant_id).observe(duration)
+
+            cache_status = step.entry.get("cache")
+            if cache_status:
+                agent_step_cache_total.labels(step_name=name, status=cache_status).inc()
+            for model, tokens in step.tokens.items():
+                record_token_usage(model, name, tenant_id, tokens)
+            if step.cost_cents:
+                record_cost(tenant_id, name, step.cost_cents)
+
+            if span.is_recording():
+                span.set_attribute("step.name", name)
+                span.set_attribute("step.status", step.entry["status"])
+                span.set_attribute("step.duration_ms", step.entry["duration_ms"])
+                if cache_status:
+                    span.set_attribute("step.cache", cache_status)
+                if step.tokens:
+                    span.set_attribute("step.tokens", sum(step.tokens.values()))
+                    span.set_attribute("step.cost_cents", step.cost_cents)
@@ -27,6 +27,88 @@ cost_cents_total = Counter(
     ['tenant_id', 'operation_type']
 )
 
+outbound_requests_total = Counter(
+    'outbound_requests_total',
+    'Total number of outbound third-party API requests',
+    ['provider', 'status_code', 'tenant_id']
+)
+
+outbound_throttled_total = Counter(
+    'outbound_throttled_total',
+    'Total number of 429 responses from third-party APIs',
+    ['provider']
+)
+
+agent_step_cache_total = Counter(
+    'agent_step_cache_total',
+    'Company cache outcomes of agent steps',
+    ['step_name', 'status']
+)
+
+agent_step_errors_total = Counter(
+    'agent_step_errors_total',
+    'Total number of failed agent steps',
+    ['step_name', 'error_type']
+)
+
+speculative_drafts_total = Counter(
+    'speculative_drafts_total',
+    'Speculative email drafts by outcome',
+    ['outcome']
+)
+
+speculative_wasted_tokens_total = Counter(
+    'speculative_wasted_tokens_total',
+    'Tokens spent on speculative drafts that were thrown away'
+)
+
+budget_rejections_total = Counter(
+    'budget_rejections_total',
+    'Total number of LLM steps rejected by tenant budgets',
+    ['tenant_id', 'limit']
+)
+
+draft_batch_fallbacks_total = Counter(
+    'draft_batch_fallbacks_total',
+    'Total number of batched drafts retried as single calls'
+)
+
+near_duplicate_checks_total = Counter(
+    'near_duplicate_checks_total',
+    'Near-duplicate outreach checks by result',
+    ['result']
+)
+
+idempotency_requests_total = Counter(
+    'idempotency_requests_total',
+    'Requests carrying an Idempotency-Key by outcome',
+    ['outcome']
+)
+
+knowledge_index_loads_total = Counter(
+    'knowledge_index_loads_total',
+    'Tenant knowledge index loads',
+    ['source']  # snapshot, database
+)
+
+knowledge_ingest_chunks_total = Counter(
+    'knowledge_ingest_chunks_total',
+    'Knowledge base chunks processed by ingestion',
+    ['outcome']  # inserted, duplicate, failed
+)
+
+knowledge_cache_requests_total = Counter(
+    'knowledge_cache_requests_total',
+    'Knowledge search result cache lookups',
+    ['outcome']  # hit, miss
+)
+
+campaign_steps_total = Counter(
+    'campaign_steps_total',
+    'Campaign steps run by the execution engine',
+    ['step_type', 'outcome']  # sent, logged, recorded, scheduled, deferred, retry, failed, completed
+)
+
 # Histogram metrics (for timing)
 api_request_duration = Histogram(
     'api_request_duration_seconds',
@@ -46,6 +128,69 @@ agent_step_duration = Summary(
     ['step_name', 'agent_type', 'tenant_id']
 )
 
+outbound_request_duration = Histogram(
+    'outbound_request_duration_seconds',
+    'Duration of outbound third-party API requests',
+    ['provider']
+)
+
+outbound_rate_limit_wait = Histogram(
+    'outbound_rate_limit_wait_seconds',
+    'Time spent waiting on outbound rate limiters',
+    ['provider', 'scope']
+)
+
+agent_queue_wait = Histogram(
+    'agent_queue_wait_seconds',
+    'Time agent runs wait for a scheduler slot',
+    ['tenant_id', 'priority'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600)
+)
+
+draft_batch_size = Histogram(
+    'draft_batch_size',
+    'Number of leads per batched draft call',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+near_duplicate_check_duration = Histogram(
+    'near_duplicate_check_duration_seconds',
+    'Time to hash and look up a draft in the near-duplicate index',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+
+knowledge_search_duration = Histogram(
+    'knowledge_search_duration_seconds',
+    'Time to search a tenant knowledge index',
+    ['index'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+campaign_batch_duration = Histogram(
+    'campaign_batch_duration_seconds',
+    'Time per phase of a campaign engine batch',
+    ['phase'],  # load, claim, execute, advance
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+campaign_step_lag = Histogram(
+    'campaign_step_lag_seconds',
+    'Delay between an assignment coming due and being claimed',
+    buckets=(1, 5, 15, 60, 300, 900, 3600, 14400, 86400)
+)
+
+# Gauge metrics
+agent_queue_depth = Gauge(
+    'agent_queue_depth',
+    'Agent runs waiting for a scheduler slot',
+    ['tenant_id', 'priority']
+)
+
+campaign_timers = Gauge(
+    'campaign_timers',
+    'Campaign assignments waiting in the engine timer wheel'
+)
+
 def increment_agent_execution(agent_type: str, tenant_id: str, success: bool):
     """Increment the agent execution counter"""
     agent_executions_total.labels(
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class KnowledgeDocument(BaseModel):
+    title: Optional[str] = None
+    content: str = Field(..., min_length=1)
+    category: Optional[str] = None
+    tags: List[str] = []
+    source: Optional[str] = None
+
+class KnowledgeDocumentBatch(BaseModel):
+    documents: List[KnowledgeDocument] = Field(..., min_length=1, max_length=1000)
+
+class KnowledgeIngestionResponse(BaseModel):
+    id: str
+    status: str
+    files: List[str] = []
+    documents_total: int = 0
+    documents_processed: int = 0
+    chunks_total: int = 0
+    chunks_inserted: int = 0
+    chunks_duplicate: int = 0
+    chunks_failed: int = 0
+    errors: List[str] = []
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class KnowledgeEntryUpdate(BaseModel):
+    title: Optional[str] = Field(None, min_length=1)
+    content: Optional[str] = Field(None, min_length=1)
+    category: Optional[str] = None
+    tags: Optional[List[str]] = None
+    active: Optional[bool] = None
+
+class KnowledgeEntryResponse(BaseModel):
+    id: str
+    title: str
+    content: str
+    category: Optional[str] = None
+    tags: List[str] = []
+    source: Optional[str] = None
+    active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
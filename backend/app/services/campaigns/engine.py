@@ -0,0 +1,632 @@
+"""
+Campaign execution: runs each assignment's steps as they come due.
+
+An assignment's next_action_date is when its current_step runs (steps
+in order of CampaignStep.order). Every CAMPAIGN_LOAD_INTERVAL_SECONDS
+the engine reads the assignments of active campaigns due within
+CAMPAIGN_HORIZON_SECONDS into a timer wheel, first moving each due time
+into the recipient's send window (see send_windows) and writing moved
+times back. A ticker fires the wheel every tick onto a ready queue, so
+the database is read once per due step instead of polled per batch.
+
+Workers claim fired assignments by ID with FOR UPDATE SKIP LOCKED, so
+engines in any number of processes share the work without blocking each
+other; a row someone else already claimed or advanced no longer passes
+the due check. A claim commits at once and pushes next_action_date out
+by CAMPAIGN_LEASE_SECONDS; if the worker dies before advancing, the
+assignment is loaded again once the lease has run out. Delivery is
+therefore at least once.
+
+Claimed steps run concurrently (email over SMTP; call, task and linkedin
+steps are manual and only recorded), then every assignment in the batch
+is advanced with one executemany: current_step moves on, the next
+step's delay_days, moved into the send window, sets next_action_date,
+and the run step's ID is added to completed_steps. Pending assignments
+are activated on their first claim, waiting out the first step's delay
+from then. A step claimed outside its window (the window or the lead's
+time zone changed since loading) is deferred to the window's next
+opening instead of run.
+"""
+import asyncio
+import logging
+import re
+import smtplib
+import time
+from dataclasses import dataclass
+from collections import deque
+from datetime import datetime, timedelta, timezone, tzinfo
+from email.message import EmailMessage
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import bindparam, cast, func, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.campaign import Campaign, CampaignStep, CampaignAssignment
+from app.db.models.lead import Lead
+from app.agents.sales_agent.near_duplicates import NEAR_DUPLICATE_INDEX
+from app.observability.metrics import campaign_batch_duration, campaign_step_lag, campaign_steps_total, campaign_timers
+from app.services.campaigns.send_windows import SendWindow, get_zone
+from app.services.campaigns.timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+# Lead fields available to step subjects and content as {field}
+_PLACEHOLDER = re.compile(r"\{(name|first_name|company|title|domain|email)\}")
+
+assignments = CampaignAssignment.__table__
+
+@dataclass
+class ClaimedAssignment:
+    id: Any
+    campaign_id: Any
+    lead_id: Any
+    status: str
+    current_step: int
+    due_at: Optional[datetime]
+
+@dataclass
+class _Step:
+    id: Any
+    type: str
+    subject: Optional[str]
+    content: str
+    delay_days: int
+
+@dataclass
+class _Recipient:
+    email: Optional[str]
+    name: Optional[str]
+    company: Optional[str]
+    title: Optional[str]
+    domain: Optional[str]
+    timezone: Optional[str] = None
+
+@dataclass
+class _Batch:
+    assignments: List[ClaimedAssignment]
+    steps: Dict[Any, List[_Step]]
+    tenants: Dict[Any, Any]
+    leads: Dict[Any, _Recipient]
+    windows: Dict[Any, SendWindow]
+
+def render_template(text: Optional[str], recipient: _Recipient) -> str:
+    """
+    Fill {name}, {first_name}, {company}, {title}, {domain} and {email};
+    other braces are left alone
+    """
+    if not text:
+        return ""
+    values = {
+        "name": recipient.name or "",
+        "first_name": (recipient.name or "").split(" ")[0],
+        "company": recipient.company or "",
+        "title": recipient.title or "",
+        "domain": recipient.domain or "",
+        "email": recipient.email or ""
+    }
+    return _PLACEHOLDER.sub(lambda match: values[match.group(1)], text)
+
+class EmailSender:
+    """
+    Sends batches of campaign emails over up to CAMPAIGN_SMTP_CONNECTIONS
+    SMTP connections. Without SMTP_HOST it only logs them.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        from_address: Optional[str] = None,
+        connections: Optional[int] = None
+    ):
+        self.host = settings.SMTP_HOST if host is None else host
+        self.port = port or settings.SMTP_PORT
+        self.user = settings.SMTP_USER if user is None else user
+        self.password = settings.SMTP_PASSWORD if password is None else password
+        self.from_address = from_address or settings.CAMPAIGN_EMAIL_FROM or self.user
+        self.connections = max(1, connections or settings.CAMPAIGN_SMTP_CONNECTIONS)
+
+    def message(self, to: str, subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.from_address
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    async def send(self, messages: Sequence[EmailMessage]) -> List[str]:
+        """
+        Outcome per message: sent, logged (no SMTP_HOST), retry or failed
+        """
+        if not messages:
+            return []
+        if not self.host:
+            for message in messages:
+                logger.debug(f"SMTP_HOST not set; not sending campaign email to {message['To']}")
+            return ["logged"] * len(messages)
+
+        loop = asyncio.get_running_loop()
+        size = -(-len(messages) // self.connections)
+        chunks = [messages[start:start + size] for start in range(0, len(messages), size)]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(None, self._send_chunk, chunk) for chunk in chunks
+        ])
+        return [outcome for chunk in results for outcome in chunk]
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.port == 465:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=30)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        return smtp
+
+    def _send_chunk(self, messages: Sequence[EmailMessage]) -> List[str]:
+        try:
+            smtp = self._connect()
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning(f"SMTP connection to {self.host} failed: {str(e)}")
+            return ["retry"] * len(messages)
+
+        outcomes = []
+        try:
+            for message in messages:
+                try:
+                    smtp.send_message(message)
+                    outcomes.append("sent")
+                except smtplib.SMTPRecipientsRefused as e:
+                    logger.warning(f"Campaign email to {message['To']} refused: {str(e)}")
+                    outcomes.append("failed")
+                except smtplib.SMTPServerDisconnected as e:
+                    # The rest of the chunk is retried on a later claim
+                    logger.warning(f"SMTP server {self.host} disconnected: {str(e)}")
+                    outcomes.extend(["retry"] * (len(messages) - len(outcomes)))
+                    return outcomes
+                except smtplib.SMTPException as e:
+                    logger.warning(f"Campaign email to {message['To']} failed: {str(e)}")
+                    outcomes.append("retry")
+        finally:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        return outcomes
+
+class CampaignEngine:
+    """
+    Loads, claims, runs and advances due campaign assignments
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        sender: Optional[EmailSender] = None,
+        near_duplicates=None,
+        batch_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.sender = sender or EmailSender()
+        self.near_duplicates = near_duplicates or NEAR_DUPLICATE_INDEX
+        self.batch_size = batch_size or settings.CAMPAIGN_BATCH_SIZE
+        self.is_running = False
+        self._tasks: List[asyncio.Task] = []
+        self.wheel = TimerWheel(settings.CAMPAIGN_TIMER_RESOLUTION_SECONDS)
+        # Due times before this are in the wheel (or already fired)
+        self._loaded_until: Optional[datetime] = None
+        # Fired assignment IDs waiting for a worker, and those being run
+        self._ready: Deque[Any] = deque()
+        self._queued: Set[Any] = set()
+        self._running: Set[Any] = set()
+        self._ready_event = asyncio.Event()
+
+    async def start(self, workers: Optional[int] = None):
+        """
+        Run the loader, the ticker and claim loops until stop()
+        """
+        if not self.sender.host:
+            # Without SMTP every email step would only be logged
+            logger.warning("SMTP_HOST not set; not starting campaign engine")
+            return
+        workers = max(1, workers or settings.CAMPAIGN_WORKERS)
+        logger.info(f"Starting campaign engine with {workers} workers")
+        self.is_running = True
+        self.wheel = TimerWheel(settings.CAMPAIGN_TIMER_RESOLUTION_SECONDS)
+        self._loaded_until = None
+        self._tasks = [asyncio.create_task(self._load_loop()), asyncio.create_task(self._tick_loop())]
+        self._tasks.extend(asyncio.create_task(self._work()) for _ in range(workers))
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        logger.info("Stopping campaign engine")
+        self.is_running = False
+        for task in self._tasks:
+            task.cancel()
+        self._ready.clear()
+        self._queued.clear()
+
+    async def _load_loop(self):
+        while self.is_running:
+            try:
+                await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Campaign engine load failed: {str(e)}")
+            await asyncio.sleep(settings.CAMPAIGN_LOAD_INTERVAL_SECONDS)
+
+    async def _tick_loop(self):
+        while self.is_running:
+            fired = self.wheel.advance(time.time())
+            if fired:
+                self._enqueue(fired)
+            await asyncio.sleep(self.wheel.resolution)
+
+    async def _work(self):
+        while self.is_running:
+            if not self._ready:
+                self._ready_event.clear()
+                await self._ready_event.wait()
+                continue
+            assignment_ids = []
+            while self._ready and len(assignment_ids) < self.batch_size:
+                assignment_id = self._ready.popleft()
+                self._queued.discard(assignment_id)
+                assignment_ids.append(assignment_id)
+            try:
+                await self.run_batch(assignment_ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Claimed ones come due again when their lease runs out
+                logger.error(f"Campaign engine batch failed: {str(e)}")
+
+    def _enqueue(self, assignment_ids: List[Any]):
+        for assignment_id in assignment_ids:
+            if assignment_id not in self._queued:
+                self._queued.add(assignment_id)
+                self._ready.append(assignment_id)
+        self._ready_event.set()
+        campaign_timers.set(len(self.wheel))
+
+    async def load(self) -> int:
+        """
+        Put assignments due before the horizon into the wheel, at the
+        recipient's next send window; returns the number scheduled
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        horizon = now + timedelta(seconds=settings.CAMPAIGN_HORIZON_SECONDS)
+        due, loaded_until = await loop.run_in_executor(None, self._load, now, horizon, self._loaded_until)
+        campaign_batch_duration.labels(phase="load").observe(time.perf_counter() - started)
+
+        scheduled = 0
+        for assignment_id, fire_at in due:
+            # The wheel's own timers are newer than this read
+            if assignment_id in self.wheel or assignment_id in self._queued or assignment_id in self._running:
+                continue
+            self.wheel.schedule(assignment_id, _timestamp(fire_at))
+            scheduled += 1
+        self._loaded_until = loaded_until
+        campaign_timers.set(len(self.wheel))
+        return scheduled
+
+    def _load(
+        self,
+        now: datetime,
+        horizon: datetime,
+        loaded_until: Optional[datetime]
+    ) -> Tuple[List[Tuple[Any, datetime]], datetime]:
+        query = select(
+            assignments.c.id,
+            assignments.c.campaign_id,
+            assignments.c.next_action_date,
+            Campaign.config["send_window"].label("send_window"),
+            Lead.enriched_data["timezone"].astext.label("timezone")
+        ).join(
+            Campaign, Campaign.id == assignments.c.campaign_id
+        ).join(
+            Lead, Lead.id == assignments.c.lead_id
+        ).where(
+            assignments.c.status.in_(("active", "pending")),
+            assignments.c.next_action_date < horizon,
+            Campaign.status == "active"
+        )
+        if loaded_until is not None:
+            # The span already loaded is read again only for what has since
+            # become overdue: enrollments, expired leases, other processes
+            query = query.where(or_(
+                assignments.c.next_action_date >= loaded_until,
+                assignments.c.next_action_date <= now
+            ))
+        limit = settings.CAMPAIGN_LOAD_MAX_ROWS
+
+        db = self.session_factory()
+        try:
+            rows = db.execute(query.order_by(assignments.c.next_action_date).limit(limit)).all()
+            windows: Dict[Any, SendWindow] = {}
+            due = []
+            moved = []
+            for row in rows:
+                window = windows.get(row.campaign_id)
+                if window is None:
+                    window = windows[row.campaign_id] = SendWindow.from_config(row.send_window)
+                fire_at = window.next_open(row.next_action_date, get_zone(row.timezone))
+                if fire_at != row.next_action_date:
+                    moved.append({"assignment_id": row.id, "due_at": row.next_action_date, "opens": fire_at})
+                if fire_at < horizon:
+                    due.append((row.id, fire_at))
+            if moved:
+                # Guarded so a claim or advance since the read wins
+                db.execute(
+                    update(assignments).where(
+                        assignments.c.id == bindparam("assignment_id"),
+                        assignments.c.next_action_date == bindparam("due_at")
+                    ).values(next_action_date=bindparam("opens")),
+                    moved
+                )
+                db.commit()
+        finally:
+            db.close()
+
+        if len(rows) < limit:
+            return due, horizon
+        # Truncated; the rest is read next time
+        last = rows[-1].next_action_date
+        return due, last if loaded_until is None else max(loaded_until, last)
+
+    async def run_batch(self, assignment_ids: Sequence[Any]) -> int:
+        """
+        Claim, run and advance the given fired assignments; returns the
+        number claimed
+        """
+        loop = asyncio.get_running_loop()
+        self._running.update(assignment_ids)
+        try:
+            started = time.perf_counter()
+            batch = await loop.run_in_executor(None, self._claim, assignment_ids)
+            campaign_batch_duration.labels(phase="claim").observe(time.perf_counter() - started)
+            if not batch.assignments:
+                return 0
+
+            started = time.perf_counter()
+            updates = await self._execute(batch)
+            campaign_batch_duration.labels(phase="execute").observe(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await loop.run_in_executor(None, self._advance, updates)
+            campaign_batch_duration.labels(phase="advance").observe(time.perf_counter() - started)
+        finally:
+            self._running.difference_update(assignment_ids)
+
+        # Next steps inside the loaded span would otherwise wait for an
+        # overdue reload
+        for values in updates:
+            next_at = values["next_at"]
+            if next_at is not None and self._loaded_until is not None and next_at < self._loaded_until:
+                self.wheel.schedule(values["assignment_id"], _timestamp(next_at))
+            else:
+                self.wheel.cancel(values["assignment_id"])
+        campaign_timers.set(len(self.wheel))
+        return len(batch.assignments)
+
+    def _claim(self, assignment_ids: Sequence[Any]) -> _Batch:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=settings.CAMPAIGN_LEASE_SECONDS)
+        # Timers fire on tick boundaries, up to a tick early
+        due_by = now + timedelta(seconds=self.wheel.resolution)
+        db = self.session_factory()
+        try:
+            # Rows another process claimed or advanced since loading no
+            # longer match, and rows it holds are skipped
+            due = select(
+                assignments.c.id, assignments.c.next_action_date.label("due_at")
+            ).join(
+                Campaign, Campaign.id == assignments.c.campaign_id
+            ).where(
+                assignments.c.id.in_(assignment_ids),
+                assignments.c.status.in_(("active", "pending")),
+                assignments.c.next_action_date <= due_by,
+                Campaign.status == "active"
+            ).with_for_update(
+                of=assignments, skip_locked=True
+            ).cte("due")
+            rows = db.execute(
+                update(assignments)
+                .where(assignments.c.id == due.c.id)
+                .values(next_action_date=lease_until, updated_at=now)
+                .returning(
+                    assignments.c.id,
+                    assignments.c.campaign_id,
+                    assignments.c.lead_id,
+                    assignments.c.status,
+                    assignments.c.current_step,
+                    due.c.due_at
+                )
+            ).all()
+            db.commit()
+            claimed = [
+                ClaimedAssignment(row.id, row.campaign_id, row.lead_id, row.status, row.current_step or 0, row.due_at)
+                for row in rows
+            ]
+            if not claimed:
+                return _Batch([], {}, {}, {}, {})
+
+            campaign_ids = {assignment.campaign_id for assignment in claimed}
+            steps: Dict[Any, List[_Step]] = {campaign_id: [] for campaign_id in campaign_ids}
+            for row in db.execute(
+                select(
+                    CampaignStep.campaign_id, CampaignStep.id, CampaignStep.type, CampaignStep.subject,
+                    CampaignStep.content, CampaignStep.delay_days
+                ).where(
+                    CampaignStep.campaign_id.in_(campaign_ids)
+                ).order_by(CampaignStep.campaign_id, CampaignStep.order)
+            ):
+                steps[row.campaign_id].append(_Step(row.id, row.type, row.subject, row.content, row.delay_days or 0))
+            tenants = {}
+            windows = {}
+            for row in db.execute(
+                select(
+                    Campaign.id, Campaign.tenant_id, Campaign.config["send_window"].label("send_window")
+                ).where(Campaign.id.in_(campaign_ids))
+            ):
+                tenants[row.id] = row.tenant_id
+                windows[row.id] = SendWindow.from_config(row.send_window)
+            leads = {
+                row.id: _Recipient(row.email, row.name, row.company, row.title, row.domain, row.timezone)
+                for row in db.execute(
+                    select(
+                        Lead.id, Lead.email, Lead.name, Lead.company, Lead.title, Lead.domain,
+                        Lead.enriched_data["timezone"].astext.label("timezone")
+                    ).where(Lead.id.in_({assignment.lead_id for assignment in claimed}))
+                )
+            }
+        finally:
+            db.close()
+
+        for assignment in claimed:
+            if assignment.due_at is not None:
+                campaign_step_lag.observe(max(0.0, (now - assignment.due_at).total_seconds()))
+        return _Batch(claimed, steps, tenants, leads, windows)
+
+    async def _execute(self, batch: _Batch) -> List[Dict[str, Any]]:
+        """
+        Run each claimed assignment's current step; returns the updates
+        that advance them
+        """
+        now = datetime.utcnow()
+        slack = timedelta(seconds=self.wheel.resolution)
+        updates = []
+        outbox = []
+        for assignment in batch.assignments:
+            steps = batch.steps.get(assignment.campaign_id, [])
+            if assignment.current_step >= len(steps):
+                updates.append(self._update(assignment, now, "completed", assignment.current_step, None))
+                campaign_steps_total.labels(step_type="none", outcome="completed").inc()
+                continue
+
+            step = steps[assignment.current_step]
+            recipient = batch.leads.get(assignment.lead_id)
+            window = batch.windows.get(assignment.campaign_id) or SendWindow.default()
+            zone = get_zone(recipient.timezone if recipient else None)
+            if assignment.status == "pending" and step.delay_days:
+                next_at = window.next_open(now + timedelta(days=step.delay_days), zone)
+                updates.append(self._update(assignment, now, "active", assignment.current_step, next_at))
+                campaign_steps_total.labels(step_type=step.type, outcome="scheduled").inc()
+                continue
+
+            # Loading already moved due times into the window; this catches
+            # windows and time zones changed since
+            opens = window.next_open(now, zone)
+            if opens - now > slack:
+                updates.append(self._update(assignment, now, assignment.status, assignment.current_step, opens))
+                campaign_steps_total.labels(step_type=step.type, outcome="deferred").inc()
+                continue
+
+            if step.type != "email":
+                updates.append(self._advanced(assignment, steps, now, window, zone))
+                campaign_steps_total.labels(step_type=step.type, outcome="recorded").inc()
+                continue
+
+            if recipient is None or not recipient.email:
+                updates.append(self._update(assignment, now, "failed", assignment.current_step, None))
+                campaign_steps_total.labels(step_type=step.type, outcome="failed").inc()
+                continue
+            body = render_template(step.content, recipient)
+            message = self.sender.message(recipient.email, render_template(step.subject, recipient), body)
+            outbox.append((assignment, steps, recipient, body, window, zone, message))
+
+        outcomes = await self.sender.send([message for *_, message in outbox])
+        for (assignment, steps, recipient, body, window, zone, _), outcome in zip(outbox, outcomes):
+            step = steps[assignment.current_step]
+            campaign_steps_total.labels(step_type=step.type, outcome=outcome).inc()
+            if outcome in ("retry", "logged"):
+                # Logged means nothing went out; the step stays where it is
+                next_at = window.next_open(now + timedelta(seconds=settings.CAMPAIGN_RETRY_SECONDS), zone)
+                updates.append(self._update(assignment, now, "active", assignment.current_step, next_at))
+                continue
+            if outcome == "failed":
+                updates.append(self._update(assignment, now, "failed", assignment.current_step, None))
+                continue
+            updates.append(self._advanced(assignment, steps, now, window, zone))
+            # Lets the agent flag drafts that repeat this email
+            await self.near_duplicates.add(
+                batch.tenants.get(assignment.campaign_id),
+                recipient.domain or recipient.email,
+                body,
+                source="campaign",
+                source_id=step.id,
+                persist=False
+            )
+        return updates
+
+    def _advanced(
+        self,
+        assignment: ClaimedAssignment,
+        steps: List[_Step],
+        now: datetime,
+        window: SendWindow,
+        zone: tzinfo
+    ) -> Dict[str, Any]:
+        done = [str(steps[assignment.current_step].id)]
+        following = assignment.current_step + 1
+        if following >= len(steps):
+            return self._update(assignment, now, "completed", following, None, done)
+        next_at = window.next_open(now + timedelta(days=steps[following].delay_days), zone)
+        return self._update(assignment, now, "active", following, next_at, done)
+
+    @staticmethod
+    def _update(
+        assignment: ClaimedAssignment,
+        now: datetime,
+        status: str,
+        step: int,
+        next_at: Optional[datetime],
+        done: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        return {
+            "assignment_id": assignment.id,
+            "claimed_step": assignment.current_step,
+            "new_status": status,
+            "new_step": step,
+            "next_at": next_at,
+            "done": done or [],
+            "now": now
+        }
+
+    def _advance(self, updates: List[Dict[str, Any]]):
+        if not updates:
+            return
+        statement = update(assignments).where(
+            assignments.c.id == bindparam("assignment_id"),
+            # Skips rows another worker advanced after this claim's lease ran out
+            assignments.c.current_step == bindparam("claimed_step")
+        ).values(
+            status=bindparam("new_status"),
+            current_step=bindparam("new_step"),
+            next_action_date=bindparam("next_at"),
+            completed_steps=func.coalesce(assignments.c.completed_steps, cast([], JSONB)).op("||")(
+                bindparam("done", type_=JSONB)
+            ),
+            updated_at=bindparam("now")
+        )
+        db = self.session_factory()
+        try:
+            db.execute(statement, updates)
+            db.commit()
+        finally:
+            db.close()
+
+def _timestamp(moment: datetime) -> float:
+    # Naive UTC to the wheel's clock
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+# Create a global instance
+CAMPAIGN_ENGINE = CampaignEngine()
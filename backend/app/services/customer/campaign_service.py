@@ -1,11 +1,20 @@
 from typing import List, Optional, Dict, Any
-from sqlalchemy import and_, func
+from sqlalchemy import and_, or_, func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timedelta
+import uuid
+from app.core.config import settings
 from app.db.models.campaign import Campaign, CampaignStep, CampaignAssignment
 from app.db.models.lead import Lead
 from app.db.models.user import User
-from app.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse, CampaignStatus, CampaignStepType, CampaignStep
+from app.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse, CampaignStatus, CampaignStepType, CampaignStep, CampaignLeadFilter
+
+def escape_like(value: str) -> str:
+    """
+    Escape LIKE wildcards so user input matches literally (with escape="\\")
+    """
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 class CampaignService:
     def __init__(self, db: Session, user: User):
@@ -294,9 +303,17 @@ class CampaignService:
         self.db.commit()
         return True
 
-    async def add_leads_to_campaign(self, campaign_id: str, lead_ids: List[str]) -> Dict[str, Any]:
+    async def add_leads_to_campaign(
+        self,
+        campaign_id: str,
+        lead_ids: Optional[List[str]] = None,
+        lead_filter: Optional[CampaignLeadFilter] = None
+    ) -> Dict[str, Any]:
         """
-        Add leads to a campaign
+        Add leads to a campaign, either by ID or every tenant lead matching
+        lead_filter. Leads already in the campaign are skipped. Leads are
+        enrolled CAMPAIGN_ENROLL_CHUNK_SIZE at a time, each chunk one
+        INSERT ... SELECT committed on its own.
         """
         campaign = self.db.query(Campaign).filter(
             and_(
@@ -308,38 +325,102 @@ class CampaignService:
         if not campaign:
             raise ValueError("Campaign not found or not accessible")
 
-        # Verify leads belong to the same tenant
-        leads = self.db.query(Lead).filter(
-            and_(
-                Lead.id.in_(lead_ids),
-                Lead.tenant_id == self.tenant_id
-            )
-        ).all()
-
+        chunk_size = settings.CAMPAIGN_ENROLL_CHUNK_SIZE
         added_count = 0
-        for lead in leads:
-            # Check if lead is already in campaign
-            existing = self.db.query(CampaignAssignment).filter(
-                and_(
-                    CampaignAssignment.campaign_id == campaign_id,
-                    CampaignAssignment.lead_id == lead.id
-                )
-            ).first()
-            
-            if not existing:
-                assignment = CampaignAssignment(
-                    campaign_id=campaign_id,
-                    lead_id=lead.id,
-                    status='pending',  # Will be activated when campaign is active
-                    next_action_date=datetime.utcnow()
-                )
-                self.db.add(assignment)
-                added_count += 1
+        if lead_filter is None:
+            requested = []
+            for lead_id in dict.fromkeys(lead_ids or []):
+                try:
+                    requested.append(uuid.UUID(str(lead_id)))
+                except ValueError:
+                    continue  # Can't match a lead
+            for start in range(0, len(requested), chunk_size):
+                added_count += self._enroll(campaign.id, requested[start:start + chunk_size])
+            total_requested = len(lead_ids or [])
+        else:
+            # Keyset pagination over the matching leads
+            query = self._filtered_lead_ids(lead_filter)
+            total_requested = 0
+            last_id = None
+            while True:
+                page = query if last_id is None else query.where(Lead.id > last_id)
+                chunk = self.db.execute(page.order_by(Lead.id).limit(chunk_size)).scalars().all()
+                if not chunk:
+                    break
+                total_requested += len(chunk)
+                added_count += self._enroll(campaign.id, chunk)
+                last_id = chunk[-1]
 
-        self.db.commit()
-        
         return {
             "added_leads": added_count,
-            "total_requested": len(lead_ids),
+            "total_requested": total_requested,
             "campaign_id": campaign_id
-        }
\ No newline at end of file
+        }
+
+    def _filtered_lead_ids(self, lead_filter: CampaignLeadFilter):
+        """
+        IDs of the tenant's leads matching lead_filter; archived leads only
+        when asked for by status
+        """
+        query = select(Lead.id).where(Lead.tenant_id == self.tenant_id)
+        if lead_filter.status:
+            query = query.where(Lead.status == lead_filter.status)
+        else:
+            query = query.where(or_(Lead.status.is_(None), Lead.status != "archived"))
+        if lead_filter.source:
+            query = query.where(Lead.source == lead_filter.source)
+        if lead_filter.company:
+            query = query.where(Lead.company.ilike(escape_like(lead_filter.company), escape="\\"))
+        if lead_filter.domain:
+            query = query.where(Lead.domain.ilike(escape_like(lead_filter.domain), escape="\\"))
+        if lead_filter.search:
+            pattern = f"%{escape_like(lead_filter.search)}%"
+            query = query.where(or_(
+                Lead.name.ilike(pattern, escape="\\"),
+                Lead.email.ilike(pattern, escape="\\"),
+                Lead.company.ilike(pattern, escape="\\")
+            ))
+        if lead_filter.has_email is True:
+            query = query.where(Lead.email.isnot(None), Lead.email != "")
+        elif lead_filter.has_email is False:
+            query = query.where(or_(Lead.email.is_(None), Lead.email == ""))
+        if lead_filter.created_after:
+            query = query.where(Lead.created_at >= lead_filter.created_after)
+        if lead_filter.created_before:
+            query = query.where(Lead.created_at < lead_filter.created_before)
+        return query
+
+    def _enroll(self, campaign_id, lead_ids: List[Any]) -> int:
+        """
+        Insert pending assignments for the tenant's leads among lead_ids,
+        skipping ones already in the campaign; returns the number added
+        """
+        if not lead_ids:
+            return 0
+        now = datetime.utcnow()
+        leads = select(
+            func.gen_random_uuid(),
+            literal(campaign_id, type_=CampaignAssignment.campaign_id.type),
+            Lead.id,
+            literal("pending"),  # Activated by the campaign engine once the campaign is active
+            literal(now),
+            literal(0),
+            literal([], type_=JSONB),
+            literal(now),
+            literal(now)
+        ).where(
+            Lead.tenant_id == self.tenant_id,
+            Lead.id.in_(lead_ids)
+        )
+        statement = insert(CampaignAssignment).from_select(
+            [
+                "id", "campaign_id", "lead_id", "status", "next_action_date",
+                "current_step", "completed_steps", "created_at", "updated_at"
+            ],
+            leads
+        ).on_conflict_do_nothing(
+            index_elements=["campaign_id", "lead_id"]
+        ).returning(CampaignAssignment.id)
+        added = len(self.db.execute(statement).all())
+        self.db.commit()
+        return added
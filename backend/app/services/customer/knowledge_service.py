@@ -0,0 +1,132 @@
+from typing import Optional
+import uuid
+import numpy as np
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.db.models.knowledge_base import KnowledgeBase
+from app.db.models.user import User
+from app.schemas.knowledge import KnowledgeEntryUpdate, KnowledgeEntryResponse
+from app.services.knowledge.embeddings import EMBEDDING_DTYPE, embedding_text, vector_to_bytes
+from app.services.knowledge.ingestion import content_hash
+from app.services.knowledge.lexical import lexical_text
+from app.services.knowledge.retriever import KNOWLEDGE_RETRIEVER
+
+class KnowledgeService:
+    def __init__(self, db: Session, user: User, retriever=None):
+        self.db = db
+        self.user = user
+        self.tenant_id = user.tenant_id
+        self.retriever = retriever or KNOWLEDGE_RETRIEVER
+
+    def _get(self, entry_id: str) -> Optional[KnowledgeBase]:
+        try:
+            entry_uuid = uuid.UUID(str(entry_id))
+        except ValueError:
+            return None
+        return self.db.query(KnowledgeBase).filter(
+            and_(
+                KnowledgeBase.id == entry_uuid,
+                KnowledgeBase.tenant_id == self.tenant_id
+            )
+        ).first()
+
+    async def get_entry(self, entry_id: str) -> Optional[KnowledgeEntryResponse]:
+        """
+        Get a knowledge base entry by ID
+        """
+        entry = self._get(entry_id)
+        if not entry:
+            return None
+        return self.entry_to_response(entry)
+
+    async def update_entry(self, entry_id: str, entry_in: KnowledgeEntryUpdate) -> Optional[KnowledgeEntryResponse]:
+        """
+        Update an entry and its place in the search index: changed text is
+        re-embedded and re-indexed, deactivated entries leave the index.
+        Raises ValueError if the new content duplicates another entry.
+        """
+        entry = self._get(entry_id)
+        if not entry:
+            return None
+
+        update_data = entry_in.model_dump(exclude_unset=True)
+        text_changed = any(
+            field in update_data and update_data[field] != getattr(entry, field)
+            for field in ("title", "content")
+        )
+        for field, value in update_data.items():
+            setattr(entry, field, value)
+
+        embedder = self.retriever.embedder
+        if text_changed:
+            entry.content_hash = content_hash(entry.content)
+            vector = (await embedder.embed([embedding_text(entry.title, entry.content)]))[0]
+            entry.embedding_vector = vector_to_bytes(vector)
+            entry.embedding_model = embedder.name
+
+        entry.updated_at = datetime.utcnow()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise ValueError("An entry with the same content already exists")
+        self.db.refresh(entry)
+
+        if entry.active:
+            vector = self._vector(entry)
+            if vector is None:
+                vector = (await embedder.embed([embedding_text(entry.title, entry.content)]))[0]
+            await self.retriever.upsert(
+                self.tenant_id,
+                [str(entry.id)],
+                vector.reshape(1, -1),
+                [entry.category],
+                [entry.tags or []],
+                [lexical_text(entry.title, entry.content)]
+            )
+        else:
+            await self.retriever.remove(self.tenant_id, [str(entry.id)])
+
+        return self.entry_to_response(entry)
+
+    async def delete_entry(self, entry_id: str) -> bool:
+        """
+        Delete an entry and drop it from the search index
+        """
+        entry = self._get(entry_id)
+        if not entry:
+            return False
+
+        self.db.delete(entry)
+        self.db.commit()
+        await self.retriever.remove(self.tenant_id, [str(entry_id)])
+        return True
+
+    def _vector(self, entry: KnowledgeBase) -> Optional[np.ndarray]:
+        """
+        The stored embedding, if the current embedder wrote it
+        """
+        embedder = self.retriever.embedder
+        if entry.embedding_vector is None or entry.embedding_model != embedder.name:
+            return None
+        if len(entry.embedding_vector) != embedder.dim * EMBEDDING_DTYPE.itemsize:
+            return None
+        return np.frombuffer(entry.embedding_vector, dtype=EMBEDDING_DTYPE)
+
+    def entry_to_response(self, entry: KnowledgeBase) -> KnowledgeEntryResponse:
+        """
+        Convert KnowledgeBase model to KnowledgeEntryResponse schema
+        """
+        return KnowledgeEntryResponse(
+            id=str(entry.id),
+            title=entry.title,
+            content=entry.content,
+            category=entry.category,
+            tags=entry.tags or [],
+            source=entry.source,
+            active=bool(entry.active),
+            created_at=entry.created_at,
+            updated_at=entry.updated_at
+        )
@@ -0,0 +1,7 @@
+from app.services.knowledge.embeddings import HashingEmbedder, OpenAIEmbedder, get_embedder
+from app.services.knowledge.lexical import LexicalPostings, lexical_text, term_counts
+from app.services.knowledge.quantization import ProductQuantizer, ScalarQuantizer
+from app.services.knowledge.vector_index import KnowledgeIndex, build_index, open_index
+from app.services.knowledge.snapshots import SnapshotStore, get_snapshot_store
+from app.services.knowledge.result_cache import RetrievalCache
+from app.services.knowledge.retriever import KnowledgeHit, KnowledgeRetriever, reciprocal_rank_fusion, KNOWLEDGE_RETRIEVER
@@ -0,0 +1,545 @@
+"""
+Knowledge base ingestion: uploaded documents to embedded, indexed chunks.
+
+Uploads are spooled to disk as they arrive, then a background pipeline
+reads them back in a stream, splits each document into overlapping
+chunks, drops chunks whose content hash is already known (earlier in the
+upload or in the tenant's knowledge base), embeds the rest in batches
+with at most KNOWLEDGE_INGEST_CONCURRENCY calls in flight, and
+bulk-inserts each batch with ON CONFLICT DO NOTHING on
+(tenant_id, content_hash). Progress is written to the KnowledgeIngestion
+row as it goes.
+
+Supported files: .jsonl/.ndjson with one {"content", "title", "category",
+"tags", "source"} object per line, and plain text (.txt, .md) as one
+document per file.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.knowledge_base import KnowledgeBase
+from app.db.models.knowledge_ingestion import KnowledgeIngestion
+from app.services.knowledge.embeddings import embedding_text, vector_to_bytes
+from app.services.knowledge.lexical import lexical_text
+from app.services.knowledge.retriever import KNOWLEDGE_RETRIEVER
+from app.observability.metrics import knowledge_ingest_chunks_total
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_FORMATS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".txt": "text",
+    ".md": "text",
+    ".markdown": "text"
+}
+
+# Bytes per read when spooling uploads and streaming text files
+READ_BLOCK_BYTES = 1024 * 1024
+TEXT_BLOCK_CHARS = 64 * 1024
+
+# Minimum seconds between progress writes
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Break points for chunks, best first
+_BREAKS = ("\n\n", "\n", ". ", "? ", "! ", " ")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def document_format(filename: Optional[str]) -> Optional[str]:
+    return DOCUMENT_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+def content_hash(text: str) -> str:
+    """
+    SHA-256 of the chunk with case and whitespace normalized, so copies
+    that differ only in formatting collide
+    """
+    normalized = _WHITESPACE.sub(" ", text).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class Chunker:
+    """
+    Splits a stream of text into chunks of at most size characters, each
+    starting about overlap characters before the previous one ended.
+    Chunks end at the best break (paragraph, line, sentence, word) in
+    their second half.
+    """
+
+    def __init__(self, size: Optional[int] = None, overlap: Optional[int] = None):
+        self.size = max(100, size or settings.KNOWLEDGE_CHUNK_CHARS)
+        overlap = settings.KNOWLEDGE_CHUNK_OVERLAP if overlap is None else overlap
+        # Keeps each step at least a quarter chunk forward
+        self.overlap = max(0, min(overlap, self.size // 4))
+        self._buffer = ""
+        self._carried = 0  # Leading buffer characters already emitted
+
+    def _break(self, text: str, start: int) -> int:
+        limit = start + self.size
+        for separator in _BREAKS:
+            position = text.rfind(separator, start + self.size // 2, limit)
+            if position != -1:
+                return position + len(separator)
+        return limit
+
+    def _restart(self, text: str, end: int) -> int:
+        start = max(0, end - self.overlap)
+        # Begin the overlap on a word
+        space = text.find(" ", start, end)
+        return space + 1 if space != -1 else start
+
+    def feed(self, text: str) -> List[str]:
+        buffer = self._buffer + text
+        chunks = []
+        start = 0
+        # Keep a full chunk of lookahead so a break is never guessed early
+        while len(buffer) - start > self.size:
+            end = self._break(buffer, start)
+            chunk = buffer[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            restart = self._restart(buffer, end)
+            self._carried = end - restart
+            start = restart
+        self._buffer = buffer[start:]
+        return chunks
+
+    def finish(self) -> List[str]:
+        buffer, carried = self._buffer, self._carried
+        self._buffer, self._carried = "", 0
+        if not buffer[carried:].strip():
+            return []
+        return [buffer.strip()]
+
+    def split(self, text: str) -> List[str]:
+        return self.feed(text) + self.finish()
+
+@dataclass
+class SpooledUpload:
+    path: str
+    filename: str
+    format: str
+    size: int
+    documents: int  # Estimated from line count for jsonl
+
+@dataclass
+class ChunkRecord:
+    title: str
+    content: str
+    category: Optional[str]
+    tags: List[str]
+    source: Optional[str]
+    content_hash: str
+
+@dataclass
+class IngestionProgress:
+    documents_total: int = 0
+    documents_processed: int = 0
+    chunks_total: int = 0
+    chunks_inserted: int = 0
+    chunks_duplicate: int = 0
+    chunks_failed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def error(self, message: str):
+        if len(self.errors) < settings.KNOWLEDGE_INGEST_MAX_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "documents_total": self.documents_total,
+            "documents_processed": self.documents_processed,
+            "chunks_total": self.chunks_total,
+            "chunks_inserted": self.chunks_inserted,
+            "chunks_duplicate": self.chunks_duplicate,
+            "chunks_failed": self.chunks_failed,
+            "errors": list(self.errors)
+        }
+
+def _tag_list(value: Any) -> Optional[List[str]]:
+    if isinstance(value, str):
+        return [tag.strip() for tag in value.split(",") if tag.strip()]
+    if isinstance(value, list):
+        return [str(tag) for tag in value if str(tag).strip()]
+    return None
+
+class DocumentReader:
+    """
+    Iterates the chunks of one spooled upload. Runs on a thread; documents
+    and errors are read by the pipeline between batches.
+    """
+
+    def __init__(self, upload: SpooledUpload, defaults: Dict[str, Any], chunker: Chunker):
+        self.upload = upload
+        self.defaults = defaults
+        self.chunker = chunker
+        self.documents = 0
+        self.errors: List[str] = []
+
+    def __iter__(self) -> Iterator[ChunkRecord]:
+        if self.upload.format == "jsonl":
+            return self._jsonl()
+        return self._text()
+
+    def _record(self, title: str, content: str, category: Optional[str], tags: List[str], source: Optional[str]) -> ChunkRecord:
+        return ChunkRecord(title, content, category, tags, source, content_hash(content))
+
+    def _jsonl(self) -> Iterator[ChunkRecord]:
+        upload = self.upload
+        with open(upload.path, "r", encoding="utf-8", errors="replace") as handle:
+            for line_number, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                self.documents += 1
+                try:
+                    document = json.loads(line)
+                except ValueError as e:
+                    self.errors.append(f"{upload.filename}:{line_number}: invalid JSON ({str(e)})")
+                    continue
+                content = document.get("content") if isinstance(document, dict) else None
+                if not isinstance(content, str) or not content.strip():
+                    self.errors.append(f"{upload.filename}:{line_number}: missing content")
+                    continue
+                title = str(document.get("title") or f"{upload.filename} #{line_number}")
+                category = document.get("category") or self.defaults.get("category")
+                tags = _tag_list(document.get("tags"))
+                tags = tags if tags is not None else list(self.defaults.get("tags") or [])
+                source = document.get("source") or self.defaults.get("source") or upload.filename
+                for chunk in self.chunker.split(content):
+                    yield self._record(title, chunk, category, tags, source)
+
+    def _text(self) -> Iterator[ChunkRecord]:
+        upload = self.upload
+        title = os.path.splitext(upload.filename)[0] or upload.filename
+        category = self.defaults.get("category")
+        tags = list(self.defaults.get("tags") or [])
+        source = self.defaults.get("source") or upload.filename
+        self.documents += 1
+        with open(upload.path, "r", encoding="utf-8", errors="replace") as handle:
+            while True:
+                block = handle.read(TEXT_BLOCK_CHARS)
+                if not block:
+                    break
+                for chunk in self.chunker.feed(block):
+                    yield self._record(title, chunk, category, tags, source)
+        for chunk in self.chunker.finish():
+            yield self._record(title, chunk, category, tags, source)
+
+def _take(iterator: Iterator[ChunkRecord], count: int) -> List[ChunkRecord]:
+    return list(itertools.islice(iterator, count))
+
+async def spool_upload(upload, directory: str, max_bytes: int) -> SpooledUpload:
+    """
+    Copy an UploadFile to directory block by block, stopping with
+    ValueError once it exceeds max_bytes. jsonl documents are counted from
+    the line breaks on the way through.
+    """
+    loop = asyncio.get_running_loop()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4()}.upload")
+    size = 0
+    lines = 0
+    last = b"\n"
+    try:
+        with open(path, "wb") as handle:
+            while True:
+                block = await upload.read(READ_BLOCK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise ValueError(f"Upload exceeds {max_bytes} bytes")
+                lines += block.count(b"\n")
+                last = block[-1:]
+                await loop.run_in_executor(None, handle.write, block)
+    except Exception:
+        os.remove(path)
+        raise
+    document_type = document_format(upload.filename)
+    if document_type == "jsonl":
+        documents = lines + (0 if last == b"\n" else 1)
+    else:
+        documents = 1 if size else 0
+    return SpooledUpload(path, upload.filename, document_type, size, documents)
+
+def spool_documents(documents: Sequence[Dict[str, Any]], directory: str) -> SpooledUpload:
+    """
+    Write documents given as JSON to a jsonl spool file
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4()}.upload")
+    size = 0
+    with open(path, "w", encoding="utf-8") as handle:
+        for document in documents:
+            line = json.dumps(document) + "\n"
+            size += len(line)
+            handle.write(line)
+    return SpooledUpload(path, "documents.jsonl", "jsonl", size, len(documents))
+
+class KnowledgeIngestionPipeline:
+    """
+    Runs ingestions in the background of the worker that accepted them
+    """
+
+    def __init__(self, session_factory=SessionLocal, retriever=None):
+        self.session_factory = session_factory
+        self.retriever = retriever or KNOWLEDGE_RETRIEVER
+        # Keeps references to running ingestions so they aren't garbage collected
+        self._tasks = set()
+
+    @property
+    def embedder(self):
+        # Same embedder as the retriever, so stored vectors are usable as is
+        return self.retriever.embedder
+
+    @staticmethod
+    def spool_directory() -> str:
+        return os.path.join(settings.FILE_STORAGE_PATH, "knowledge")
+
+    def create(self, db: Session, tenant_id: str, user_id, uploads: Sequence[SpooledUpload]) -> KnowledgeIngestion:
+        ingestion = KnowledgeIngestion(
+            tenant_id=tenant_id,
+            status="queued",
+            files=[upload.filename for upload in uploads],
+            documents_total=sum(upload.documents for upload in uploads),
+            errors=[],
+            created_by=user_id
+        )
+        db.add(ingestion)
+        db.commit()
+        db.refresh(ingestion)
+        return ingestion
+
+    def start(
+        self,
+        ingestion_id: str,
+        tenant_id: str,
+        user_id,
+        uploads: Sequence[SpooledUpload],
+        defaults: Optional[Dict[str, Any]] = None
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self.run(ingestion_id, tenant_id, user_id, uploads, defaults))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run(
+        self,
+        ingestion_id: str,
+        tenant_id: str,
+        user_id,
+        uploads: Sequence[SpooledUpload],
+        defaults: Optional[Dict[str, Any]] = None
+    ) -> IngestionProgress:
+        """
+        Ingest spooled uploads, deleting them afterwards
+        """
+        loop = asyncio.get_running_loop()
+        tenant_id = str(tenant_id)
+        defaults = defaults or {}
+        progress = IngestionProgress(documents_total=sum(upload.documents for upload in uploads))
+        window = asyncio.Semaphore(max(1, settings.KNOWLEDGE_INGEST_CONCURRENCY))
+        running = set()
+        seen = set()
+        batch_size = settings.KNOWLEDGE_EMBED_BATCH_SIZE
+        status = "completed"
+        saved = time.monotonic()
+        await self._save(ingestion_id, progress, status="running", started_at=datetime.utcnow())
+
+        try:
+            documents_before = 0
+            for upload in uploads:
+                reader = DocumentReader(upload, defaults, Chunker())
+                chunks = iter(reader)
+                while True:
+                    batch = await loop.run_in_executor(None, _take, chunks, batch_size)
+                    progress.documents_processed = documents_before + reader.documents
+                    for message in reader.errors:
+                        progress.error(message)
+                    reader.errors.clear()
+                    if not batch:
+                        break
+
+                    progress.chunks_total += len(batch)
+                    fresh = []
+                    for chunk in batch:
+                        if chunk.content_hash in seen:
+                            continue
+                        seen.add(chunk.content_hash)
+                        fresh.append(chunk)
+                    if fresh:
+                        known = await loop.run_in_executor(
+                            None, self._existing_hashes, tenant_id, [chunk.content_hash for chunk in fresh]
+                        )
+                        fresh = [chunk for chunk in fresh if chunk.content_hash not in known]
+                    duplicates = len(batch) - len(fresh)
+                    if duplicates:
+                        progress.chunks_duplicate += duplicates
+                        knowledge_ingest_chunks_total.labels(outcome="duplicate").inc(duplicates)
+
+                    if fresh:
+                        await window.acquire()
+                        task = asyncio.create_task(self._store(tenant_id, user_id, fresh, progress, window))
+                        running.add(task)
+                        task.add_done_callback(running.discard)
+
+                    if time.monotonic() - saved >= PROGRESS_INTERVAL_SECONDS:
+                        await self._save(ingestion_id, progress)
+                        saved = time.monotonic()
+                documents_before += reader.documents
+
+            if running:
+                await asyncio.gather(*running)
+            if progress.chunks_failed and not progress.chunks_inserted:
+                status = "failed"
+        except Exception as e:
+            logger.error(f"Knowledge ingestion {ingestion_id} failed: {str(e)}")
+            progress.error(f"Ingestion stopped: {str(e)}")
+            status = "failed"
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        finally:
+            for upload in uploads:
+                try:
+                    os.remove(upload.path)
+                except OSError:
+                    pass
+
+        # Line counts are an estimate; the final total is what was read
+        progress.documents_total = progress.documents_processed
+        await self._save(ingestion_id, progress, status=status, finished_at=datetime.utcnow())
+        logger.info(
+            f"Knowledge ingestion {ingestion_id} {status}: {progress.chunks_inserted} chunks inserted, "
+            f"{progress.chunks_duplicate} duplicate, {progress.chunks_failed} failed"
+        )
+        return progress
+
+    async def _store(
+        self,
+        tenant_id: str,
+        user_id,
+        chunks: List[ChunkRecord],
+        progress: IngestionProgress,
+        window: asyncio.Semaphore
+    ):
+        """
+        Embed and insert one batch, then add what was inserted to the index
+        """
+        try:
+            try:
+                vectors = await self.embedder.embed([embedding_text(chunk.title, chunk.content) for chunk in chunks])
+                inserted = await asyncio.get_running_loop().run_in_executor(
+                    None, self._insert, tenant_id, user_id, chunks, vectors
+                )
+            except Exception as e:
+                logger.error(f"Failed to ingest {len(chunks)} knowledge chunks for tenant {tenant_id}: {str(e)}")
+                progress.chunks_failed += len(chunks)
+                progress.error(f"Failed to store {len(chunks)} chunks: {str(e)}")
+                knowledge_ingest_chunks_total.labels(outcome="failed").inc(len(chunks))
+                return
+
+            # Rows another upload inserted first come back empty
+            rows = [row for row, chunk in enumerate(chunks) if chunk.content_hash in inserted]
+            progress.chunks_inserted += len(rows)
+            progress.chunks_duplicate += len(chunks) - len(rows)
+            knowledge_ingest_chunks_total.labels(outcome="inserted").inc(len(rows))
+            if len(chunks) > len(rows):
+                knowledge_ingest_chunks_total.labels(outcome="duplicate").inc(len(chunks) - len(rows))
+            if not rows:
+                return
+            try:
+                await self.retriever.upsert(
+                    tenant_id,
+                    [inserted[chunks[row].content_hash] for row in rows],
+                    vectors[rows],
+                    [chunks[row].category for row in rows],
+                    [chunks[row].tags for row in rows],
+                    [lexical_text(chunks[row].title, chunks[row].content) for row in rows]
+                )
+            except Exception as e:
+                # The rows are stored; the next index load picks them up
+                logger.warning(f"Failed to index ingested knowledge for tenant {tenant_id}: {str(e)}")
+        finally:
+            window.release()
+
+    def _existing_hashes(self, tenant_id: str, hashes: List[str]) -> set:
+        db = self.session_factory()
+        try:
+            rows = db.query(KnowledgeBase.content_hash).filter(
+                KnowledgeBase.tenant_id == tenant_id,
+                KnowledgeBase.content_hash.in_(hashes)
+            ).all()
+        finally:
+            db.close()
+        return {content_hash for content_hash, in rows}
+
+    def _insert(self, tenant_id: str, user_id, chunks: List[ChunkRecord], vectors: np.ndarray) -> Dict[str, str]:
+        """
+        Bulk insert a batch; returns content_hash -> id of the rows inserted
+        """
+        now = datetime.utcnow()
+        model = self.embedder.name
+        values = [
+            {
+                "id": uuid.uuid4(),
+                "tenant_id": uuid.UUID(tenant_id),
+                "title": chunk.title,
+                "content": chunk.content,
+                "tags": chunk.tags,
+                "category": chunk.category,
+                "source": chunk.source,
+                "content_hash": chunk.content_hash,
+                "embedding_vector": vector_to_bytes(vector),
+                "embedding_model": model,
+                "active": True,
+                "created_by": user_id,
+                "created_at": now,
+                "updated_at": now
+            }
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        statement = insert(KnowledgeBase).values(values).on_conflict_do_nothing(
+            constraint="uq_knowledge_base_tenant_content_hash"
+        ).returning(KnowledgeBase.id, KnowledgeBase.content_hash)
+        db = self.session_factory()
+        try:
+            rows = db.execute(statement).all()
+            db.commit()
+        finally:
+            db.close()
+        return {content_hash: str(entry_id) for entry_id, content_hash in rows}
+
+    async def _save(self, ingestion_id: str, progress: IngestionProgress, **fields):
+        values = progress.to_dict()
+        values.update(fields)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._update, ingestion_id, values)
+        except Exception as e:
+            logger.warning(f"Failed to record progress for knowledge ingestion {ingestion_id}: {str(e)}")
+
+    def _update(self, ingestion_id: str, values: Dict[str, Any]):
+        db = self.session_factory()
+        try:
+            db.query(KnowledgeIngestion).filter(KnowledgeIngestion.id == uuid.UUID(str(ingestion_id))).update(
+                values, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+# Create a global instance
+KNOWLEDGE_INGESTION = KnowledgeIngestionPipeline()
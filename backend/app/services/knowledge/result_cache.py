@@ -0,0 +1,89 @@
+"""
+LRU cache of knowledge search results.
+
+Keys carry the index instance and its version, so any write to a tenant's
+index (an upsert, removal, replayed delta, compaction or snapshot swap)
+makes its older entries unreachable; they age out of the LRU. The query
+vector is rounded to a coarse grid first, so lookups whose embeddings
+differ only in noise share an entry.
+"""
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+from app.observability.metrics import knowledge_cache_requests_total
+
+def quantize_query(vector: Optional[np.ndarray], levels: Optional[int] = None) -> Optional[bytes]:
+    """
+    Cache key for a unit-norm query vector: each component rounded to
+    1 / levels
+    """
+    if vector is None:
+        return None
+    levels = levels or settings.KNOWLEDGE_CACHE_QUERY_LEVELS
+    return np.rint(np.asarray(vector, dtype=np.float32) * levels).astype(np.int16).tobytes()
+
+class RetrievalCache:
+    """
+    Search results per (tenant, index, version, query, filters). Hits are
+    copied on the way in and out, since callers fill and keep them.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = settings.KNOWLEDGE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._entries: "OrderedDict[Tuple[Any, ...], List[Any]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(
+        tenant_id: str,
+        index: Any,
+        mode: str,
+        vector: Optional[bytes],
+        terms: Sequence[str],
+        k: int,
+        category: Optional[str],
+        tags: Optional[Sequence[str]],
+        min_score: float
+    ) -> Tuple[Any, ...]:
+        return (
+            str(tenant_id),
+            index.uid,
+            index.version,
+            mode,
+            vector,
+            tuple(terms),
+            k,
+            category,
+            tuple(sorted(tags or ())),
+            min_score
+        )
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[List[Any]]:
+        hits = self._entries.get(key)
+        if hits is None:
+            knowledge_cache_requests_total.labels(outcome="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        knowledge_cache_requests_total.labels(outcome="hit").inc()
+        return [replace(hit, tags=list(hit.tags)) for hit in hits]
+
+    def put(self, key: Tuple[Any, ...], hits: List[Any]):
+        self._entries[key] = [replace(hit, tags=list(hit.tags)) for hit in hits]
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tenant_id: str):
+        """
+        Drop a tenant's entries now rather than waiting for eviction
+        """
+        for key in [key for key in self._entries if key[0] == str(tenant_id)]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,593 @@
+"""
+Knowledge base retrieval for the sales agent.
+
+Each tenant's active KnowledgeBase rows are streamed into a KnowledgeIndex
+on first use; embeddings are stored as raw float32 bytes, so a chunk of
+rows becomes matrix rows without parsing. Rows without a usable embedding
+(none yet, or written by a different embedder) are embedded during the
+load and written back. Only ids, vectors and filter fields are held in
+memory; the text of the top-k hits is fetched from the database per query.
+
+Searches are hybrid by default: the vector ranking and a BM25 ranking over
+the same rows are fused by reciprocal rank, so exact product names and
+SKUs are found even when the embedding blurs them. Results are cached
+per index version (see result_cache.py), so repeated lookups skip both
+searches and the text fetch until the tenant's knowledge base changes.
+
+With KNOWLEDGE_SNAPSHOT_DIR set, a built index is also written as a
+memory-mapped snapshot (see snapshots.py), so other workers open it
+instead of loading from the database, and changes are shared as deltas.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import func
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models.knowledge_base import KnowledgeBase
+from app.services.knowledge.embeddings import (
+    EMBEDDING_DTYPE,
+    embedding_text,
+    get_embedder,
+    tokenize,
+    vector_to_bytes,
+    vectors_from_bytes
+)
+from app.services.knowledge.lexical import LexicalBuilder, lexical_text, term_counts
+from app.services.knowledge.result_cache import RetrievalCache, quantize_query
+from app.services.knowledge.snapshots import SnapshotStore, apply_delta, get_snapshot_store
+from app.services.knowledge.vector_index import KnowledgeIndex, build_index
+from app.observability.metrics import knowledge_index_loads_total, knowledge_search_duration
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched and decoded per chunk when loading a tenant
+LOAD_CHUNK_ROWS = 10000
+
+@dataclass
+class KnowledgeHit:
+    id: str
+    score: float
+    title: Optional[str] = None
+    content: Optional[str] = None
+    category: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+    vector_score: Optional[float] = None  # Cosine similarity, if in the vector ranking
+    lexical_score: Optional[float] = None  # BM25, if in the keyword ranking
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "score": round(self.score, 4),
+            "vector_score": round(self.vector_score, 4) if self.vector_score is not None else None,
+            "lexical_score": round(self.lexical_score, 4) if self.lexical_score is not None else None,
+            "title": self.title,
+            "content": self.content,
+            "category": self.category,
+            "tags": self.tags
+        }
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Tuple[str, float]]], k: int) -> List[Tuple[str, float]]:
+    """
+    Fuse rankings by summing 1 / (k + rank) over the rankings an id is in
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, (entry_id, _) in enumerate(ranking, 1):
+            scores[entry_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+class _LoadedRows:
+    """
+    A tenant's rows as columns, with vectors filled into one preallocated
+    matrix chunk by chunk
+    """
+
+    def __init__(self, capacity: int, dim: int):
+        self.ids: List[str] = []
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.categories: List[Optional[str]] = []
+        self.tags: List[List[str]] = []
+        self.lexical = LexicalBuilder()
+        self.missing: List[Tuple[str, Optional[str], List[str]]] = []  # (id, category, tags) to embed
+
+    def add(
+        self,
+        ids: List[str],
+        vectors: np.ndarray,
+        categories: List[Optional[str]],
+        tags: List[List[str]],
+        texts: List[str]
+    ):
+        start, end = len(self.ids), len(self.ids) + len(ids)
+        if end > len(self.vectors):
+            # Rows inserted since the count
+            grown = np.empty((max(end, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:start] = self.vectors[:start]
+            self.vectors = grown
+        self.vectors[start:end] = vectors
+        self.ids.extend(ids)
+        self.categories.extend(categories)
+        self.tags.extend(tags)
+        for text in texts:
+            self.lexical.add(term_counts(text))
+
+    def matrix(self) -> np.ndarray:
+        return self.vectors[:len(self.ids)]
+
+class KnowledgeRetriever:
+    """
+    Per-tenant vector search over the knowledge base. With
+    session_factory=None indexes are in-process only and start empty.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        embedder=None,
+        snapshots: Optional[SnapshotStore] = None,
+        cache: Optional[RetrievalCache] = None
+    ):
+        self.session_factory = session_factory
+        self.embedder = embedder or get_embedder()
+        self.cache = cache or RetrievalCache()
+        if snapshots is None and session_factory is not None:
+            snapshots = get_snapshot_store()
+        self.snapshots = snapshots
+        self._indexes: Dict[str, KnowledgeIndex] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._compacting: Dict[str, asyncio.Task] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Snapshot state per tenant: mapped version, applied deltas, last poll
+        self._versions: Dict[str, str] = {}
+        self._applied: Dict[str, Set[str]] = {}
+        self._polled: Dict[str, float] = {}
+
+    async def search(
+        self,
+        tenant_id: str,
+        query: str,
+        k: Optional[int] = None,
+        category: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None,
+        min_score: Optional[float] = None
+    ) -> List[KnowledgeHit]:
+        """
+        Top-k chunks for a text query, optionally limited to a category
+        and/or chunks carrying any of tags. min_score applies to the vector
+        ranking. Hits carry the fused score in hybrid mode and the ranking's
+        own score otherwise. Results are cached until the index changes.
+        """
+        k = k or settings.KNOWLEDGE_TOP_K
+        mode = settings.KNOWLEDGE_SEARCH_MODE
+        depth = max(k, settings.KNOWLEDGE_HYBRID_DEPTH) if mode == "hybrid" else k
+        min_score = settings.KNOWLEDGE_MIN_SCORE if min_score is None else min_score
+
+        vector = (await self.embedder.embed([query]))[0] if mode != "lexical" else None
+        terms = sorted(set(tokenize(query))) if mode != "vector" else []
+        key = None
+        if self.cache.enabled:
+            index = await self.index(tenant_id)
+            key = self.cache.key(tenant_id, index, mode, quantize_query(vector), terms, k, category, tags, min_score)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        rankings: List[List[Tuple[str, float]]] = []
+        vector_scores: Dict[str, float] = {}
+        lexical_scores: Dict[str, float] = {}
+        if vector is not None:
+            matches = await self.search_vector(tenant_id, vector, depth, category, tags)
+            matches = [(entry_id, score) for entry_id, score in matches if score >= min_score]
+            vector_scores = dict(matches)
+            rankings.append(matches)
+        if mode != "vector":
+            matches = await self.search_lexical(tenant_id, query, depth, category, tags)
+            lexical_scores = dict(matches)
+            rankings.append(matches)
+
+        ranked = reciprocal_rank_fusion(rankings, settings.KNOWLEDGE_RRF_K) if len(rankings) > 1 else rankings[0]
+        hits = [
+            KnowledgeHit(
+                id=entry_id,
+                score=score,
+                vector_score=vector_scores.get(entry_id),
+                lexical_score=lexical_scores.get(entry_id)
+            )
+            for entry_id, score in ranked[:k]
+        ]
+        if hits and self.session_factory is not None:
+            rows = await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch, str(tenant_id), [hit.id for hit in hits]
+            )
+            for hit in hits:
+                row = rows.get(hit.id)
+                if row is not None:
+                    hit.title, hit.content, hit.category, hit.tags = row
+        if key is not None:
+            self.cache.put(key, hits)
+        return hits
+
+    async def search_vector(
+        self,
+        tenant_id: str,
+        vector: np.ndarray,
+        k: Optional[int] = None,
+        category: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        index = await self.index(tenant_id)
+        started = time.perf_counter()
+        matches = index.search(vector, k or settings.KNOWLEDGE_TOP_K, category=category, tags=tags)
+        knowledge_search_duration.labels(index=index.kind).observe(time.perf_counter() - started)
+        return matches
+
+    async def search_lexical(
+        self,
+        tenant_id: str,
+        query: str,
+        k: Optional[int] = None,
+        category: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        index = await self.index(tenant_id)
+        started = time.perf_counter()
+        matches = index.lexical_search(query, k or settings.KNOWLEDGE_TOP_K, category=category, tags=tags)
+        knowledge_search_duration.labels(index="bm25").observe(time.perf_counter() - started)
+        return matches
+
+    async def index(self, tenant_id: str) -> KnowledgeIndex:
+        tenant_id = str(tenant_id)
+        index = self._indexes.get(tenant_id)
+        if index is not None:
+            self._maybe_refresh(tenant_id)
+            return index
+
+        task = self._loading.get(tenant_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_tenant(tenant_id))
+            self._loading[tenant_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(tenant_id, None))
+        return await asyncio.shield(task)
+
+    async def upsert(
+        self,
+        tenant_id: str,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        categories: Sequence[Optional[str]],
+        tags: Sequence[Sequence[str]],
+        texts: Optional[Sequence[str]] = None
+    ):
+        """
+        Add or replace entries after KnowledgeBase writes; texts (see
+        lexical_text) are indexed for keyword search
+        """
+        tenant_id = str(tenant_id)
+        ids = [str(entry_id) for entry_id in ids]
+        index = await self.index(tenant_id)
+        index.upsert(ids, vectors, categories, tags, texts)
+        await self._append_delta(tenant_id, ids, vectors, categories, tags, [], texts)
+        self._maybe_compact(tenant_id, index)
+
+    async def remove(self, tenant_id: str, ids: Sequence[str]):
+        """
+        Drop entries that were deleted or deactivated
+        """
+        tenant_id = str(tenant_id)
+        ids = [str(entry_id) for entry_id in ids]
+        index = await self.index(tenant_id)
+        index.remove(ids)
+        await self._append_delta(tenant_id, [], None, [], [], ids)
+        self._maybe_compact(tenant_id, index)
+
+    def invalidate(self, tenant_id: str):
+        """
+        Forget a tenant's index and snapshot; it is rebuilt from the
+        database on next use
+        """
+        tenant_id = str(tenant_id)
+        self._indexes.pop(tenant_id, None)
+        self._versions.pop(tenant_id, None)
+        self._applied.pop(tenant_id, None)
+        self.cache.invalidate(tenant_id)
+        if self.snapshots is not None:
+            self.snapshots.discard(tenant_id)
+
+    def _maybe_compact(self, tenant_id: str, index: KnowledgeIndex):
+        if tenant_id in self._compacting or not index.needs_compaction():
+            return
+        task = asyncio.ensure_future(self._compact(tenant_id, index))
+        self._compacting[tenant_id] = task
+        task.add_done_callback(lambda _: self._compacting.pop(tenant_id, None))
+
+    async def _compact(self, tenant_id: str, index: KnowledgeIndex):
+        folded = set(self._applied.get(tenant_id, ()))
+        snapshot = index.begin_compaction()
+        try:
+            base = await asyncio.get_running_loop().run_in_executor(None, index.seal, snapshot)
+        except Exception as e:
+            index.abort_compaction()
+            logger.error(f"Knowledge index compaction failed: {str(e)}")
+            return
+        index.finish_compaction(snapshot, base)
+        if self.snapshots is not None and self._indexes.get(tenant_id) is index:
+            await self._write_snapshot(tenant_id, index, folded)
+
+    def _maybe_refresh(self, tenant_id: str):
+        """
+        Pick up newer snapshots and other workers' deltas, at most once per
+        KNOWLEDGE_SNAPSHOT_POLL_SECONDS
+        """
+        if self.snapshots is None or tenant_id in self._refreshing:
+            return
+        now = time.monotonic()
+        if now - self._polled.get(tenant_id, 0.0) < settings.KNOWLEDGE_SNAPSHOT_POLL_SECONDS:
+            return
+        self._polled[tenant_id] = now
+        task = asyncio.ensure_future(self._refresh(tenant_id))
+        self._refreshing[tenant_id] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(tenant_id, None))
+
+    async def _refresh(self, tenant_id: str):
+        loop = asyncio.get_running_loop()
+        try:
+            version = await loop.run_in_executor(None, self.snapshots.current, tenant_id)
+            if version is not None and version != self._versions.get(tenant_id):
+                # Another worker compacted or rebuilt the index
+                opened = await loop.run_in_executor(
+                    None, self.snapshots.open, tenant_id, self.embedder.dim, self.embedder.name
+                )
+                if opened is not None and tenant_id in self._indexes:
+                    self._indexes[tenant_id], self._versions[tenant_id], self._applied[tenant_id] = opened
+                    return
+
+            applied = self._applied.setdefault(tenant_id, set())
+            names = await loop.run_in_executor(None, self.snapshots.pending_deltas, tenant_id, set(applied))
+            if not names:
+                return
+            deltas = await loop.run_in_executor(None, self.snapshots.read_deltas, tenant_id, names)
+            index = self._indexes.get(tenant_id)
+            if index is None:
+                return
+            for name, record, vectors in deltas:
+                if name not in applied:
+                    apply_delta(index, record, vectors)
+                    applied.add(name)
+            self._maybe_compact(tenant_id, index)
+        except Exception as e:
+            logger.warning(f"Failed to refresh knowledge index for tenant {tenant_id}: {str(e)}")
+
+    async def _append_delta(
+        self,
+        tenant_id: str,
+        ids: List[str],
+        vectors: Optional[np.ndarray],
+        categories: Sequence[Optional[str]],
+        tags: Sequence[Sequence[str]],
+        removed: List[str],
+        texts: Optional[Sequence[str]] = None
+    ):
+        if self.snapshots is None:
+            return
+        try:
+            name = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.snapshots.append_delta,
+                tenant_id,
+                ids,
+                vectors,
+                list(categories),
+                list(tags),
+                removed,
+                list(texts) if texts is not None else None
+            )
+        except Exception as e:
+            # Other workers miss the change until the next snapshot or rebuild
+            logger.warning(f"Failed to write knowledge delta for tenant {tenant_id}: {str(e)}")
+            return
+        self._applied.setdefault(tenant_id, set()).add(name)
+
+    async def _write_snapshot(self, tenant_id: str, index: KnowledgeIndex, folded: Set[str]):
+        """
+        Write the index's base as the tenant's current snapshot, then swap
+        the in-memory base for the mapped one so its pages are shared
+        """
+        loop = asyncio.get_running_loop()
+        changes = index.version
+        try:
+            version = await loop.run_in_executor(
+                None, self.snapshots.write, tenant_id, index, self.embedder.name, folded
+            )
+            self._versions[tenant_id] = version
+            opened = await loop.run_in_executor(
+                None, self.snapshots.open, tenant_id, self.embedder.dim, self.embedder.name
+            )
+        except Exception as e:
+            logger.warning(f"Failed to write knowledge snapshot for tenant {tenant_id}: {str(e)}")
+            return
+        if opened is not None and self._indexes.get(tenant_id) is index and index.version == changes:
+            self._indexes[tenant_id], self._versions[tenant_id], self._applied[tenant_id] = opened
+
+    async def _load_tenant(self, tenant_id: str) -> KnowledgeIndex:
+        dim = self.embedder.dim
+        if self.session_factory is None:
+            index = KnowledgeIndex(dim)
+            self._indexes[tenant_id] = index
+            return index
+
+        loop = asyncio.get_running_loop()
+        if self.snapshots is None:
+            return await self._load_from_database(tenant_id)
+
+        opened = await loop.run_in_executor(None, self.snapshots.open, tenant_id, dim, self.embedder.name)
+        if opened is None:
+            # Only one worker per host rebuilds a missing snapshot; the rest
+            # wait and then open what it wrote
+            fd = await loop.run_in_executor(None, self.snapshots.lock, tenant_id)
+            try:
+                opened = await loop.run_in_executor(None, self.snapshots.open, tenant_id, dim, self.embedder.name)
+                if opened is None:
+                    return await self._load_from_database(tenant_id)
+            finally:
+                self.snapshots.unlock(fd)
+
+        index, version, applied = opened
+        knowledge_index_loads_total.labels(source="snapshot").inc()
+        logger.info(f"Opened knowledge snapshot {version} for tenant {tenant_id}: {len(index)} entries ({index.kind})")
+        self._indexes[tenant_id] = index
+        self._versions[tenant_id] = version
+        self._applied[tenant_id] = applied
+        self._polled[tenant_id] = time.monotonic()
+        return index
+
+    async def _load_from_database(self, tenant_id: str) -> KnowledgeIndex:
+        loop = asyncio.get_running_loop()
+        # Deltas written before the rows are read are already in the database
+        folded: Set[str] = set()
+        if self.snapshots is not None:
+            folded = set(await loop.run_in_executor(None, self.snapshots.list_deltas, tenant_id))
+
+        loaded = await loop.run_in_executor(None, self._load, tenant_id)
+        if loaded.missing:
+            await self._embed_missing(tenant_id, loaded)
+
+        index = await loop.run_in_executor(None, self._build, loaded)
+        knowledge_index_loads_total.labels(source="database").inc()
+        logger.info(f"Loaded knowledge index for tenant {tenant_id}: {len(index)} entries ({index.kind})")
+        self._indexes[tenant_id] = index
+        self._applied[tenant_id] = folded
+        self._polled[tenant_id] = time.monotonic()
+        if self.snapshots is not None:
+            await self._write_snapshot(tenant_id, index, folded)
+        return self._indexes[tenant_id]
+
+    def _build(self, loaded: _LoadedRows) -> KnowledgeIndex:
+        return build_index(
+            self.embedder.dim, loaded.ids, loaded.matrix(), loaded.categories, loaded.tags, loaded.lexical.build()
+        )
+
+    def _load(self, tenant_id: str) -> _LoadedRows:
+        """
+        Stream the tenant's active rows, turning each chunk of raw
+        embedding_vector values into matrix rows with a single frombuffer
+        """
+        model, dim = self.embedder.name, self.embedder.dim
+        row_bytes = dim * EMBEDDING_DTYPE.itemsize
+        filters = (KnowledgeBase.tenant_id == tenant_id, KnowledgeBase.active == True)
+        db = self.session_factory()
+        try:
+            total = db.query(func.count(KnowledgeBase.id)).filter(*filters).scalar() or 0
+            loaded = _LoadedRows(total, dim)
+            rows = db.query(
+                KnowledgeBase.id,
+                KnowledgeBase.category,
+                KnowledgeBase.tags,
+                KnowledgeBase.embedding_model,
+                KnowledgeBase.embedding_vector,
+                KnowledgeBase.title,
+                KnowledgeBase.content
+            ).filter(*filters).yield_per(LOAD_CHUNK_ROWS)
+
+            chunk = ([], [], [], [], [])
+            for entry_id, category, tags, embedding_model, embedding_vector, title, content in rows:
+                tags = [str(tag) for tag in tags] if isinstance(tags, list) else []
+                # Rows without a model predate embedding_model; trust them if the size fits
+                usable = (
+                    embedding_vector is not None
+                    and len(embedding_vector) == row_bytes
+                    and embedding_model in (model, None)
+                )
+                if not usable:
+                    loaded.missing.append((str(entry_id), category, tags))
+                    continue
+                chunk[0].append(str(entry_id))
+                chunk[1].append(embedding_vector)
+                chunk[2].append(category)
+                chunk[3].append(tags)
+                chunk[4].append(lexical_text(title, content))
+                if len(chunk[0]) >= LOAD_CHUNK_ROWS:
+                    loaded.add(chunk[0], vectors_from_bytes(chunk[1], dim), chunk[2], chunk[3], chunk[4])
+                    chunk = ([], [], [], [], [])
+            if chunk[0]:
+                loaded.add(chunk[0], vectors_from_bytes(chunk[1], dim), chunk[2], chunk[3], chunk[4])
+        finally:
+            db.close()
+        return loaded
+
+    async def _embed_missing(self, tenant_id: str, loaded: _LoadedRows):
+        """
+        Embed rows without a usable embedding and persist the result
+        """
+        loop = asyncio.get_running_loop()
+        batch_size = settings.KNOWLEDGE_EMBED_BATCH_SIZE
+        for start in range(0, len(loaded.missing), batch_size):
+            batch = loaded.missing[start:start + batch_size]
+            texts = await loop.run_in_executor(None, self._fetch_texts, [entry_id for entry_id, _, _ in batch])
+            embedded = [entry for entry in batch if entry[0] in texts]
+            if not embedded:
+                continue
+            vectors = await self.embedder.embed([embedding_text(*texts[entry_id]) for entry_id, _, _ in embedded])
+            loaded.add(
+                [entry_id for entry_id, _, _ in embedded],
+                vectors,
+                [category for _, category, _ in embedded],
+                [tags for _, _, tags in embedded],
+                [lexical_text(*texts[entry_id]) for entry_id, _, _ in embedded]
+            )
+            try:
+                await loop.run_in_executor(
+                    None, self._store_embeddings, [entry_id for entry_id, _, _ in embedded], vectors
+                )
+            except Exception as e:
+                # Still indexed in memory; the next load embeds them again
+                logger.warning(f"Failed to persist knowledge embeddings for tenant {tenant_id}: {str(e)}")
+
+    def _fetch_texts(self, ids: List[str]) -> Dict[str, Tuple[str, str]]:
+        db = self.session_factory()
+        try:
+            rows = db.query(KnowledgeBase.id, KnowledgeBase.title, KnowledgeBase.content).filter(
+                KnowledgeBase.id.in_([uuid.UUID(entry_id) for entry_id in ids])
+            ).all()
+        finally:
+            db.close()
+        return {str(entry_id): (title, content) for entry_id, title, content in rows}
+
+    def _store_embeddings(self, ids: List[str], vectors: np.ndarray):
+        db = self.session_factory()
+        try:
+            db.bulk_update_mappings(KnowledgeBase, [
+                {
+                    "id": uuid.UUID(entry_id),
+                    "embedding_vector": vector_to_bytes(vector),
+                    "embedding_model": self.embedder.name
+                }
+                for entry_id, vector in zip(ids, vectors)
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    def _fetch(self, tenant_id: str, ids: List[str]) -> Dict[str, Tuple[str, str, Optional[str], List[str]]]:
+        db = self.session_factory()
+        try:
+            rows = db.query(
+                KnowledgeBase.id, KnowledgeBase.title, KnowledgeBase.content, KnowledgeBase.category, KnowledgeBase.tags
+            ).filter(
+                KnowledgeBase.tenant_id == tenant_id,
+                KnowledgeBase.id.in_([uuid.UUID(entry_id) for entry_id in ids])
+            ).all()
+        finally:
+            db.close()
+        return {
+            str(entry_id): (title, content, category, tags if isinstance(tags, list) else [])
+            for entry_id, title, content, category, tags in rows
+        }
+
+# Create a global instance
+KNOWLEDGE_RETRIEVER = KnowledgeRetriever()
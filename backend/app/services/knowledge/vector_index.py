@@ -0,0 +1,688 @@
+"""
+Per-tenant vector index over knowledge base chunks.
+
+An index is a sealed base segment plus a small append-only delta segment.
+Inserts and updates go to the delta, deletes and deactivations are
+tombstones, and once the delta grows past a fraction of the base both are
+compacted into a new base off the event loop.
+
+Small bases are searched by brute force. Bases of at least
+KNOWLEDGE_ANN_MIN_ROWS rows get an approximate index: HNSW when faiss is
+installed, otherwise an inverted file (IVF) in NumPy whose rows are stored
+contiguously per cluster so a probe is a single matrix-vector product.
+Filtered searches that leave few rows fall back to exact search over just
+those rows.
+
+With KNOWLEDGE_QUANTIZATION set, bases of at least KNOWLEDGE_QUANT_MIN_ROWS
+rows (searched flat or with IVF) also hold int8 or product-quantized codes
+(see quantization.py). Searches score the codes and re-rank the best
+KNOWLEDGE_RERANK_FACTOR * k candidates with the float vectors.
+
+Segments also carry BM25 postings over the same rows (see lexical.py) for
+the keyword half of hybrid search.
+"""
+import itertools
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.knowledge.embeddings import tokenize
+from app.services.knowledge.lexical import (
+    DeltaPostings,
+    LexicalPostings,
+    bm25_idf,
+    bm25_weights,
+    merge_postings,
+    term_counts
+)
+from app.services.knowledge.quantization import train_quantizer
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+# Filters matching at most this many rows are searched exactly
+EXACT_SEARCH_ROWS = 20000
+
+# Rows scored per matrix product when assigning rows to IVF lists
+ASSIGN_CHUNK_ROWS = 65536
+
+# Training rows per IVF centroid
+KMEANS_SAMPLE_PER_LIST = 32
+
+_index_uids = itertools.count(1)
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on a sample of the rows; returns unit-norm centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nonempty = counts > 0
+        sums = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # Empty lists keep their old centroid
+        centroids[nonempty] = sums / norms
+    return centroids
+
+class IVFIndex:
+    """
+    Inverted file over a base whose rows are already ordered by list:
+    list i holds rows offsets[i]:offsets[i + 1]
+    """
+    kind = "ivf"
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, nprobe: int):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @staticmethod
+    def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+            chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignment
+
+    def search(
+        self,
+        segment: "_Segment",
+        query: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scan the nprobe closest lists, and more while fewer than k rows
+        pass the mask
+        """
+        lists = np.argsort(-(self.centroids @ query))
+        prepared = segment.prepare(query)
+        found_rows: List[np.ndarray] = []
+        found_scores: List[np.ndarray] = []
+        found = 0
+        for probed, list_index in enumerate(lists):
+            if probed >= self.nprobe and found >= k:
+                break
+            start, end = self.offsets[list_index], self.offsets[list_index + 1]
+            if start == end:
+                continue
+            scores = segment.score_range(prepared, start, end)
+            rows = np.arange(start, end)
+            if mask is not None:
+                keep = mask[start:end]
+                rows, scores = rows[keep], scores[keep]
+            found_rows.append(rows)
+            found_scores.append(scores)
+            found += len(rows)
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return _top_k(np.concatenate(found_rows), np.concatenate(found_scores), k)
+
+class HNSWIndex:
+    """
+    faiss HNSW graph over the base rows (inner product)
+    """
+    kind = "hnsw"
+
+    def __init__(self, index):
+        self.index = index
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, m: int, ef_search: int) -> "HNSWIndex":
+        index = faiss.IndexHNSWFlat(vectors.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, 2 * m)
+        index.hnsw.efSearch = ef_search
+        index.add(np.ascontiguousarray(vectors))
+        return cls(index)
+
+    def search(
+        self,
+        segment: "_Segment",
+        query: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Over-fetch and drop rows outside the mask until k remain
+        """
+        total = self.index.ntotal
+        fetch = k if mask is None else k * 4
+        while True:
+            scores, rows = self.index.search(query.reshape(1, -1), min(fetch, total))
+            rows, scores = rows[0], scores[0]
+            valid = rows >= 0
+            rows, scores = rows[valid], scores[valid]
+            if mask is not None:
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+            if len(rows) >= k or fetch >= total:
+                return rows[:k], scores[:k]
+            fetch *= 4
+
+class _Segment:
+    """
+    Columnar rows of the index. The base segment is sealed (only alive
+    changes); the delta segment grows in place. A base opened from a
+    snapshot has read-only mapped arrays and no row_tags. A quantized base
+    scores codes and only reads vectors to re-rank.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.ids: List[str] = []
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.categories = np.empty(capacity, dtype=np.int32)
+        self.alive = np.empty(capacity, dtype=bool)
+        self.tags: Dict[str, List[int]] = defaultdict(list)
+        self.row_tags: Optional[List[Tuple[str, ...]]] = []
+        self.dead = 0
+        self.ann = None
+        self.quantizer = None
+        self.codes: Optional[np.ndarray] = None
+        self.lexical = DeltaPostings()  # LexicalPostings once sealed; None without text
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def live(self) -> int:
+        return self.size - self.dead
+
+    def append(
+        self,
+        entry_id: str,
+        vector: np.ndarray,
+        category: int,
+        tags: Sequence[str],
+        counts: Optional[Dict[str, int]] = None
+    ) -> int:
+        row = self.size
+        if row == len(self.vectors):
+            capacity = max(1024, 2 * row)
+            for name in ("vectors", "categories", "alive"):
+                old = getattr(self, name)
+                grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                grown[:row] = old[:row]
+                setattr(self, name, grown)
+        self.ids.append(entry_id)
+        self.vectors[row] = vector
+        self.categories[row] = category
+        self.alive[row] = True
+        tags = tuple(tags or ())
+        self.row_tags.append(tags)
+        for tag in tags:
+            self.tags[tag].append(row)
+        self.lexical.add(row, counts or {})
+        return row
+
+    def tags_of(self, rows: np.ndarray) -> List[Tuple[str, ...]]:
+        """
+        Tags of each of rows, rebuilt from the postings when the segment
+        has no row_tags
+        """
+        if self.row_tags is not None:
+            return [self.row_tags[row] for row in rows]
+        collected: List[List[str]] = [[] for _ in range(self.size)]
+        for tag, tagged in self.tags.items():
+            for row in tagged:
+                collected[int(row)].append(tag)
+        return [tuple(collected[row]) for row in rows]
+
+    def kill(self, row: int):
+        if self.alive[row]:
+            self.alive[row] = False
+            self.dead += 1
+
+    def mask(self, category: Optional[int], tags: Optional[Sequence[str]]) -> Optional[np.ndarray]:
+        """
+        Rows passing the filters (tags match if the row has any of them),
+        or None when every row is alive and unfiltered
+        """
+        size = self.size
+        if category is None and not tags:
+            return self.alive[:size].copy() if self.dead else None
+        mask = self.alive[:size].copy()
+        if category is not None:
+            mask &= self.categories[:size] == category
+        if tags:
+            tagged = np.zeros(size, dtype=bool)
+            for tag in tags:
+                rows = self.tags.get(tag)
+                if rows is not None and len(rows):
+                    tagged[np.asarray(rows, dtype=np.int64)] = True
+            mask &= tagged
+        return mask
+
+    def prepare(self, query: np.ndarray):
+        """
+        The query as score_range and score_rows take it
+        """
+        return self.quantizer.prepare(query) if self.quantizer is not None else query
+
+    def score_range(self, prepared, start: int, end: int) -> np.ndarray:
+        if self.quantizer is not None:
+            return self.quantizer.scores(self.codes[start:end], prepared)
+        return self.vectors[start:end] @ prepared
+
+    def score_rows(self, prepared, rows: np.ndarray) -> np.ndarray:
+        if self.quantizer is not None:
+            return self.quantizer.scores(self.codes[rows], prepared)
+        return self.vectors[rows] @ prepared
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        category: Optional[int],
+        tags: Optional[Sequence[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        size = self.size
+        if not size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        fetch = k if self.quantizer is None else k * max(1, settings.KNOWLEDGE_RERANK_FACTOR)
+        prepared = self.prepare(query)
+        mask = self.mask(category, tags)
+        if mask is not None:
+            selected = int(np.count_nonzero(mask))
+            if not selected:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            if self.ann is None or selected <= EXACT_SEARCH_ROWS:
+                rows = np.flatnonzero(mask)
+                return self._rerank(*_top_k(rows, self.score_rows(prepared, rows), fetch), query, k)
+        if self.ann is not None:
+            return self._rerank(*self.ann.search(self, query, fetch, mask), query, k)
+        return self._rerank(*_top_k(np.arange(size), self.score_range(prepared, 0, size), fetch), query, k)
+
+    def _rerank(self, rows: np.ndarray, scores: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact scores for the candidates of a quantized search
+        """
+        if self.quantizer is None or not len(rows):
+            return rows, scores
+        # Sorted rows read mapped vectors in file order
+        rows = np.sort(rows)
+        return _top_k(rows, self.vectors[rows] @ query, k)
+
+    def lexical_search(
+        self,
+        weights: List[Tuple[str, float]],
+        average_length: float,
+        k: int,
+        category: Optional[int],
+        tags: Optional[Sequence[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows by BM25 for (term, idf) pairs
+        """
+        found_rows: List[np.ndarray] = []
+        found_scores: List[np.ndarray] = []
+        if self.lexical is not None and self.size:
+            for term, idf in weights:
+                postings = self.lexical.postings(term)
+                if postings is None:
+                    continue
+                rows, frequencies = np.asarray(postings[0]), postings[1]
+                lengths = self.lexical.lengths[rows]
+                found_rows.append(rows)
+                found_scores.append(idf * bm25_weights(
+                    frequencies, lengths, average_length, settings.KNOWLEDGE_BM25_K1, settings.KNOWLEDGE_BM25_B
+                ))
+        if not found_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows = np.concatenate(found_rows)
+        scores = np.concatenate(found_scores)
+        if len(found_rows) > 1:
+            rows, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores).astype(np.float32)
+        if category is None and not tags:
+            keep = self.alive[rows]
+        else:
+            keep = self.mask(category, tags)[rows]
+        return _top_k(rows[keep], scores[keep], k)
+
+class KnowledgeIndex:
+    """
+    Vector index for one tenant's knowledge base. Entries are identified by
+    KnowledgeBase.id; version increases on every change, and uid tells
+    index instances apart (a reopened snapshot starts again at version 0).
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.uid = next(_index_uids)
+        self.version = 0
+        self.base = _Segment(dim, capacity=0)
+        self.delta = _Segment(dim)
+        self.locations: Dict[str, Tuple[_Segment, int]] = {}
+        self.category_codes: Dict[Optional[str], int] = {None: 0}
+        self._removed_while_compacting: Optional[Set[str]] = None
+
+    def __len__(self) -> int:
+        return self.base.live + self.delta.live
+
+    @property
+    def kind(self) -> str:
+        return self.base.ann.kind if self.base.ann is not None else "flat"
+
+    def _category_code(self, category: Optional[str]) -> int:
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_codes)
+            self.category_codes[category] = code
+        return code
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        categories: Sequence[Optional[str]],
+        tags: Sequence[Sequence[str]],
+        texts: Optional[Sequence[str]] = None
+    ):
+        """
+        Add or replace entries; texts (see lexical_text) feed keyword search
+        """
+        texts = texts if texts is not None else [None] * len(ids)
+        for entry_id, vector, category, entry_tags, text in zip(ids, vectors, categories, tags, texts):
+            self._kill(entry_id)
+            row = self.delta.append(entry_id, vector, self._category_code(category), entry_tags, term_counts(text))
+            self.locations[entry_id] = (self.delta, row)
+        self.version += 1
+
+    def remove(self, ids: Sequence[str]):
+        for entry_id in ids:
+            self._kill(entry_id)
+            self.locations.pop(entry_id, None)
+        self.version += 1
+
+    def _kill(self, entry_id: str):
+        location = self.locations.get(entry_id)
+        if location is not None:
+            segment, row = location
+            segment.kill(row)
+        if self._removed_while_compacting is not None:
+            self._removed_while_compacting.add(entry_id)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        category: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, cosine similarity) for a unit-norm query vector
+        """
+        code = None
+        if category is not None:
+            code = self.category_codes.get(category)
+            if code is None:
+                return []
+        query = np.asarray(query, dtype=np.float32)
+        hits: List[Tuple[str, float]] = []
+        for segment in (self.base, self.delta):
+            rows, scores = segment.search(query, k, code, tags)
+            hits.extend((segment.ids[row], float(score)) for row, score in zip(rows, scores))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def lexical_search(
+        self,
+        query: str,
+        k: int,
+        category: Optional[str] = None,
+        tags: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, BM25 score) for a text query
+        """
+        code = None
+        if category is not None:
+            code = self.category_codes.get(category)
+            if code is None:
+                return []
+        terms = list(dict.fromkeys(tokenize(query)))
+        segments = [segment for segment in (self.base, self.delta) if segment.lexical is not None]
+        rows = sum(segment.size for segment in segments)
+        total_length = sum(segment.lexical.total_length for segment in segments)
+        if not terms or not rows or not total_length:
+            return []
+        df = np.array([sum(segment.lexical.df(term) for segment in segments) for term in terms], dtype=np.float64)
+        idf = bm25_idf(rows, df)
+        weights = [(term, float(weight)) for term, weight, count in zip(terms, idf, df) if count]
+        if not weights:
+            return []
+        hits: List[Tuple[str, float]] = []
+        for segment in segments:
+            found, scores = segment.lexical_search(weights, total_length / rows, k, code, tags)
+            hits.extend((segment.ids[row], float(score)) for row, score in zip(found, scores))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def needs_compaction(self) -> bool:
+        limit = max(settings.KNOWLEDGE_DELTA_MIN_ROWS, int(self.base.size * settings.KNOWLEDGE_DELTA_RATIO))
+        return self.delta.size >= limit or self.base.dead >= limit
+
+    def begin_compaction(self):
+        """
+        Snapshot the live rows to seal into a new base. Rows added after
+        this stay in the delta; removals are replayed by finish_compaction.
+        """
+        self._removed_while_compacting = set()
+        snapshot = []
+        for segment in (self.base, self.delta):
+            size = segment.size
+            live = np.flatnonzero(segment.alive[:size])
+            snapshot.append((segment, size, live))
+        return snapshot
+
+    def seal(self, snapshot) -> "_Segment":
+        """
+        Build a new base segment from a snapshot. Safe to run on a thread.
+        """
+        ids: List[str] = []
+        vectors: List[np.ndarray] = []
+        categories: List[np.ndarray] = []
+        row_tags: List[Tuple[str, ...]] = []
+        for segment, _, live in snapshot:
+            ids.extend(segment.ids[row] for row in live)
+            vectors.append(segment.vectors[live])
+            categories.append(segment.categories[live])
+            row_tags.extend(segment.tags_of(live))
+        lexical = merge_postings([(segment.lexical, size, live) for segment, size, live in snapshot])
+        return build_segment(
+            self.dim,
+            ids,
+            np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32),
+            np.concatenate(categories) if categories else np.empty(0, dtype=np.int32),
+            row_tags,
+            lexical
+        )
+
+    def abort_compaction(self):
+        self._removed_while_compacting = None
+
+    def finish_compaction(self, snapshot, base: "_Segment"):
+        """
+        Swap in the sealed base; rows added to the delta since the snapshot
+        move to a fresh delta
+        """
+        removed = self._removed_while_compacting or set()
+        self._removed_while_compacting = None
+        _, delta_size, _ = snapshot[1]
+        old_delta = self.delta
+
+        self.base = base
+        self.delta = _Segment(self.dim)
+        self.locations = {entry_id: (base, row) for row, entry_id in enumerate(base.ids)}
+        for entry_id in removed:
+            location = self.locations.pop(entry_id, None)
+            if location is not None:
+                base.kill(location[1])
+        for row in range(delta_size, old_delta.size):
+            if not old_delta.alive[row]:
+                continue
+            entry_id = old_delta.ids[row]
+            # A newer version of the entry replaces the sealed one
+            location = self.locations.get(entry_id)
+            if location is not None:
+                base.kill(location[1])
+            new_row = self.delta.append(
+                entry_id,
+                old_delta.vectors[row],
+                int(old_delta.categories[row]),
+                old_delta.row_tags[row],
+                old_delta.lexical.row_counts[row]
+            )
+            self.locations[entry_id] = (self.delta, new_row)
+        self.version += 1
+
+def build_segment(
+    dim: int,
+    ids: List[str],
+    vectors: np.ndarray,
+    categories: np.ndarray,
+    row_tags: List[Tuple[str, ...]],
+    lexical: Optional[LexicalPostings] = None
+) -> _Segment:
+    """
+    Seal rows into a base segment, adding an approximate index when there
+    are at least KNOWLEDGE_ANN_MIN_ROWS of them. For IVF the rows are
+    reordered by list. With KNOWLEDGE_QUANTIZATION, bases of at least
+    KNOWLEDGE_QUANT_MIN_ROWS rows are also quantized. lexical holds the
+    rows' BM25 postings, if any.
+    """
+    ann = None
+    size = len(ids)
+    backend = settings.KNOWLEDGE_ANN_BACKEND
+    if size >= settings.KNOWLEDGE_ANN_MIN_ROWS and backend != "flat":
+        if backend == "hnsw" or (backend == "auto" and faiss is not None):
+            if faiss is None:
+                logger.warning("KNOWLEDGE_ANN_BACKEND=hnsw needs faiss; falling back to IVF")
+            else:
+                ann = HNSWIndex.build(vectors, settings.KNOWLEDGE_HNSW_M, settings.KNOWLEDGE_HNSW_EF_SEARCH)
+        if ann is None:
+            nlist = max(1, int(np.sqrt(size)))
+            centroids = kmeans(vectors, nlist)
+            assignment = IVFIndex.assign(vectors, centroids)
+            order = np.argsort(assignment, kind="stable")
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist))))
+            ids = [ids[row] for row in order]
+            vectors = vectors[order]
+            categories = categories[order]
+            row_tags = [row_tags[row] for row in order]
+            if lexical is not None:
+                lexical = lexical.reorder(order)
+            ann = IVFIndex(centroids, offsets, settings.KNOWLEDGE_IVF_NPROBE)
+
+    quantizer = None
+    kind = settings.KNOWLEDGE_QUANTIZATION
+    # The faiss HNSW graph keeps its own float copy, so it isn't quantized
+    if kind != "none" and size >= settings.KNOWLEDGE_QUANT_MIN_ROWS and not isinstance(ann, HNSWIndex):
+        quantizer = train_quantizer(kind, vectors, settings.KNOWLEDGE_PQ_GROUPS or None)
+
+    segment = _Segment(dim, capacity=0)
+    segment.ids = ids
+    segment.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    segment.categories = np.asarray(categories, dtype=np.int32)
+    segment.alive = np.ones(size, dtype=bool)
+    segment.row_tags = row_tags
+    tags: Dict[str, List[int]] = defaultdict(list)
+    for row, entry_tags in enumerate(row_tags):
+        for tag in entry_tags:
+            tags[tag].append(row)
+    segment.tags = {tag: np.asarray(rows, dtype=np.int64) for tag, rows in tags.items()}
+    segment.ann = ann
+    if quantizer is not None:
+        segment.quantizer = quantizer
+        segment.codes = quantizer.encode(segment.vectors)
+    segment.lexical = lexical
+    return segment
+
+def build_index(
+    dim: int,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    categories: Sequence[Optional[str]],
+    tags: Sequence[Sequence[str]],
+    lexical: Optional[LexicalPostings] = None
+) -> KnowledgeIndex:
+    """
+    Build a sealed index in one go (initial load). Safe to run on a thread.
+    """
+    index = KnowledgeIndex(dim)
+    codes = np.fromiter((index._category_code(category) for category in categories), dtype=np.int32, count=len(ids))
+    index.base = build_segment(
+        dim, list(ids), vectors, codes, [tuple(entry_tags or ()) for entry_tags in tags], lexical
+    )
+    index.locations = {entry_id: (index.base, row) for row, entry_id in enumerate(index.base.ids)}
+    # Later duplicates of an id win
+    if len(index.locations) != index.base.size:
+        seen = set()
+        for row in range(index.base.size - 1, -1, -1):
+            entry_id = index.base.ids[row]
+            if entry_id in seen:
+                index.base.kill(row)
+            else:
+                seen.add(entry_id)
+                index.locations[entry_id] = (index.base, row)
+    return index
+
+def open_index(
+    dim: int,
+    ids: List[str],
+    vectors: np.ndarray,
+    categories: np.ndarray,
+    alive: np.ndarray,
+    tags: Dict[str, np.ndarray],
+    category_codes: Dict[Optional[str], int],
+    ann=None,
+    lexical: Optional[LexicalPostings] = None,
+    quantizer=None,
+    codes: Optional[np.ndarray] = None
+) -> KnowledgeIndex:
+    """
+    Index over an already sealed base, such as arrays mapped from a
+    snapshot. The arrays are used as given except alive, which is copied
+    because removals write to it.
+    """
+    index = KnowledgeIndex(dim)
+    base = _Segment(dim, capacity=0)
+    base.ids = ids
+    base.vectors = vectors
+    base.categories = categories
+    base.alive = np.array(alive, dtype=bool)
+    base.dead = len(ids) - int(np.count_nonzero(base.alive))
+    base.tags = tags
+    base.row_tags = None
+    base.ann = ann
+    base.quantizer = quantizer
+    base.codes = codes
+    base.lexical = lexical
+    index.base = base
+    index.category_codes = dict(category_codes)
+    if base.dead:
+        index.locations = {ids[row]: (base, row) for row in np.flatnonzero(base.alive).tolist()}
+    else:
+        index.locations = {entry_id: (base, row) for row, entry_id in enumerate(ids)}
+    return index
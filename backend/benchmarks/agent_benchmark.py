@@ -0,0 +1,481 @@
+"""
+Offline benchmark and replay harness for the sales agent.
+
+Runs leads through SalesAgent.run against a deterministic fake LLM and
+local stub SerpAPI/Clearbit servers, with no database, API keys or network
+access. Reports executions/sec, per-step latency percentiles and memory
+per execution, and writes the results as JSON for comparing runs.
+
+Usage (from backend/):
+
+    python -m benchmarks.agent_benchmark --executions 500 --concurrency 50
+    python -m benchmarks.agent_benchmark --leads leads.jsonl --output after.json --compare before.json
+
+Latency distributions are given as fixed:MS, uniform:LO:HI,
+normal:MEAN:SD or lognormal:MEDIAN:SIGMA (all in milliseconds).
+"""
+import argparse
+import asyncio
+import gc
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from app.core.config import settings
+from app.core.http_client import OutboundHTTPClient, ProviderConfig
+from app.agents.sales_agent.budget import BudgetManager
+from app.agents.sales_agent.company_cache import CompanyCache
+from app.agents.sales_agent.draft_batcher import DraftBatcher
+from app.agents.sales_agent.events import AgentEventBus
+from app.agents.sales_agent.graph import SalesAgent
+from app.agents.sales_agent.llm import LLMResult
+from app.agents.sales_agent.model_router import ModelRouter
+from app.agents.sales_agent.state import LeadSnapshot, initial_state
+from app.agents.sales_agent.verification import VerificationEngine
+from app.agents.sales_agent.near_duplicates import NearDuplicateIndex
+from app.services.knowledge import HashingEmbedder, KnowledgeRetriever
+
+Latency = Callable[[random.Random], float]
+
+def parse_latency(spec: str) -> Latency:
+    """
+    Parse a latency distribution spec into a sampler returning seconds
+    """
+    kind, *params = spec.split(":")
+    values = [float(param) / 1000 for param in params]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(params) == 2:
+        median, sigma = values[0], float(params[1])
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec}")
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+        "p99": _round(percentile(values, 99)),
+        "max": _round(max(values) if values else None)
+    }
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+class FakeLLM:
+    """
+    Deterministic stand-in for LLMClient. Output depends only on the
+    prompt, so runs are reproducible; latency is sampled from a
+    distribution plus a per-output-token cost.
+    """
+
+    def __init__(self, latency: Latency, ms_per_token: float, seed: int):
+        self.latency = latency
+        self.seconds_per_token = ms_per_token / 1000
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _draft(self, context: Dict[str, Any]) -> str:
+        lead = context.get("lead") or {}
+        research = (context.get("research") or {}).get("company_info") or {}
+        return (
+            f"Hi {lead.get('name') or 'there'},\n\n"
+            f"I've been following {lead.get('company') or 'your company'}'s work in "
+            f"{research.get('industry') or 'your market'} and thought our agents could "
+            "help your team book more qualified meetings.\n\n"
+            "Would a 15 minute call next week be useful?"
+        )
+
+    def _respond(self, messages: List[Dict[str, Any]], **kwargs) -> str:
+        payload = json.loads(next(message for message in reversed(messages) if message["role"] == "user")["content"])
+        if (kwargs.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({"drafts": [
+                {"id": lead["id"], "email": self._draft(lead)} for lead in payload.get("leads", [])
+            ]})
+        return self._draft(payload)
+
+    async def _call(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> LLMResult:
+        self.calls += 1
+        text = self._respond(messages, **kwargs)
+        tokens_input = sum(len(message["content"]) for message in messages) // 4
+        tokens_output = len(text) // 4
+        await asyncio.sleep(self.latency(self.rng) + tokens_output * self.seconds_per_token)
+        return LLMResult(text=text, model=model, tokens_input=tokens_input, tokens_output=tokens_output)
+
+    async def complete(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> LLMResult:
+        return await self._call(model, messages, **kwargs)
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], on_delta, **kwargs) -> LLMResult:
+        result = await self._call(model, messages, **kwargs)
+        on_delta(result.text)
+        return result
+
+class StubServer:
+    """
+    Minimal keep-alive HTTP/1.1 server answering GETs with canned JSON
+    after a sampled delay
+    """
+
+    def __init__(self, name: str, handler: Callable[[str, Dict[str, str]], Dict[str, Any]], latency: Latency, seed: int):
+        self.name = name
+        self.handler = handler
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                _, target, _ = request_line.decode("latin-1").split(" ", 2)
+                url = urlsplit(target)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+                self.requests += 1
+                await asyncio.sleep(self.latency(self.rng))
+                body = json.dumps(self.handler(url.path, params)).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+def serpapi_response(path: str, params: Dict[str, str]) -> Dict[str, Any]:
+    query = params.get("q", "")
+    return {
+        "knowledge_graph": {
+            "title": query.split(" ")[0] or "Company",
+            "type": "Software",
+            "description": f"{query} builds software for sales teams."
+        },
+        "organic_results": [
+            {"title": f"{query} result {index}", "link": f"https://example.com/{index}", "snippet": "Lorem ipsum " * 10}
+            for index in range(5)
+        ]
+    }
+
+def clearbit_response(path: str, params: Dict[str, str]) -> Dict[str, Any]:
+    domain = params.get("domain", "example.com")
+    return {
+        "name": domain.split(".")[0].title(),
+        "linkedin": {"handle": f"company/{domain.split('.')[0]}"},
+        "category": {"industry": "Software"},
+        "metrics": {"employees": 250},
+        "location": "San Francisco, CA, USA",
+        "timeZone": "America/Los_Angeles",
+        "tech": ["salesforce", "hubspot", "slack"]
+    }
+
+def synthetic_leads(count: int, domains: int, seed: int) -> List[LeadSnapshot]:
+    rng = random.Random(seed)
+    tenant_id = str(uuid.UUID(int=seed))
+    titles = ["VP Sales", "Head of Growth", "CRO", "Sales Director", "Founder"]
+    leads = []
+    for index in range(count):
+        company = f"company{rng.randrange(domains)}"
+        leads.append(LeadSnapshot(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            tenant_id=tenant_id,
+            email=f"lead{index}@{company}.com",
+            name=f"Lead {index}",
+            company=company.title(),
+            domain=f"{company}.com",
+            title=rng.choice(titles),
+            status="new",
+            source="benchmark"
+        ))
+    return leads
+
+def recorded_leads(path: str, count: Optional[int]) -> List[LeadSnapshot]:
+    """
+    Load leads from a JSON-lines file of lead objects (as returned by the
+    leads API); the list is cycled if count is larger than the file
+    """
+    with open(path) as handle:
+        leads = [LeadSnapshot.from_dict(json.loads(line)) for line in handle if line.strip()]
+    if not leads:
+        raise SystemExit(f"No leads in {path}")
+    if count is None:
+        return leads
+    return [leads[index % len(leads)] for index in range(count)]
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.leads:
+        leads = recorded_leads(args.leads, args.executions)
+    else:
+        leads = synthetic_leads(args.executions or 200, args.domains, args.seed)
+
+    serpapi = StubServer("serpapi", serpapi_response, args.research_latency, args.seed + 1)
+    clearbit = StubServer("clearbit", clearbit_response, args.enrichment_latency, args.seed + 2)
+    await serpapi.start()
+    await clearbit.start()
+
+    settings.AGENT_SPECULATIVE_DRAFT = args.speculative
+
+    # Tools only call providers when a key is configured
+    settings.SERPAPI_API_KEY = settings.SERPAPI_API_KEY or "benchmark"
+    settings.CLEARBIT_API_KEY = settings.CLEARBIT_API_KEY or "benchmark"
+    unlimited = 1_000_000
+    http = OutboundHTTPClient({
+        stub.name: ProviderConfig(
+            name=stub.name,
+            base_url=stub.base_url,
+            rate_per_second=unlimited,
+            burst=unlimited,
+            tenant_rate_per_second=unlimited,
+            tenant_burst=unlimited,
+            max_connections=settings.OUTBOUND_MAX_CONNECTIONS
+        )
+        for stub in (serpapi, clearbit)
+    })
+
+    verification = VerificationEngine.from_settings()
+    llm = FakeLLM(args.llm_latency, args.llm_ms_per_token, args.seed + 3)
+    router = ModelRouter(
+        primary=settings.PRIMARY_MODEL,
+        fallback=settings.FALLBACK_MODEL,
+        hedge_delay_ms=settings.MODEL_HEDGE_DELAY_MS
+    )
+    agent = SalesAgent(
+        company_cache=CompanyCache(session_factory=None),
+        llm=llm,
+        model_router=router,
+        events=AgentEventBus(),
+        budget=BudgetManager(),
+        draft_batcher=DraftBatcher(
+            llm, router, settings.AGENT_DRAFT_BATCH_SIZE, settings.AGENT_DRAFT_BATCH_WAIT_MS / 1000
+        ),
+        http=http,
+        verification=verification,
+        near_duplicates=NearDuplicateIndex(session_factory=None),
+        knowledge=KnowledgeRetriever(session_factory=None, embedder=HashingEmbedder())
+    )
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    step_durations: Dict[str, List[float]] = defaultdict(list)
+    cache_statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    totals: List[float] = []
+    tokens = 0
+    cost_cents = 0.0
+    failures = 0
+    speculation: Dict[str, int] = defaultdict(int)
+    wasted_tokens = 0
+
+    async def run_one(lead: LeadSnapshot, record: bool):
+        nonlocal tokens, cost_cents, failures, wasted_tokens
+        async with semaphore:
+            state = initial_state(
+                str(uuid.uuid4()), lead, user_id="benchmark", tenant_id=lead.tenant_id,
+                priority=args.priority
+            )
+            started = time.perf_counter()
+            try:
+                result = await agent.run(state)
+            except Exception:
+                failures += 1
+                return
+            elapsed = (time.perf_counter() - started) * 1000
+        if not record:
+            return
+        totals.append(elapsed)
+        tokens += result.get("tokens_used", 0)
+        cost_cents += result.get("cost_cents", 0)
+        for step in result.get("step_history", []):
+            if "speculative" in step:
+                speculation[step["speculative"]["outcome"]] += 1
+                wasted_tokens += step["speculative"]["wasted_tokens"]
+            if "duration_ms" in step:
+                step_durations[step["step"]].append(step["duration_ms"])
+            if "cache" in step:
+                cache_statuses[step["step"]][step["cache"]] += 1
+
+    try:
+        if args.warmup:
+            await asyncio.gather(*[run_one(lead, False) for lead in leads[:args.warmup]])
+
+        gc.collect()
+        if args.memory:
+            tracemalloc.start()
+            baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        await asyncio.gather(*[run_one(lead, True) for lead in leads])
+        wall = time.perf_counter() - started
+        if args.memory:
+            gc.collect()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        await http.aclose()
+        verification.shutdown()
+        await serpapi.stop()
+        await clearbit.stop()
+
+    executions = len(totals)
+    results = {
+        "benchmark": "agent",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "executions": len(leads),
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "priority": args.priority,
+            "speculative": args.speculative,
+            "domains": None if args.leads else args.domains,
+            "leads_file": args.leads,
+            "seed": args.seed,
+            "llm_latency": args.llm_latency_spec,
+            "llm_ms_per_token": args.llm_ms_per_token,
+            "research_latency": args.research_latency_spec,
+            "enrichment_latency": args.enrichment_latency_spec
+        },
+        "wall_seconds": round(wall, 3),
+        "executions_per_second": round(executions / wall, 3) if wall else None,
+        "failures": failures,
+        "latency_ms": {
+            "total": summarize(totals),
+            "steps": {step: summarize(values) for step, values in step_durations.items()}
+        },
+        "cache": {step: dict(statuses) for step, statuses in cache_statuses.items()},
+        "upstream_requests": {
+            "llm": llm.calls,
+            "serpapi": serpapi.requests,
+            "clearbit": clearbit.requests
+        },
+        "speculation": {"outcomes": dict(speculation), "wasted_tokens": wasted_tokens},
+        "tokens_per_execution": round(tokens / executions, 1) if executions else None,
+        "cost_cents_per_execution": round(cost_cents / executions, 5) if executions else None
+    }
+    if args.memory:
+        results["memory"] = {
+            "peak_bytes": peak - baseline,
+            "peak_bytes_per_concurrent_execution": int((peak - baseline) / max(1, min(args.concurrency, executions))),
+            "retained_bytes_per_execution": int((retained - baseline) / executions) if executions else None
+        }
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Relative change of the headline numbers against a previous run
+    """
+    def change(current, previous):
+        if current is None or not previous:
+            return "n/a"
+        return f"{(current - previous) / previous * 100:+.1f}%"
+
+    lines = [
+        f"executions/sec: {baseline.get('executions_per_second')} -> {results['executions_per_second']} "
+        f"({change(results['executions_per_second'], baseline.get('executions_per_second'))})"
+    ]
+    previous_latency = baseline.get("latency_ms", {})
+    current_latency = results["latency_ms"]
+    rows = [("total", current_latency["total"], previous_latency.get("total", {}))]
+    rows += [
+        (step, summary, previous_latency.get("steps", {}).get(step, {}))
+        for step, summary in current_latency["steps"].items()
+    ]
+    for name, current, previous in rows:
+        lines.append(
+            f"{name} p95 ms: {previous.get('p95')} -> {current['p95']} ({change(current['p95'], previous.get('p95'))})"
+        )
+    return lines
+
+def print_report(results: Dict[str, Any]):
+    print(f"{results['config']['executions']} executions in {results['wall_seconds']}s "
+          f"({results['executions_per_second']} executions/sec, {results['failures']} failures)")
+    print(f"{'step':<16}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = [("total", results["latency_ms"]["total"])] + list(results["latency_ms"]["steps"].items())
+    for name, summary in rows:
+        print(f"{name:<16}" + "".join(f"{summary[key] if summary[key] is not None else '-':>10}" for key in ("p50", "p95", "p99", "max")))
+    print(f"cache: {json.dumps(results['cache'])}")
+    print(f"upstream requests: {json.dumps(results['upstream_requests'])}")
+    if "memory" in results:
+        memory = results["memory"]
+        print(f"memory: {memory['peak_bytes_per_concurrent_execution'] / 1024:.1f} KiB peak and "
+              f"{(memory['retained_bytes_per_execution'] or 0) / 1024:.1f} KiB retained per execution")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the sales agent against fake upstreams")
+    parser.add_argument("--executions", type=int, default=None, help="Executions to measure (default 200, or every lead in --leads)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=0, help="Unmeasured executions run first")
+    parser.add_argument("--leads", help="JSON-lines file of recorded leads to replay")
+    parser.add_argument("--domains", type=int, default=50, help="Distinct company domains among synthetic leads")
+    parser.add_argument("--priority", choices=("interactive", "bulk"), default="interactive")
+    parser.add_argument("--speculative", action="store_true", help="Start drafts before research finishes")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.4")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--research-latency", default="lognormal:250:0.5")
+    parser.add_argument("--enrichment-latency", default="lognormal:150:0.5")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip tracemalloc (it slows runs down)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    for name in ("llm_latency", "research_latency", "enrichment_latency"):
+        spec = getattr(args, name)
+        setattr(args, f"{name}_spec", spec)
+        setattr(args, name, parse_latency(spec))
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    print_report(results)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            for line in compare(results, json.load(handle)):
+                print(line)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,275 @@
+"""
+Relevance and latency benchmark for hybrid knowledge search.
+
+Builds a tenant index from a synthetic product catalogue: each document
+has a SKU, a product family with its wording, and a few rarer feature
+terms. Three kinds of queries each have one target document:
+
+- sku: an exact SKU lookup
+- keyword: some of the target's feature terms, verbatim
+- paraphrase: the same features under other names, which BM25 can't match
+
+Vector-only, BM25-only and hybrid (reciprocal rank fusion) rankings are
+compared on recall@k, MRR and p50/p99 latency. Writes the results as JSON.
+
+Documents are embedded with ConceptEmbedder, a stand-in for a semantic
+model: a feature and its paraphrase share a direction, and SKUs carry
+little weight, as identifiers do in real embeddings.
+
+Usage (from backend/):
+
+    python -m benchmarks.hybrid_search_benchmark --docs 50000 --queries 600
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.knowledge import build_index, lexical_text, reciprocal_rank_fusion
+from app.services.knowledge.embeddings import normalize_rows, tokenize
+from app.services.knowledge.lexical import LexicalBuilder, term_counts
+from benchmarks.verification_benchmark import percentile
+
+FAMILIES = {
+    "router": "router wifi mesh throughput latency antenna firmware band roaming",
+    "switch": "switch ethernet port vlan uplink poe backplane stacking managed",
+    "camera": "camera lens resolution night vision motion storage footage",
+    "sensor": "sensor temperature humidity battery telemetry wireless calibration alert",
+    "printer": "printer toner duplex page tray resolution network scanning",
+    "laptop": "laptop battery screen keyboard memory processor weight warranty",
+    "headset": "headset microphone noise cancellation bluetooth comfort call audio",
+    "storage": "storage drive raid capacity backup snapshot encryption throughput"
+}
+FILLER = (
+    "the our your with for and includes supports designed built customers team teams "
+    "reliable simple fast secure setup support service plan price model series new "
+    "what does how which cost need"
+).split()
+CATEGORIES = ["product", "pricing", "faq", "security"]
+# Feature terms per document, drawn from this many
+FEATURES = 5000
+FEATURES_PER_DOC = 8
+QUERY_KINDS = ("sku", "keyword", "paraphrase")
+
+class ConceptEmbedder:
+    """
+    Sums a direction per concept: feature<n> and its paraphrase alias<n>
+    share one, family words share their family's, filler is faint noise
+    and SKUs get a weak direction of their own
+    """
+
+    def __init__(self, dim: int, seed: int):
+        self.dim = dim
+        self.seed = seed
+        self.family_of = {word: family for family, words in FAMILIES.items() for word in words.split()}
+        self.cache: Dict[str, np.ndarray] = {}
+
+    def _direction(self, key: str, scale: float) -> np.ndarray:
+        rng = np.random.default_rng([self.seed, zlib.crc32(key.encode("utf-8"))])
+        return rng.standard_normal(self.dim).astype(np.float32) * (scale / np.sqrt(self.dim))
+
+    def vector(self, token: str) -> np.ndarray:
+        cached = self.cache.get(token)
+        if cached is not None:
+            return cached
+        if token.startswith(("feature", "alias")) and token.lstrip("featurealias").isdigit():
+            vector = self._direction("concept" + token.lstrip("featurealias"), 1.0)
+        elif token in self.family_of:
+            vector = self._direction(self.family_of[token], 0.5) + self._direction(token, 0.2)
+        elif "-" in token:
+            vector = self._direction(token, 0.3)
+        else:
+            vector = self._direction(token, 0.1)
+        self.cache[token] = vector
+        return vector
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row] += self.vector(token)
+        return normalize_rows(vectors)
+
+def synthetic_catalogue(rng: np.random.Generator, docs: int) -> List[Dict[str, Any]]:
+    families = list(FAMILIES)
+    catalogue = []
+    for row in range(docs):
+        family = families[rng.integers(0, len(families))]
+        words = FAMILIES[family].split()
+        sku = f"{family[:2]}-{row:06d}"
+        features = [int(value) for value in rng.integers(0, FEATURES, FEATURES_PER_DOC)]
+        body = [words[value] for value in rng.integers(0, len(words), 25)]
+        body += [FILLER[value] for value in rng.integers(0, len(FILLER), 40)]
+        body += [f"feature{value}" for value in features]
+        rng.shuffle(body)
+        catalogue.append({
+            "id": str(row),
+            "title": f"{family.title()} {sku}",
+            "content": f"Model {sku}. " + " ".join(body),
+            "category": CATEGORIES[rng.integers(0, len(CATEGORIES))],
+            "sku": sku,
+            "family": family,
+            "features": features
+        })
+    return catalogue
+
+def synthetic_queries(rng: np.random.Generator, catalogue: List[Dict[str, Any]], count: int) -> List[Tuple[str, str, str]]:
+    """
+    (kind, query, target id), cycling through QUERY_KINDS
+    """
+    queries = []
+    for number in range(count):
+        document = catalogue[rng.integers(0, len(catalogue))]
+        kind = QUERY_KINDS[number % len(QUERY_KINDS)]
+        if kind == "sku":
+            queries.append((kind, f"what does {document['sku']} cost", document["id"]))
+            continue
+        features = [document["features"][value] for value in rng.choice(FEATURES_PER_DOC, 4, replace=False)]
+        prefix = "feature" if kind == "keyword" else "alias"
+        words = FAMILIES[document["family"]].split()
+        picked = [words[value] for value in rng.choice(len(words), 2, replace=False)]
+        text = " ".join([f"{prefix}{feature}" for feature in features] + picked)
+        queries.append((kind, f"{document['family']} with {text}", document["id"]))
+    return queries
+
+def run_mode(
+    search: Callable[[str, np.ndarray], List[Tuple[str, float]]],
+    queries: List[Tuple[str, str, str]],
+    vectors: np.ndarray,
+    k: int
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for kind in QUERY_KINDS:
+        latencies = []
+        found = 0
+        reciprocal = 0.0
+        selected = [(query, target, vector) for (query_kind, query, target), vector in zip(queries, vectors) if query_kind == kind]
+        for query, target, vector in selected:
+            started = time.perf_counter()
+            hits = search(query, vector)[:k]
+            latencies.append((time.perf_counter() - started) * 1000)
+            ranked = [entry_id for entry_id, _ in hits]
+            if target in ranked:
+                found += 1
+                reciprocal += 1.0 / (ranked.index(target) + 1)
+        total = len(selected) or 1
+        results[kind] = {
+            "queries": len(selected),
+            f"recall_at_{k}": round(found / total, 4),
+            "mrr": round(reciprocal / total, 4),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3)
+        }
+    return results
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    settings.KNOWLEDGE_ANN_BACKEND = args.backend
+    embedder = ConceptEmbedder(args.dim, args.seed)
+    catalogue = synthetic_catalogue(rng, args.docs)
+    queries = synthetic_queries(rng, catalogue, args.queries)
+
+    texts = [lexical_text(document["title"], document["content"]) for document in catalogue]
+    vectors = embedder.embed(texts)
+    query_vectors = embedder.embed([query for _, query, _ in queries])
+
+    started = time.perf_counter()
+    builder = LexicalBuilder()
+    for text in texts:
+        builder.add(term_counts(text))
+    lexical = builder.build()
+    lexical_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = build_index(
+        args.dim,
+        [document["id"] for document in catalogue],
+        vectors,
+        [document["category"] for document in catalogue],
+        [[document["family"]] for document in catalogue],
+        lexical
+    )
+    build_seconds = time.perf_counter() - started
+
+    def vector_search(query: str, vector: np.ndarray) -> List[Tuple[str, float]]:
+        return index.search(vector, args.k)
+
+    def lexical_search(query: str, vector: np.ndarray) -> List[Tuple[str, float]]:
+        return index.lexical_search(query, args.k)
+
+    def hybrid_search(query: str, vector: np.ndarray) -> List[Tuple[str, float]]:
+        depth = max(args.k, args.depth)
+        return reciprocal_rank_fusion(
+            [index.search(vector, depth), index.lexical_search(query, depth)], args.rrf_k
+        )
+
+    modes = {"vector": vector_search, "lexical": lexical_search, "hybrid": hybrid_search}
+    return {
+        "benchmark": "hybrid_search",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "docs": args.docs,
+            "dim": args.dim,
+            "queries": args.queries,
+            "k": args.k,
+            "depth": args.depth,
+            "rrf_k": args.rrf_k,
+            "backend": args.backend,
+            "seed": args.seed
+        },
+        "index": {
+            "kind": index.kind,
+            "build_seconds": round(build_seconds, 2),
+            "lexical_build_seconds": round(lexical_seconds, 2),
+            "terms": len(lexical.term_list),
+            "postings": int(len(lexical.rows)),
+            "postings_bytes": int(lexical.rows.nbytes + lexical.frequencies.nbytes + lexical.offsets.nbytes)
+        },
+        "modes": {name: run_mode(search, queries, query_vectors, args.k) for name, search in modes.items()}
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark hybrid BM25 and vector knowledge search")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=600)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=50, help="Candidates per ranking fused in hybrid mode")
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--backend", default="flat", help="Vector index backend: flat, ivf or hnsw")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+
+    recall = f"recall_at_{args.k}"
+    print(f"{'mode':<9}{'query':<11}{'recall':>8}{'mrr':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for name, mode in results["modes"].items():
+        for kind, result in mode.items():
+            print(
+                f"{name:<9}{kind:<11}{result[recall]:>8}{result['mrr']:>8}"
+                f"{result['p50_ms']:>9}{result['p99_ms']:>9}"
+            )
+    index = results["index"]
+    print(
+        f"index {index['kind']}: build {index['build_seconds']}s, lexical {index['lexical_build_seconds']}s, "
+        f"{index['terms']} terms, {index['postings']} postings ({index['postings_bytes']} bytes)"
+    )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
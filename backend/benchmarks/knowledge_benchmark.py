@@ -0,0 +1,230 @@
+"""
+Latency and recall benchmark for the knowledge base vector index.
+
+Builds a tenant index from synthetic clustered embeddings with each ANN
+backend (flat, IVF, and HNSW when faiss is installed) and, for flat and
+IVF, each quantization (none, int8, pq), then reports build time, the
+bytes scanned per row set (float vectors or codes), query latency with
+and without filters, and recall@k against exact search. With --snapshot-dir each index is also written as a snapshot and
+opened again, timing what a worker pays at startup. Writes the results as
+JSON.
+
+Usage (from backend/):
+
+    python -m benchmarks.knowledge_benchmark --rows 1000000 --dim 384 --queries 500
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.knowledge import SnapshotStore, build_index
+from app.services.knowledge.vector_index import faiss
+from benchmarks.verification_benchmark import percentile
+
+CATEGORIES = ["case_study", "pricing", "product", "security", "faq"]
+TAGS = ["enterprise", "smb", "healthcare", "fintech", "retail", "emea", "apac"]
+
+def synthetic_vectors(rng: np.random.Generator, rows: int, dim: int, clusters: int, noise: float) -> np.ndarray:
+    """
+    Unit vectors scattered around random cluster centers, generated in
+    chunks to keep peak memory near the size of the result
+    """
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 65536):
+        end = min(rows, start + 65536)
+        chunk = centers[rng.integers(0, clusters, end - start)]
+        chunk += rng.standard_normal((end - start, dim)).astype(np.float32) * (noise / np.sqrt(dim))
+        vectors[start:end] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return vectors
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[str]:
+    if rows is None:
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [str(row) for row in top[np.argsort(-scores[top])]]
+    scores = vectors[rows] @ query
+    top = np.argsort(-scores)[:k]
+    return [str(rows[row]) for row in top]
+
+def run_backend(
+    backend: str,
+    quantization: str,
+    args: argparse.Namespace,
+    vectors: np.ndarray,
+    categories: List[str],
+    tags: List[List[str]],
+    queries: np.ndarray,
+    truth: List[List[str]],
+    filtered_truth: List[List[str]]
+) -> Dict[str, Any]:
+    settings.KNOWLEDGE_ANN_BACKEND = backend
+    settings.KNOWLEDGE_ANN_MIN_ROWS = args.ann_min_rows
+    settings.KNOWLEDGE_IVF_NPROBE = args.nprobe
+    settings.KNOWLEDGE_QUANTIZATION = quantization
+    settings.KNOWLEDGE_QUANT_MIN_ROWS = args.ann_min_rows
+    settings.KNOWLEDGE_PQ_GROUPS = args.pq_groups
+    settings.KNOWLEDGE_RERANK_FACTOR = args.rerank_factor
+
+    started = time.perf_counter()
+    index = build_index(args.dim, [str(row) for row in range(len(vectors))], vectors, categories, tags)
+    build_seconds = time.perf_counter() - started
+
+    def measure(filtered: bool, expected: List[List[str]]) -> Dict[str, Any]:
+        latencies = []
+        recalled = 0
+        for query, want in zip(queries, expected):
+            started = time.perf_counter()
+            if filtered:
+                hits = index.search(query, args.k, category=args.filter_category, tags=[args.filter_tag])
+            else:
+                hits = index.search(query, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalled += len({entry_id for entry_id, _ in hits} & set(want))
+        total = sum(len(want) for want in expected) or 1
+        return {
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "recall": round(recalled / total, 4)
+        }
+
+    base = index.base
+    result = {
+        "backend": backend,
+        "index": index.kind,
+        "quantization": base.quantizer.kind if base.quantizer is not None else "none",
+        "build_seconds": round(build_seconds, 2),
+        "vector_bytes": int(base.vectors.nbytes),
+        "scanned_bytes": int(base.codes.nbytes if base.codes is not None else base.vectors.nbytes),
+        "unfiltered": measure(False, truth),
+        "filtered": measure(True, filtered_truth)
+    }
+
+    if args.snapshot_dir:
+        store = SnapshotStore(args.snapshot_dir, keep=1)
+        tenant_id = f"benchmark-{backend}-{quantization}"
+        started = time.perf_counter()
+        store.write(tenant_id, index, "benchmark", set())
+        write_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        index, _, _ = store.open(tenant_id, args.dim, "benchmark")
+        open_seconds = time.perf_counter() - started
+        result["snapshot"] = {
+            "write_seconds": round(write_seconds, 3),
+            "open_seconds": round(open_seconds, 3),
+            "unfiltered": measure(False, truth)
+        }
+        shutil.rmtree(os.path.join(args.snapshot_dir, tenant_id), ignore_errors=True)
+    return result
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_vectors(rng, args.rows, args.dim, args.clusters, args.noise)
+    categories = [CATEGORIES[value] for value in rng.integers(0, len(CATEGORIES), args.rows)]
+    tags = [[TAGS[value]] for value in rng.integers(0, len(TAGS), args.rows)]
+
+    # Queries are perturbed copies of indexed rows, like a lead resembling collateral
+    sources = rng.integers(0, args.rows, args.queries)
+    queries = vectors[sources] + rng.standard_normal((args.queries, args.dim)).astype(np.float32) * (args.noise / np.sqrt(args.dim))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    truth = [exact_top_k(vectors, query, args.k) for query in queries]
+    matching = np.flatnonzero(
+        (np.array(categories) == args.filter_category) & np.array([args.filter_tag in row for row in tags])
+    )
+    filtered_truth = [exact_top_k(vectors, query, args.k, matching) for query in queries]
+
+    backends = args.backends or (["flat", "ivf"] + (["hnsw"] if faiss is not None else []))
+    runs = [
+        run_backend(backend, quantization, args, vectors, categories, tags, queries, truth, filtered_truth)
+        for backend in backends
+        for quantization in (args.quantizations if backend != "hnsw" else ["none"])
+    ]
+
+    return {
+        "benchmark": "knowledge_index",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "faiss": faiss is not None,
+        "config": {
+            "rows": args.rows,
+            "dim": args.dim,
+            "clusters": args.clusters,
+            "noise": args.noise,
+            "queries": args.queries,
+            "k": args.k,
+            "nprobe": args.nprobe,
+            "pq_groups": args.pq_groups or args.dim // 4,
+            "rerank_factor": args.rerank_factor,
+            "filter": {"category": args.filter_category, "tag": args.filter_tag, "rows": int(len(matching))},
+            "seed": args.seed
+        },
+        "runs": runs
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the knowledge base vector index")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="Topic clusters in the synthetic data")
+    parser.add_argument("--noise", type=float, default=0.6, help="Spread of rows around their cluster")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--ann-min-rows", type=int, default=50000)
+    parser.add_argument("--backends", type=lambda value: value.split(","), help="Comma-separated: flat,ivf,hnsw")
+    parser.add_argument(
+        "--quantizations",
+        type=lambda value: value.split(","),
+        default=["none", "int8", "pq"],
+        help="Comma-separated: none,int8,pq (not applied to hnsw)"
+    )
+    parser.add_argument("--pq-groups", type=int, default=0, help="Product quantizer groups; 0 for dim / 4")
+    parser.add_argument("--rerank-factor", type=int, default=8, help="Quantized candidates re-ranked per result")
+    parser.add_argument("--filter-category", default="case_study")
+    parser.add_argument("--filter-tag", default="fintech")
+    parser.add_argument("--snapshot-dir", help="Also time writing and opening a snapshot in this directory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = run_benchmark(args)
+
+    print(
+        f"{'backend':<8}{'quant':<6}{'scan MB':>9}{'build s':>9}{'p50 ms':>9}{'p99 ms':>9}{'recall':>8}"
+        f"{'filt p99':>10}{'filt rec':>10}"
+    )
+    for run in results["runs"]:
+        print(
+            f"{run['index']:<8}{run['quantization']:<6}{run['scanned_bytes'] / 2 ** 20:>9.1f}"
+            f"{run['build_seconds']:>9}{run['unfiltered']['p50_ms']:>9}"
+            f"{run['unfiltered']['p99_ms']:>9}{run['unfiltered']['recall']:>8}"
+            f"{run['filtered']['p99_ms']:>10}{run['filtered']['recall']:>10}"
+        )
+
+    for run in results["runs"]:
+        if "snapshot" in run:
+            snapshot = run["snapshot"]
+            print(
+                f"{run['index']}/{run['quantization']} snapshot: write {snapshot['write_seconds']}s, open {snapshot['open_seconds']}s, "
+                f"p99 {snapshot['unfiltered']['p99_ms']} ms, recall {snapshot['unfiltered']['recall']}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
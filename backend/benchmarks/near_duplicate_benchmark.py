@@ -0,0 +1,136 @@
+"""
+Latency and recall benchmark for the near-duplicate outreach index.
+
+Fills an in-process index with synthetic emails spread over a number of
+domains, a share of them lightly edited copies of a few templates, then
+times check() (hash + LSH lookup) at each index size. Recall is measured
+on edited copies of emails already indexed for the same domain.
+
+Usage (from backend/):
+
+    python -m benchmarks.near_duplicate_benchmark --sizes 1000,10000,100000 --domains 500
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.agents.sales_agent.near_duplicates import NearDuplicateIndex
+from benchmarks.verification_benchmark import percentile, synthetic_email
+
+TENANT_ID = "00000000-0000-0000-0000-000000000001"
+
+def edit(rng: random.Random, text: str, ratio: float) -> str:
+    """
+    Replace about ratio of the words, like a personalized template
+    """
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * ratio)):
+        words[index] = rng.choice(("Alex", "Acme", "Q3", "demo", "Tuesday", "pipeline"))
+    return " ".join(words)
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    templates = [synthetic_email(rng, args.words) for _ in range(args.templates)]
+    domains = [f"company{index}.com" for index in range(args.domains)]
+    index = NearDuplicateIndex(session_factory=None, threshold=args.threshold)
+
+    runs = []
+    indexed: List[Dict[str, str]] = []
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        while len(indexed) < size:
+            if rng.random() < args.template_share:
+                text = edit(rng, rng.choice(templates), args.edit_ratio)
+            else:
+                text = synthetic_email(rng, args.words)
+            item = {"domain": rng.choice(domains), "text": text}
+            await index.add(TENANT_ID, item["domain"], text, source="draft", source_id=str(len(indexed)))
+            indexed.append(item)
+        add_seconds = time.perf_counter() - started
+
+        latencies = []
+        unique_hits = 0
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            result = await index.check(TENANT_ID, rng.choice(domains), synthetic_email(rng, args.words))
+            latencies.append((time.perf_counter() - started) * 1000)
+            unique_hits += result["duplicate"]
+
+        recalled = 0
+        for _ in range(args.queries):
+            item = rng.choice(indexed)
+            started = time.perf_counter()
+            result = await index.check(TENANT_ID, item["domain"], edit(rng, item["text"], args.query_edit_ratio))
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalled += result["duplicate"]
+
+        runs.append({
+            "size": size,
+            "add_per_second": round(len(indexed) / add_seconds, 1) if add_seconds else None,
+            "check_ms": {
+                "p50": round(percentile(latencies, 50), 4),
+                "p99": round(percentile(latencies, 99), 4),
+                "max": round(max(latencies), 4)
+            },
+            "recall": round(recalled / args.queries, 4),
+            "false_positive_rate": round(unique_hits / args.queries, 4)
+        })
+
+    return {
+        "benchmark": "near_duplicates",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "domains": args.domains,
+            "words": args.words,
+            "templates": args.templates,
+            "template_share": args.template_share,
+            "edit_ratio": args.edit_ratio,
+            "query_edit_ratio": args.query_edit_ratio,
+            "threshold": args.threshold,
+            "queries": args.queries,
+            "seed": args.seed
+        },
+        "runs": runs
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate outreach index")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Index sizes to measure at")
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--words", type=int, default=120, help="Words per email")
+    parser.add_argument("--templates", type=int, default=5)
+    parser.add_argument("--template-share", type=float, default=0.5, help="Share of emails copied from a template")
+    parser.add_argument("--edit-ratio", type=float, default=0.1, help="Words replaced in template copies")
+    parser.add_argument("--query-edit-ratio", type=float, default=0.02, help="Words replaced in recall queries")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"{'size':>10}{'adds/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'recall':>10}{'false +':>10}")
+    for run in results["runs"]:
+        print(
+            f"{run['size']:>10}{run['add_per_second']:>12}{run['check_ms']['p50']:>10}"
+            f"{run['check_ms']['p99']:>10}{run['recall']:>10}{run['false_positive_rate']:>10}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,170 @@
+"""
+Throughput benchmark for draft verification checks.
+
+Verifies synthetic drafts (each compared against earlier emails) inline
+on the event loop, on a thread, and on the process pool at several batch
+sizes. Reports emails/sec and how long the event loop was blocked, and
+writes the results as JSON.
+
+Usage (from backend/):
+
+    python -m benchmarks.verification_benchmark --emails 2000 --workers 4 --batch-sizes 1,8,32
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.agents.sales_agent.checks import verify_batch
+from app.agents.sales_agent.verification import VerificationEngine
+
+WORDS = (
+    "team pipeline revenue quarter growth outreach meeting platform customers "
+    "insight data workflow sales reps automate personalized follow up calendar "
+    "free guarantee results week call schedule integrate crm forecast"
+).split()
+
+def synthetic_email(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        words -= length
+    if rng.random() < 0.2:
+        sentences.append("See https://bit.ly/demo or call 415-555-0100.")
+    return " ".join(sentences)
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def measure(name: str, items: List[Dict[str, Any]], verify, concurrency: int) -> Dict[str, Any]:
+    """
+    Verify every item with at most concurrency in flight, while a 1ms
+    ticker measures event loop lag
+    """
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        interval = 0.001
+        while not stop.is_set():
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(item):
+        async with semaphore:
+            await verify(item)
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*[run_one(item) for item in items])
+    wall = time.perf_counter() - started
+    stop.set()
+    await ticking
+
+    return {
+        "mode": name,
+        "wall_seconds": round(wall, 3),
+        "emails_per_second": round(len(items) / wall, 1),
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) or 0, 3),
+            "p99": round(percentile(lags, 99) or 0, 3),
+            "max": round(max(lags) if lags else 0, 3)
+        }
+    }
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    items = [
+        {
+            "text": synthetic_email(rng, args.words),
+            "previous": [synthetic_email(rng, args.words) for _ in range(args.previous)]
+        }
+        for _ in range(args.emails)
+    ]
+
+    async def inline(item):
+        verify_batch([item])
+
+    runs = [await measure("inline", items, inline, args.concurrency)]
+
+    thread_engine = VerificationEngine(workers=0, max_batch=max(args.batch_sizes), max_wait=args.batch_wait_ms / 1000)
+    runs.append(await measure(
+        "thread", items,
+        lambda item: thread_engine.verify(item["text"], item["previous"]),
+        args.concurrency
+    ))
+
+    for batch_size in args.batch_sizes:
+        engine = VerificationEngine(workers=args.workers, max_batch=batch_size, max_wait=args.batch_wait_ms / 1000)
+        try:
+            # Start the workers before timing
+            await engine.verify("warm up")
+            result = await measure(
+                f"process(batch={batch_size})", items,
+                lambda item: engine.verify(item["text"], item["previous"]),
+                args.concurrency
+            )
+        finally:
+            engine.shutdown()
+        result["batch_size"] = batch_size
+        runs.append(result)
+
+    return {
+        "benchmark": "verification",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "emails": args.emails,
+            "words": args.words,
+            "previous": args.previous,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "batch_wait_ms": args.batch_wait_ms,
+            "seed": args.seed
+        },
+        "runs": runs
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark draft verification checks")
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=120, help="Words per email")
+    parser.add_argument("--previous", type=int, default=20, help="Earlier emails compared per draft")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--concurrency", type=int, default=64, help="Drafts in flight at once")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--batch-wait-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+    args.batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"{'mode':<20}{'emails/sec':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+    for run in results["runs"]:
+        print(f"{run['mode']:<20}{run['emails_per_second']:>12}{run['loop_lag_ms']['p99']:>12}{run['loop_lag_ms']['max']:>12}")
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,13 @@
+from app.services.customer.agent_service import merge_enrichment
+
+def test_stand_in_enrichment_is_not_merged():
+    assert merge_enrichment({"timezone": "Europe/Berlin"}, {"linkedin_url": "https://linkedin.com/company/test"}) is None
+    assert merge_enrichment({"timezone": "Europe/Berlin"}, {}) is None
+    assert merge_enrichment(None, None) is None
+
+def test_empty_fields_keep_the_lead_value():
+    merged = merge_enrichment(
+        {"timezone": "Europe/Berlin", "industry": "Software"},
+        {"company_name": "Acme", "timezone": None, "industry": None, "linkedin_url": None, "tech": ["react"]}
+    )
+    assert merged == {"timezone": "Europe/Berlin", "industry": "Software", "company_name": "Acme", "tech": ["react"]}
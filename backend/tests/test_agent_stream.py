@@ -0,0 +1,52 @@
+import pytest
+from fastapi import HTTPException
+from app.agents.sales_agent.events import AGENT_EVENTS
+from app.api.v1.endpoints.customer import agent as agent_endpoints
+
+class _FakeService:
+    lead_exists = True
+    runs = []
+
+    def __init__(self, db, user):
+        pass
+
+    def has_lead(self, lead_id):
+        return self.lead_exists
+
+    async def execute_agent(self, lead_id, agent_type, execution_id=None):
+        self.runs.append(execution_id)
+        AGENT_EVENTS.publish(execution_id, {"type": "completed"})
+        AGENT_EVENTS.close(execution_id)
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(agent_endpoints, "AgentService", _FakeService)
+    monkeypatch.setattr(agent_endpoints, "SessionLocal", lambda: type("Db", (), {"close": lambda self: None})())
+    _FakeService.lead_exists = True
+    _FakeService.runs = []
+    return _FakeService
+
+@pytest.mark.asyncio
+async def test_unknown_lead_is_404_before_streaming(service):
+    service.lead_exists = False
+    with pytest.raises(HTTPException) as error:
+        await agent_endpoints.stream_agent_execution("missing", current_user=object(), db=None)
+    assert error.value.status_code == 404
+    assert not AGENT_EVENTS._subscribers
+
+@pytest.mark.asyncio
+async def test_unread_stream_leaves_no_subscriber(service):
+    response = await agent_endpoints.stream_agent_execution("lead", current_user=object(), db=None)
+    # The client went away before the body was sent
+    await response.body_iterator.aclose()
+    assert not AGENT_EVENTS._subscribers
+    assert not service.runs
+
+@pytest.mark.asyncio
+async def test_stream_runs_the_agent_and_unsubscribes(service):
+    response = await agent_endpoints.stream_agent_execution("lead", current_user=object(), db=None)
+    chunks = [chunk async for chunk in response.body_iterator]
+    assert chunks[0].startswith("id: 0\nevent: started")
+    assert "event: completed" in chunks[-1]
+    assert len(service.runs) == 1
+    assert not AGENT_EVENTS._subscribers
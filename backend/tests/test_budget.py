@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from datetime import datetime
+import pytest
+from app.agents.sales_agent.budget import BudgetManager, counter_key
+from app.core.exceptions import BudgetExceededException
+
+class SlowLoader:
+    def __init__(self, cost_cents: float, tokens: int):
+        self.cost_cents = cost_cents
+        self.tokens = tokens
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, tenant_id: str, since: datetime):
+        self.calls += 1
+        self.release.wait(5)
+        return self.cost_cents, self.tokens
+
+@pytest.mark.asyncio
+async def test_concurrent_first_reservations_count_seeded_spend():
+    loader = SlowLoader(cost_cents=0, tokens=900)
+    manager = BudgetManager(spend_loader=loader)
+    limits = {"daily_tokens": 1000}
+
+    first = asyncio.create_task(manager.reserve("t1", limits, 0, 60))
+    second = asyncio.create_task(manager.reserve("t1", limits, 0, 60))
+    await asyncio.sleep(0.05)
+    assert not first.done() and not second.done()
+    loader.release.set()
+
+    results = await asyncio.gather(first, second, return_exceptions=True)
+    assert loader.calls == 1
+    # 900 already spent leaves room for one of the two
+    assert sum(isinstance(result, BudgetExceededException) for result in results) == 1
+    key = counter_key("t1", "tokens", "day", datetime.utcnow())
+    assert await manager.backend.get(key) == 960
+
+@pytest.mark.asyncio
+async def test_failed_seed_is_retried():
+    calls = []
+
+    def loader(tenant_id: str, since: datetime):
+        calls.append(tenant_id)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return 0.0, 500
+
+    manager = BudgetManager(spend_loader=loader)
+    await manager.reserve("t1", {"daily_tokens": 1000}, 0, 10)
+    await manager.reserve("t1", {"daily_tokens": 1000}, 0, 10)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_seeds_are_kept_for_the_current_period_only():
+    manager = BudgetManager(spend_loader=lambda tenant_id, since: (0.0, 0))
+    await manager._seed("t1", "old", "tokens", "day", datetime(2026, 1, 1, 12))
+    await manager._seed("t1", "new", "tokens", "day", datetime(2026, 1, 2, 12))
+    start, seeds = manager._seeds["day"]
+    assert start == datetime(2026, 1, 2)
+    assert list(seeds) == ["new"]
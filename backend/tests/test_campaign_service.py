@@ -0,0 +1,5 @@
+from app.services.customer.campaign_service import escape_like
+
+def test_like_wildcards_are_escaped():
+    assert escape_like("50%_off\\") == "50\\%\\_off\\\\"
+    assert escape_like("acme.com") == "acme.com"
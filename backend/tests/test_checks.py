@@ -0,0 +1,15 @@
+from app.agents.sales_agent.checks import detect_pii
+
+DRAFT = (
+    "Hi Ana, happy to talk at ana@acme.com or on +1 (415) 555-0134.\n"
+    "Best, Sam - sam@seller.io, 212.555.0188"
+)
+
+def test_contact_details_of_lead_and_sender_are_allowed():
+    pii = detect_pii(DRAFT, ["ana@acme.com", "4155550134", "Sam@Seller.io", "+1 212-555-0188"])
+    assert not pii["found"]
+
+def test_other_contact_details_are_flagged():
+    pii = detect_pii(DRAFT, ["ana@acme.com"])
+    assert pii["found"]
+    assert pii["counts"]["emails"] == 1 and pii["counts"]["phones"] == 2
@@ -0,0 +1,22 @@
+import pytest
+from app.agents.sales_agent.company_cache import CompanyCache
+
+@pytest.mark.asyncio
+async def test_fallback_results_are_not_cached():
+    cache = CompanyCache(session_factory=None)
+    payloads = [
+        {"linkedin_url": "https://linkedin.com/company/test"},
+        {"company_name": "Acme", "linkedin_url": "https://linkedin.com/acme"},
+    ]
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return payloads[len(calls) - 1]
+
+    first, _ = await cache.get_or_fetch("t1", "acme.com", "enrichment", fetch)
+    second, status = await cache.get_or_fetch("t1", "acme.com", "enrichment", fetch)
+    assert first == payloads[0] and second == payloads[1] and status == "miss"
+    third, status = await cache.get_or_fetch("t1", "acme.com", "enrichment", fetch)
+    assert third == payloads[1] and status == "hit"
+    assert len(calls) == 2
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+import pytest
+from app.core.http_client import OutboundHTTPClient, ProviderConfig, TokenBucket
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse shows up as repeated client ports
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.client_address[1], time.monotonic()))
+            script = server.scripts.get(self.path)
+            status, headers = script.pop(0) if script else (200, {})
+        body = b"{}"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.lock = threading.Lock()
+        self.requests: List[Tuple[str, int, float]] = []
+        # path -> responses to give before falling back to 200
+        self.scripts: Dict[str, List[Tuple[int, Dict[str, str]]]] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def times(self, path: str) -> List[float]:
+        return [at for requested, _, at in self.requests if requested == path]
+
+@pytest.fixture
+def stub():
+    server = _StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _client(
+    server: _StubServer,
+    tenant_rate: float = 100,
+    tenant_burst: int = 100,
+    max_connections: int = 20
+) -> OutboundHTTPClient:
+    return OutboundHTTPClient({
+        "stub": ProviderConfig(
+            name="stub",
+            base_url=server.url,
+            rate_per_second=100,
+            burst=100,
+            tenant_rate_per_second=tenant_rate,
+            tenant_burst=tenant_burst,
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+    })
+
+@pytest.mark.asyncio
+async def test_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert await bucket.acquire() < 0.01
+    assert await bucket.acquire() < 0.01
+    waited = await bucket.acquire()
+    assert 0.03 < waited < 0.2
+
+@pytest.mark.asyncio
+async def test_bucket_serves_waiters_in_order():
+    bucket = TokenBucket(rate=50, capacity=1)
+    finished = []
+
+    async def take(index: int):
+        await bucket.acquire()
+        finished.append(index)
+
+    started = time.monotonic()
+    await asyncio.gather(*[take(index) for index in range(6)])
+    assert finished == list(range(6))
+    # One immediately, then five at 50 per second
+    assert time.monotonic() - started >= 0.09
+
+@pytest.mark.asyncio
+async def test_retry_after_backs_off_and_retries(stub):
+    stub.scripts["/search"] = [(429, {"Retry-After": "0.2"})]
+    http = _client(stub)
+    try:
+        response = await http.request("stub", "GET", "/search", tenant_id="t1")
+    finally:
+        await http.aclose()
+    assert response.status_code == 200
+    first, second = stub.times("/search")
+    assert second - first >= 0.2
+    provider_bucket, tenant_bucket = http._buckets("stub", "t1")
+    # Halved by the 429, then one recovery step for the 200
+    assert provider_bucket.rate == 60
+    assert tenant_bucket.rate == 60
+
+@pytest.mark.asyncio
+async def test_retry_after_holds_back_the_tenant_and_other_callers(stub):
+    stub.scripts["/first"] = [(429, {"Retry-After": "0.3"})]
+    http = _client(stub)
+    try:
+        first = asyncio.create_task(http.request("stub", "GET", "/first", tenant_id="t1"))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(
+            http.request("stub", "GET", "/same-tenant", tenant_id="t1"),
+            http.request("stub", "GET", "/other-tenant", tenant_id="t2")
+        )
+        await first
+    finally:
+        await http.aclose()
+    rejected_at = stub.times("/first")[0]
+    assert stub.times("/same-tenant")[0] - rejected_at >= 0.28
+    assert stub.times("/other-tenant")[0] - rejected_at >= 0.28
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(stub):
+    http = _client(stub, max_connections=2)
+    try:
+        for _ in range(5):
+            await http.request("stub", "GET", "/sequential", tenant_id="t1")
+        await asyncio.gather(*[http.request("stub", "GET", "/concurrent", tenant_id="t1") for _ in range(20)])
+    finally:
+        await http.aclose()
+    sequential = {port for path, port, _ in stub.requests if path == "/sequential"}
+    concurrent = {port for path, port, _ in stub.requests if path == "/concurrent"}
+    assert len(sequential) == 1
+    # Never more than the pool allows
+    assert len(sequential | concurrent) <= 2
+
+@pytest.mark.asyncio
+async def test_tenants_are_limited_separately(stub):
+    http = _client(stub, tenant_rate=2, tenant_burst=1)
+    try:
+        await http.request("stub", "GET", "/noisy", tenant_id="noisy")
+        noisy = asyncio.create_task(http.request("stub", "GET", "/noisy", tenant_id="noisy"))
+        started = time.monotonic()
+        await http.request("stub", "GET", "/quiet", tenant_id="quiet")
+        assert time.monotonic() - started < 0.2
+        assert not noisy.done()
+        await noisy
+    finally:
+        await http.aclose()
+    first, second = stub.times("/noisy")
+    assert second - first >= 0.4
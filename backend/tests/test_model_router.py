@@ -0,0 +1,58 @@
+import asyncio
+import random
+import pytest
+from app.agents.sales_agent.llm import LLMResult
+from app.agents.sales_agent.model_router import ModelRouter, abandoned_usage
+
+def _router() -> ModelRouter:
+    return ModelRouter(primary="gpt-4o", fallback="gpt-4o-mini", hedge_delay_ms=20)
+
+def _call(delays, failing=()):
+    async def call(model: str) -> LLMResult:
+        await asyncio.sleep(delays[model])
+        if model in failing:
+            raise RuntimeError(f"{model} unavailable")
+        return LLMResult(text=model, model=model, tokens_input=100, tokens_output=50)
+    return call
+
+@pytest.mark.asyncio
+async def test_hedge_loser_is_reported_and_billed():
+    result, decision = await _router().complete(_call({"gpt-4o": 1, "gpt-4o-mini": 0}))
+    assert result.model == "gpt-4o-mini"
+    assert decision["hedged"] and decision["abandoned"] == ["gpt-4o"]
+
+    messages = [{"role": "user", "content": "x" * 400}]
+    [spent] = abandoned_usage(decision, messages, {"gpt-4o": 80, "gpt-4o-mini": 400})
+    assert (spent.model, spent.tokens_input, spent.tokens_output) == ("gpt-4o", 101, 20)
+    assert spent.cost_cents > 0
+
+@pytest.mark.asyncio
+async def test_nothing_abandoned_without_a_hedge_or_after_a_failure():
+    _, decision = await _router().complete(_call({"gpt-4o": 0, "gpt-4o-mini": 0}))
+    assert "abandoned" not in decision
+
+    _, decision = await _router().complete(_call({"gpt-4o": 0.05, "gpt-4o-mini": 0.1}, failing={"gpt-4o"}))
+    assert decision["failover"] and "abandoned" not in decision
+    assert abandoned_usage(decision, [{"role": "user", "content": "hi"}]) == []
+
+@pytest.mark.asyncio
+async def test_adaptive_hedges_fire_on_few_calls():
+    router = ModelRouter(primary="gpt-4o-mini", fallback="gpt-4o", min_samples=20)
+    rng = random.Random(7)
+
+    async def call(model: str) -> LLMResult:
+        await asyncio.sleep(rng.uniform(0.01, 0.03))
+        return LLMResult(text=model, model=model, tokens_input=100, tokens_output=50)
+
+    hedged = []
+    for _ in range(20):
+        _, decision = await router.complete(call)
+        hedged.append(decision["hedged"])
+    # No p95 to go by yet
+    assert not any(hedged)
+
+    hedged = []
+    for _ in range(200):
+        _, decision = await router.complete(call)
+        hedged.append(decision["hedged"])
+    assert sum(hedged) / len(hedged) < 0.15
@@ -0,0 +1,35 @@
+import pytest
+from app.agents.sales_agent.graph import SalesAgent
+from app.agents.sales_agent.near_duplicates import NearDuplicateIndex
+
+DRAFT = "Hi Ana, we help revenue teams at companies like Acme cut their reporting time in half. Worth a quick call next week?"
+
+class _Graph:
+    _check_near_duplicate = SalesAgent._check_near_duplicate
+
+    def __init__(self, index):
+        self.near_duplicates = index
+
+def _index() -> NearDuplicateIndex:
+    index = NearDuplicateIndex()
+    # Nothing persisted for these tests
+    index._load = lambda tenant_id: []
+    return index
+
+@pytest.mark.asyncio
+async def test_drafts_are_not_indexed():
+    graph = _Graph(_index())
+    state = {"tenant_id": "t1", "draft_email": DRAFT, "execution_id": "e1"}
+    for _ in range(2):
+        verification = {"passed": True}
+        await graph._check_near_duplicate(state, "acme.com", verification)
+        assert verification["passed"]
+
+@pytest.mark.asyncio
+async def test_sent_emails_flag_repeats():
+    index = _index()
+    await index.add("t1", "acme.com", DRAFT, source="campaign", source_id="s1", persist=False)
+    verification = {"passed": True}
+    await _Graph(index)._check_near_duplicate({"tenant_id": "t1", "draft_email": DRAFT}, "acme.com", verification)
+    assert not verification["passed"]
+    assert verification["issues"] == ["near_duplicate"]
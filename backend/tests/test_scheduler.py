@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from app.agents.sales_agent.scheduler import AgentScheduler, DeficitRoundRobin, _Waiter
+
+def _waiter(tenant_id: str) -> _Waiter:
+    # The queue never touches the future
+    return _Waiter(tenant_id=tenant_id, priority="interactive", future=None, enqueued_at=0)
+
+def test_weighted_turns():
+    queue = DeficitRoundRobin()
+    for index in range(4):
+        queue.push("a", _waiter(f"a{index}"), 2)
+        queue.push("b", _waiter(f"b{index}"), 1)
+    order = [queue.pop().tenant_id for _ in range(8)]
+    assert order == ["a0", "a1", "b0", "a2", "a3", "b1", "b2", "b3"]
+    assert queue.pop() is None
+    assert len(queue) == 0
+
+def test_push_after_removing_last_waiter():
+    queue = DeficitRoundRobin()
+    first = _waiter("a")
+    queue.push("a", first, 1)
+    assert queue.remove("a", first)
+    queue.push("a", _waiter("a"), 1)
+    assert queue.pop().tenant_id == "a"
+    queue.push("b", _waiter("b"), 1)
+    assert queue.pop().tenant_id == "b"
+    assert queue.pop() is None
+    assert list(queue.active) == [] and queue.flows == {}
+
+@pytest.mark.asyncio
+async def test_cancelled_wait_does_not_stall_dispatch():
+    scheduler = AgentScheduler(max_concurrent=1)
+    await scheduler.acquire("busy", "free")
+
+    cancelled = asyncio.create_task(scheduler.acquire("a", "free"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    again = asyncio.create_task(scheduler.acquire("a", "free"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    await again
+    other = asyncio.create_task(scheduler.acquire("b", "free"))
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.wait_for(other, 1)
+    scheduler.release()
+    assert scheduler.running == 0 and scheduler.queued() == 0
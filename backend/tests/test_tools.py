@@ -0,0 +1,57 @@
+from unittest import mock
+import httpx
+import pytest
+from app.agents.sales_agent.tools import enrich_company, is_fallback, research_company
+from app.core.config import settings
+from app.core.http_client import OutboundHTTPClient, ProviderConfig
+
+def _client(handler) -> OutboundHTTPClient:
+    http = OutboundHTTPClient({
+        provider: ProviderConfig(
+            name=provider,
+            base_url="https://stub.test",
+            rate_per_second=100,
+            burst=100,
+            tenant_rate_per_second=100,
+            tenant_burst=100
+        )
+        for provider in ("serpapi", "clearbit")
+    })
+    for provider in ("serpapi", "clearbit"):
+        http._clients[provider] = httpx.AsyncClient(base_url="https://stub.test", transport=httpx.MockTransport(handler))
+    return http
+
+def _unreachable(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("connection refused", request=request)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("handler", [_unreachable, lambda request: httpx.Response(503)])
+async def test_failed_calls_fall_back(handler):
+    http = _client(handler)
+    with mock.patch.object(settings, "SERPAPI_API_KEY", "key"), mock.patch.object(settings, "CLEARBIT_API_KEY", "key"):
+        research = await research_company("acme.com", "Acme", "t1", http=http)
+        enrichment = await enrich_company("acme.com", "t1", http=http)
+    assert research == {"company_info": {"name": "Acme", "industry": "Technology"}}
+    assert enrichment == {"linkedin_url": "https://linkedin.com/company/test"}
+
+@pytest.mark.asyncio
+async def test_fallbacks_are_recognised():
+    with mock.patch.object(settings, "SERPAPI_API_KEY", ""), mock.patch.object(settings, "CLEARBIT_API_KEY", ""):
+        assert is_fallback(await research_company("acme.com", "Acme", "t1"))
+        assert is_fallback(await research_company(None, None, "t1"))
+        assert is_fallback(await enrich_company("acme.com", "t1"))
+    assert is_fallback({})
+
+@pytest.mark.asyncio
+async def test_provider_results_are_not_fallbacks():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/search.json":
+            return httpx.Response(200, json={"knowledge_graph": {"title": "Acme", "type": "Technology"}})
+        return httpx.Response(200, json={"name": "Acme", "timeZone": "Europe/Berlin"})
+
+    http = _client(handler)
+    with mock.patch.object(settings, "SERPAPI_API_KEY", "key"), mock.patch.object(settings, "CLEARBIT_API_KEY", "key"):
+        research = await research_company("acme.com", "Acme", "t1", http=http)
+        enrichment = await enrich_company("acme.com", "t1", http=http)
+    assert not is_fallback(research)
+    assert not is_fallback(enrichment)
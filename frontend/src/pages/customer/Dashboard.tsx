@@ -47,8 +47,8 @@ const CustomerDashboard: React.FC = () => {
     queryFn: async () => {
       // This would be an API call in a real app
       const mockExecutions: AgentExecution[] = [
-        { id: '1', lead_id: '1', user_id: '1', tenant_id: '1', agent_type: 'research', success: true, started_at: '2023-05-15T11:00:00Z', completed_at: '2023-05-15T11:02:00Z', created_at: '2023-05-15T11:00:00Z', updated_at: '2023-05-15T11:02:00Z', cost_cents: 15, tokens_input: 120, tokens_output: 80, trajectory: '[]' },
-        { id: '2', lead_id: '2', user_id: '1', tenant_id: '1', agent_type: 'research', success: true, started_at: '2023-05-16T15:00:00Z', completed_at: '2023-05-16T15:01:30Z', created_at: '2023-05-16T15:00:00Z', updated_at: '2023-05-16T15:01:30Z', cost_cents: 12, tokens_input: 95, tokens_output: 65, trajectory: '[]' },
+        { id: '1', lead_id: '1', user_id: '1', tenant_id: '1', agent_type: 'research', success: true, started_at: '2023-05-15T11:00:00Z', completed_at: '2023-05-15T11:02:00Z', created_at: '2023-05-15T11:00:00Z', updated_at: '2023-05-15T11:02:00Z', cost_cents: 15, tokens_input: 120, tokens_output: 80, trajectory: null },
+        { id: '2', lead_id: '2', user_id: '1', tenant_id: '1', agent_type: 'research', success: true, started_at: '2023-05-16T15:00:00Z', completed_at: '2023-05-16T15:01:30Z', created_at: '2023-05-16T15:00:00Z', updated_at: '2023-05-16T15:01:30Z', cost_cents: 12, tokens_input: 95, tokens_output: 65, trajectory: null },
       ];
       return mockExecutions;
     },
@@ -34,13 +34,18 @@ export interface Lead {
 }
 
 // Agent Execution Types
+export interface AgentTrajectory {
+  version: number;
+  steps: Record<string, unknown>[];
+}
+
 export interface AgentExecution {
   id: string;
   tenant_id: string;
   user_id: string;
   lead_id: string;
   agent_type: string;
-  trajectory: string;
+  trajectory: AgentTrajectory | null;
   success: boolean;
   tokens_input: number;
   tokens_output: number;